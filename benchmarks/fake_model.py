@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟延迟的假模型
+用于在不调用Google AI API的情况下对AI生成流程做基准测试
+"""
+
+import json
+import random
+import threading
+import time
+
+
+class FakeResponse:
+    """模拟generate_content的返回结果"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeModel:
+    """模拟Google AI模型，按指定延迟返回固定格式的内容
+
+    tail_rate 比例的调用耗时为 tail_latency（模拟长尾延迟）
+    """
+
+    def __init__(self, latency: float = 0.02, jitter: float = 0.005,
+                 error_rate: float = 0.0, seed: int = 42,
+                 tail_rate: float = 0.0, tail_latency: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _sleep(self):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            failed = self._rng.random() < self.error_rate
+            if self.tail_rate and self._rng.random() < self.tail_rate:
+                delay = self.tail_latency
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise RuntimeError("模拟API错误")
+
+    def generate_content(self, prompt, **kwargs):
+        """根据提示词类型返回角色、子事件或普通消息"""
+        self._sleep()
+        text = prompt if isinstance(prompt, str) else str(prompt)
+
+        if '"characters"' in text:
+            characters = [
+                {
+                    "name": f"成员{i}",
+                    "role": "执行员",
+                    "department": "行动组",
+                    "level": "成员",
+                    "expertise": ["执行任务"],
+                    "personality": "冲动",
+                    "speaking_style": "粗俗直接",
+                    "background": "无",
+                    "responsibilities": ["执行任务"],
+                    "decision_power": "低"
+                }
+                for i in range(6)
+            ]
+            return FakeResponse("```json\n" + json.dumps({"characters": characters}, ensure_ascii=False) + "\n```")
+
+        if '"sub_events"' in text:
+            sub_events = [
+                {
+                    "name": f"子事件{i}",
+                    "description": "模拟子事件",
+                    "urgency": "中",
+                    "impact": "中",
+                    "related_phase": "踩点摸底",
+                    "trigger_conditions": ["模拟条件"]
+                }
+                for i in range(5)
+            ]
+            return FakeResponse(json.dumps({"sub_events": sub_events}, ensure_ascii=False))
+
+        return FakeResponse(f"收到，这事我来盯着，第{self.calls}次回复。")
@@ -0,0 +1,652 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能基准测试
+离线测量生成器、渲染器和文件写入的吞吐量，结果输出为JSON并与基线对比
+
+用法:
+    python benchmarks/run_benchmarks.py                    # 完整运行
+    python benchmarks/run_benchmarks.py --quick            # 小规模快速运行
+    python benchmarks/run_benchmarks.py --only template    # 只运行名称包含template的测试
+    python benchmarks/run_benchmarks.py --update-baseline  # 用本次结果覆盖基线
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import platform
+import tempfile
+import contextlib
+import subprocess
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from chat_generator.core.base_generator import ChatGenerator, ChatMessage, create_sample_characters
+from fake_model import FakeModel
+
+BASELINE_PATH = Path(__file__).parent / 'baseline.json'
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+# 注册的基准测试: (名称, 函数)
+BENCHMARKS: List[tuple] = []
+
+
+def benchmark(name: str):
+    """注册基准测试"""
+    def decorator(func: Callable):
+        BENCHMARKS.append((name, func))
+        return func
+    return decorator
+
+
+def result(value: float, unit: str, higher_is_better: bool = True, **extra) -> Dict[str, Any]:
+    """构建单项结果"""
+    data = {"value": round(value, 6), "unit": unit, "higher_is_better": higher_is_better}
+    data.update(extra)
+    return data
+
+
+def skipped(reason: str) -> Dict[str, Any]:
+    """构建跳过的结果"""
+    return {"skipped": True, "reason": reason}
+
+
+def measure(func: Callable, repeat: int = 1) -> float:
+    """多次运行取最短耗时（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@contextlib.contextmanager
+def quiet_workdir():
+    """在临时目录中运行并屏蔽标准输出（生成器会写 output/temp 并打印进度）"""
+    old_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.chdir(tmpdir)
+        try:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                yield tmpdir
+        finally:
+            os.chdir(old_cwd)
+
+
+def make_template_generator() -> ChatGenerator:
+    """创建带示例角色的模板生成器"""
+    generator = ChatGenerator()
+    for char in create_sample_characters():
+        generator.add_character(char)
+    generator.set_topic("周末聚餐计划", "大家商量周末去哪里聚餐")
+    return generator
+
+
+def make_messages(count: int) -> List[ChatMessage]:
+    """生成用于渲染和写入测试的消息"""
+    generator = make_template_generator()
+    return generator.generate_chat_record(
+        duration_hours=72.0,
+        message_count=count,
+        start_time=datetime.datetime(2025, 1, 1, 9, 0, 0)
+    )
+
+
+def import_planning():
+    """导入策划生成器，依赖缺失时返回None"""
+    try:
+        from chat_generator.core.planning_generator import PlanningChatGenerator
+        return PlanningChatGenerator
+    except ImportError:
+        return None
+
+
+def import_ai():
+    """导入AI生成器，依赖缺失时返回None"""
+    try:
+        from chat_generator.core.ai_generator import AIChatGenerator
+        return AIChatGenerator
+    except ImportError:
+        return None
+
+
+@benchmark("template")
+def bench_template(quick: bool) -> Dict[str, Any]:
+    """ChatGenerator.generate_chat_record 吞吐量"""
+    sizes = [1_000, 10_000] if quick else [1_000, 10_000, 100_000, 1_000_000]
+    results = {}
+    for size in sizes:
+        generator = make_template_generator()
+        start_time = datetime.datetime(2025, 1, 1, 9, 0, 0)
+        elapsed = measure(lambda: generator.generate_chat_record(
+            duration_hours=72.0, message_count=size, start_time=start_time
+        ), repeat=5 if size <= 10_000 else 1)
+        results[f"template.generate_chat_record.{size}"] = result(size / elapsed, "msgs/s", seconds=round(elapsed, 4))
+    return results
+
+
+@benchmark("template_vectorized")
+def bench_template_vectorized(quick: bool) -> Dict[str, Any]:
+    """NumPy批量路径的吞吐量"""
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return {"template_vectorized": skipped("未安装NumPy")}
+    sizes = [10_000, 100_000] if quick else [10_000, 100_000, 1_000_000]
+    results = {}
+    for size in sizes:
+        generator = make_template_generator()
+        start_time = datetime.datetime(2025, 1, 1, 9, 0, 0)
+        elapsed = measure(lambda: generator.generate_chat_record(
+            duration_hours=72.0, message_count=size, start_time=start_time, vectorized=True
+        ), repeat=5 if size <= 100_000 else 1)
+        results[f"template_vectorized.{size}"] = result(size / elapsed, "msgs/s", seconds=round(elapsed, 4))
+    return results
+
+
+@benchmark("template_stream")
+def bench_template_stream(quick: bool) -> Dict[str, Any]:
+    """边生成边写入文件的吞吐量和峰值内存"""
+    import tracemalloc
+    size = 100_000 if quick else 1_000_000
+    generator = make_template_generator()
+    start_time = datetime.datetime(2025, 1, 1, 9, 0, 0)
+    run = lambda count: generator.generate_to_file(
+        "output/stream.txt", "qq", duration_hours=72.0, message_count=count,
+        start_time=start_time, compression="none"
+    )
+    with quiet_workdir():
+        elapsed = measure(lambda: run(size))
+        # tracemalloc 本身很慢，峰值内存单独用较少的消息测量（与消息数无关）
+        tracemalloc.start()
+        run(size // 10)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        f"template_stream.{size}": result(size / elapsed, "msgs/s", seconds=round(elapsed, 4)),
+        "template_stream.peak_memory": result(peak / 1024 / 1024, "MB", higher_is_better=False,
+                                              messages=size // 10),
+    }
+
+
+@benchmark("template_sharded")
+def bench_template_sharded(quick: bool) -> Dict[str, Any]:
+    """多进程分片生成模板记录的吞吐量"""
+    size = 100_000 if quick else 1_000_000
+    results = {}
+    for workers in sorted({2, os.cpu_count() or 1}):
+        generator = make_template_generator()
+        start_time = datetime.datetime(2025, 1, 1, 9, 0, 0)
+        elapsed = measure(lambda: generator.generate_chat_record(
+            duration_hours=72.0, message_count=size, start_time=start_time, workers=workers, seed=1
+        ))
+        results[f"template_sharded.{size}.workers_{workers}"] = result(
+            size / elapsed, "msgs/s", seconds=round(elapsed, 4), cpu_count=os.cpu_count()
+        )
+    return results
+
+
+@benchmark("turn_taking")
+def bench_turn_taking(quick: bool) -> Dict[str, Any]:
+    """发言人选择吞吐量（500人群聊）"""
+    from chat_generator.core.planning_generator import PlanningCharacter
+    from chat_generator.core.turn_taking import SpeakerSelector
+
+    levels = ["老大", "骨干", "马仔"]
+    powers = ["高", "中", "低"]
+    members = [
+        PlanningCharacter(name=f"成员{i}", role="成员", department="行动组", level=levels[i % 3],
+                          expertise=[], personality="", speaking_style="", responsibilities=[],
+                          decision_power=powers[i % 3])
+        for i in range(500)
+    ]
+    count = 100_000 if quick else 1_000_000
+    selector = SpeakerSelector(members)
+
+    def run():
+        last = None
+        for _ in range(count):
+            last = selector.next_speaker(last).name
+
+    elapsed = measure(run)
+    return {f"turn_taking.500.{count}": result(count / elapsed, "picks/s", seconds=round(elapsed, 4))}
+
+
+@benchmark("render")
+def bench_render(quick: bool) -> Dict[str, Any]:
+    """QQ和微信格式渲染吞吐量"""
+    size = 10_000 if quick else 100_000
+    generator = make_template_generator()
+    generator.messages = make_messages(size)
+    results = {}
+    for style, func in (("qq", generator.format_qq_style), ("wechat", generator.format_wechat_style)):
+        elapsed = measure(func, repeat=3)
+        results[f"render.{style}.{size}"] = result(size / elapsed, "msgs/s", seconds=round(elapsed, 4))
+    return results
+
+
+@benchmark("realtime_append")
+def bench_realtime_append(quick: bool) -> Dict[str, Any]:
+    """实时保存追加写入吞吐量（每次追加save_interval条）"""
+    size = 10_000 if quick else 100_000
+    save_interval = 10
+    messages = make_messages(size)
+    results = {}
+
+    for label, loader, header, append in (
+        ("planning", import_planning, "_create_temp_file_header", "_append_to_temp_files"),
+        ("ai", import_ai, "_create_ai_temp_file_header", "_append_to_ai_temp_files"),
+    ):
+        cls = loader()
+        name = f"realtime_append.{label}.{size}"
+        if cls is None:
+            results[name] = skipped("缺少依赖，无法导入生成器")
+            continue
+
+        with quiet_workdir():
+            generator = cls(model=FakeModel())
+            qq_file = "output/temp/bench_qq.txt"
+            wechat_file = "output/temp/bench_wechat.txt"
+            getattr(generator, header)(qq_file, "qq")
+            getattr(generator, header)(wechat_file, "wechat")
+            append_func = getattr(generator, append)
+
+            def run():
+                for i in range(0, size, save_interval):
+                    append_func(messages[i:i + save_interval], qq_file, wechat_file)
+
+            elapsed = measure(run)
+        results[name] = result(size / elapsed, "msgs/s", seconds=round(elapsed, 4))
+    return results
+
+
+@benchmark("compressed_output")
+def bench_compressed_output(quick: bool) -> Dict[str, Any]:
+    """压缩保存：整文件写入吞吐量和压缩率（none/gzip/zstd）"""
+    from chat_generator.core.output_writer import write_text
+
+    size = 10_000 if quick else 100_000
+    generator = make_template_generator()
+    generator.messages = make_messages(size)
+    content = generator.format_qq_style()
+    raw_bytes = len(content.encode('utf-8'))
+    results = {}
+
+    for compression in ("none", "gzip", "zstd"):
+        name = f"compressed_output.{compression}.{size}"
+        with quiet_workdir():
+            try:
+                elapsed = measure(lambda: write_text("output/bench_qq.txt", content, compression), repeat=3)
+            except ImportError as e:
+                results[name] = skipped(str(e))
+                continue
+            filename = write_text("output/bench_qq.txt", content, compression)
+            ratio = raw_bytes / os.path.getsize(filename)
+        results[name] = result(size / elapsed, "msgs/s", seconds=round(elapsed, 4), ratio=round(ratio, 2))
+    return results
+
+
+@benchmark("clean_json")
+def bench_clean_json(quick: bool) -> Dict[str, Any]:
+    """_clean_json_response 在大响应上的吞吐量"""
+    cls = import_planning()
+    sizes_mb = [1] if quick else [1, 10]
+    if cls is None:
+        return {f"clean_json.{mb}mb": skipped("缺少依赖，无法导入生成器") for mb in sizes_mb}
+
+    results = {}
+    with quiet_workdir():
+        generator = cls(model=FakeModel())
+        item = json.dumps({"name": "强哥", "role": "老大", "expertise": ["指挥行动"]}, ensure_ascii=False)
+        for mb in sizes_mb:
+            count = mb * 1024 * 1024 // len(item.encode('utf-8'))
+            payload = "```json\n{\"characters\": [" + ",".join([item] * count) + "]}\n```"
+            elapsed = measure(lambda: generator._clean_json_response(payload), repeat=5)
+            size_mb = len(payload.encode('utf-8')) / (1024 * 1024)
+            results[f"clean_json.{mb}mb"] = result(size_mb / elapsed, "MB/s", seconds=round(elapsed, 6))
+    return results
+
+
+@benchmark("ai_loop")
+def bench_ai_loop(quick: bool) -> Dict[str, Any]:
+    """AI对话生成循环（模拟延迟的假模型）"""
+    count = 50 if quick else 200
+    latency = 0.02
+    name = f"ai_loop.{count}"
+    cls = import_ai()
+    if cls is None:
+        return {name: skipped("缺少依赖，无法导入生成器")}
+
+    with quiet_workdir():
+        model = FakeModel(latency=latency)
+        generator = cls(model=model)
+        generator.request_interval = 0
+        generator.input_event("公司年会策划", "节目安排、场地选择、预算分配")
+        generator._create_default_characters()
+        elapsed = measure(lambda: generator.generate_ai_conversation(
+            duration_hours=2.0, message_count=count, realtime_save=True
+        ))
+    return {name: result(count / elapsed, "msgs/s", seconds=round(elapsed, 4),
+                         model_latency=latency, model_calls=model.calls)}
+
+
+@benchmark("planning_loop")
+def bench_planning_loop(quick: bool) -> Dict[str, Any]:
+    """策划对话生成循环（模拟延迟的假模型）"""
+    count = 50 if quick else 200
+    latency = 0.02
+    name = f"planning_loop.{count}"
+    cls = import_planning()
+    if cls is None:
+        return {name: skipped("缺少依赖，无法导入生成器")}
+
+    results = {}
+    for lookahead in (1, 4):
+        with quiet_workdir():
+            model = FakeModel(latency=latency)
+            generator = cls(model=model)
+            generator.request_interval = 0
+            generator.input_planning_event("公司年会策划", "节目安排、场地选择、预算分配")
+            generator._create_default_planning_characters()
+            elapsed = measure(lambda: generator.generate_planning_conversation(
+                total_duration_hours=48.0, target_message_count=count, realtime_save=True,
+                lookahead=lookahead
+            ))
+        key = name if lookahead == 1 else f"{name}.lookahead{lookahead}"
+        results[key] = result(count / elapsed, "msgs/s", seconds=round(elapsed, 4),
+                              model_latency=latency, model_calls=model.calls)
+    return results
+
+
+@benchmark("planning_hedged")
+def bench_planning_hedged(quick: bool) -> Dict[str, Any]:
+    """长尾延迟下策划对话生成循环，对比开启对冲请求前后"""
+    count = 100 if quick else 300
+    latency = 0.01
+    tail_latency = 0.2
+    name = f"planning_hedged.{count}"
+    cls = import_planning()
+    if cls is None:
+        return {name: skipped("缺少依赖，无法导入生成器")}
+
+    from chat_generator.core.hedging import HedgedCaller
+
+    results = {}
+    for hedged in (False, True):
+        with quiet_workdir():
+            model = FakeModel(latency=latency, jitter=0.002, tail_rate=0.03, tail_latency=tail_latency)
+            generator = cls(model=model)
+            generator.request_interval = 0
+            generator.hedger = HedgedCaller(enabled=hedged, min_samples=20, max_rate=0.05)
+            generator.input_planning_event("公司年会策划", "节目安排、场地选择、预算分配")
+            generator._create_default_planning_characters()
+            generator.generate_planning_phases()
+            generator._create_default_sub_events()
+            elapsed = measure(lambda: generator.generate_planning_conversation(
+                total_duration_hours=48.0, target_message_count=count, realtime_save=False
+            ))
+        key = f"{name}.hedged" if hedged else name
+        results[key] = result(count / elapsed, "msgs/s", seconds=round(elapsed, 4), model_latency=latency,
+                              tail_latency=tail_latency, model_calls=model.calls,
+                              hedged=generator.hedger.hedged)
+    return results
+
+
+@benchmark("planning_concurrent")
+def bench_planning_concurrent(quick: bool) -> Dict[str, Any]:
+    """多个策划对话通过共享调度器并发运行"""
+    conversations = 4 if quick else 8
+    count = 20 if quick else 50
+    latency = 0.02
+    max_in_flight = 4
+    name = f"planning_concurrent.{conversations}x{count}"
+    cls = import_planning()
+    if cls is None:
+        return {name: skipped("缺少依赖，无法导入生成器")}
+
+    import threading
+    from chat_generator.core.scheduler import RequestScheduler
+
+    scheduler = RequestScheduler(max_in_flight=max_in_flight)
+    finish_times = []
+    with quiet_workdir():
+        generators = []
+        for i in range(conversations):
+            generator = cls(model=FakeModel(latency=latency, seed=i), scheduler=scheduler,
+                            conversation_id=f"conv{i}")
+            generator.request_interval = 0
+            generator.input_planning_event("公司年会策划")
+            generator._create_default_planning_characters()
+            generator.generate_planning_phases()
+            generator._create_default_sub_events()
+            generators.append(generator)
+
+        start = time.perf_counter()
+
+        def run_one(generator):
+            generator.generate_planning_conversation(
+                total_duration_hours=48.0, target_message_count=count, realtime_save=False
+            )
+            finish_times.append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=run_one, args=(g,)) for g in generators]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    scheduler.shutdown()
+
+    total = conversations * count
+    return {name: result(total / elapsed, "msgs/s", seconds=round(elapsed, 4), model_latency=latency,
+                         max_in_flight=max_in_flight,
+                         finish_spread=round(max(finish_times) - min(finish_times), 4))}
+
+
+# 启动耗时预算（秒）
+IMPORT_BUDGET = 0.15
+MENU_BUDGET = 0.5
+
+# 启动阶段不应加载的重型模块
+HEAVY_MODULES = ("google.generativeai", "dotenv")
+
+IMPORT_SNIPPET = """
+import sys, time, json
+start = time.perf_counter()
+import chat_generator
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+MENU_SNIPPET = """
+import sys, json
+from chat_generator.cli.main import show_menu
+show_menu()
+print(json.dumps({"heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def run_snippet(code: str) -> tuple:
+    """在新的解释器中运行代码，返回(墙钟耗时, 最后一行JSON)"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = str(project_root / 'src') + os.pathsep + env.get("PYTHONPATH", "")
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    elapsed = time.perf_counter() - start
+    return elapsed, json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+@benchmark("startup")
+def bench_startup(quick: bool) -> Dict[str, Any]:
+    """import chat_generator 耗时和菜单启动耗时（不应加载AI SDK和dotenv）"""
+    repeat = 3 if quick else 7
+    import_times, menu_times = [], []
+    heavy = set()
+    for _ in range(repeat):
+        _, data = run_snippet(IMPORT_SNIPPET)
+        import_times.append(data["elapsed"])
+        heavy.update(data["heavy"])
+        elapsed, data = run_snippet(MENU_SNIPPET)
+        menu_times.append(elapsed)
+        heavy.update(data["heavy"])
+
+    return {
+        "startup.import_chat_generator": result(min(import_times), "s", higher_is_better=False,
+                                                budget=IMPORT_BUDGET, heavy_modules=sorted(heavy)),
+        "startup.cli_menu": result(min(menu_times), "s", higher_is_better=False,
+                                   budget=MENU_BUDGET, heavy_modules=sorted(heavy)),
+    }
+
+
+def check_budgets(results: Dict[str, Any]) -> List[str]:
+    """检查带预算的项目，返回超出预算或加载了重型模块的项"""
+    failures = []
+    for name, data in results.items():
+        if data.get("skipped") or "budget" not in data:
+            continue
+        if data["value"] > data["budget"] or data.get("heavy_modules"):
+            failures.append(name)
+    return failures
+
+
+def compare_with_baseline(results: Dict[str, Any], baseline: Dict[str, Any],
+                          tolerance: float) -> Dict[str, Any]:
+    """与基线对比，返回每项的比值和状态（regression/improvement/ok）"""
+    comparison = {}
+    baseline_results = baseline.get("results", {})
+    for name, current in results.items():
+        base = baseline_results.get(name)
+        if current.get("skipped") or not base or base.get("skipped"):
+            continue
+        if not base.get("value") or not current.get("value"):
+            continue
+
+        if current.get("higher_is_better", True):
+            ratio = current["value"] / base["value"]
+        else:
+            ratio = base["value"] / current["value"]
+
+        if ratio < 1 - tolerance:
+            status = "regression"
+        elif ratio > 1 + tolerance:
+            status = "improvement"
+        else:
+            status = "ok"
+
+        comparison[name] = {
+            "baseline": base["value"],
+            "current": current["value"],
+            "ratio": round(ratio, 3),
+            "status": status
+        }
+    return comparison
+
+
+def run(selected: List[str], quick: bool) -> Dict[str, Any]:
+    """运行选中的基准测试"""
+    results = {}
+    for name, func in BENCHMARKS:
+        if selected and not any(s in name for s in selected):
+            continue
+        print(f"▶ {name} ...")
+        start = time.perf_counter()
+        results.update(func(quick))
+        print(f"  完成 ({time.perf_counter() - start:.1f}s)")
+    return results
+
+
+def print_report(results: Dict[str, Any], comparison: Dict[str, Any]):
+    """打印结果表格"""
+    print()
+    print("=" * 80)
+    print(f"{'基准项':<42}{'结果':>18}{'对比基线':>18}")
+    print("-" * 80)
+    for name, data in results.items():
+        if data.get("skipped"):
+            print(f"{name:<42}{'跳过':>18}  {data['reason']}")
+            continue
+        number = f"{data['value']:,.1f}" if data['value'] >= 100 else f"{data['value']:.4g}"
+        value = f"{number} {data['unit']}"
+        cmp = comparison.get(name)
+        cmp_text = f"x{cmp['ratio']:.2f} {cmp['status']}" if cmp else "-"
+        print(f"{name:<42}{value:>18}{cmp_text:>18}")
+    print("=" * 80)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="聊天记录生成器性能基准测试")
+    parser.add_argument("--quick", action="store_true", help="小规模快速运行")
+    parser.add_argument("--only", nargs="*", default=[], help="只运行名称包含指定关键字的测试")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="基线文件路径")
+    parser.add_argument("--output", default=None, help="结果输出路径 (默认 benchmarks/results/)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="判定回归的相对容差 (默认0.2)")
+    parser.add_argument("--update-baseline", action="store_true", help="用本次结果覆盖基线")
+    parser.add_argument("--fail-on-regression", action="store_true", help="存在回归时返回非零退出码")
+    args = parser.parse_args()
+
+    results = run(args.only, args.quick)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    comparison = compare_with_baseline(results, baseline, args.tolerance)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "quick": args.quick
+        },
+        "results": results,
+        "comparison": comparison,
+        "over_budget": check_budgets(results)
+    }
+
+    output = args.output
+    if output is None:
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        output = str(RESULTS_DIR / f"bench_{timestamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print_report(results, comparison)
+    print(f"📄 结果已保存到: {output}")
+
+    if args.update_baseline:
+        merged = baseline if baseline else {"meta": report["meta"], "results": {}}
+        merged["meta"] = report["meta"]
+        merged.setdefault("results", {}).update(
+            {name: data for name, data in results.items() if not data.get("skipped")}
+        )
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False, indent=2)
+        print(f"📌 基线已更新: {args.baseline}")
+
+    regressions = [name for name, cmp in comparison.items() if cmp["status"] == "regression"]
+    if regressions:
+        print(f"⚠️ 发现 {len(regressions)} 项性能回归: {', '.join(regressions)}")
+
+    over_budget = check_budgets(results)
+    if over_budget:
+        print(f"⚠️ 超出启动预算: {', '.join(over_budget)}")
+
+    if args.fail_on_regression and (regressions or over_budget):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
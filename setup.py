@@ -48,6 +48,14 @@ setup(
     python_requires=">=3.7",
     install_requires=read_requirements(),
     extras_require={
+        "zstd": [
+            # stream_reader(read_across_frames=True) is available since 0.11;
+            # 0.15 is the oldest release the compressed-output tests are run against
+            "zstandard>=0.15",
+        ],
+        "numpy": [
+            "numpy>=1.17",
+        ],
         "dev": [
             "pytest>=6.0",
             "pytest-cov>=2.0",
@@ -65,6 +73,7 @@ setup(
     package_data={
         "chat_generator": [
             "config/templates/*.json",
+            "config/templates/fallback/*.json",
         ],
     },
     keywords="chat generator, conversation, AI, planning, organization",
@@ -5,6 +5,7 @@
 提供简单的菜单选择不同的运行模式
 """
 
+import argparse
 
 
 def show_menu():
@@ -88,13 +89,13 @@ def run_examples():
         print(f"❌ 运行错误: {e}")
 
 
-def run_ai_generator():
-    """运行AI聊天生成器"""
+def run_ai_generator(profile: str = None):
+    """运行AI聊天生成器（profile 为命令行 --profile 指定的运行配置）"""
     print("启动AI聊天生成器...")
     try:
         from ..utils.ai_config_generator import AIConfigGenerator
         config_gen = AIConfigGenerator()
-        config_gen.interactive_setup()
+        config_gen.interactive_setup(profile=profile)
     except ImportError as e:
         print(f"❌ 导入错误: {e}")
         print("请确保 ai_config_generator.py 文件存在")
@@ -103,13 +104,13 @@ def run_ai_generator():
         print(f"❌ 运行错误: {e}")
 
 
-def run_planning_generator():
-    """运行策划组织聊天生成器"""
+def run_planning_generator(profile: str = None):
+    """运行策划组织聊天生成器（profile 为命令行 --profile 指定的运行配置）"""
     print("启动策划组织聊天生成器...")
     try:
         from ..utils.planning_config_generator import PlanningConfigGenerator
         config_gen = PlanningConfigGenerator()
-        config_gen.interactive_setup()
+        config_gen.interactive_setup(profile=profile)
     except ImportError as e:
         print(f"❌ 导入错误: {e}")
         print("请确保 planning_config_generator.py 文件存在")
@@ -187,8 +188,80 @@ def show_help():
     print()
 
 
-def main():
+def run_from_config(args):
+    """使用已保存的配置运行（跳过角色、阶段和子事件的生成调用）"""
+    import json
+    from ..config import settings
+    from ..core.profiles import get_profile
+    
+    try:
+        with open(args.from_config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"❌ 读取配置文件失败: {e}")
+        return
+    
+    # 运行配置（--profile 或 RUN_PROFILE）提供未在命令行指定的保存策略
+    try:
+        profile = get_profile(args.profile)
+    except (OSError, ValueError) as e:
+        print(f"❌ 读取运行配置失败: {e}")
+        return
+    realtime_save = profile.realtime_save if profile else settings.DEFAULT_REALTIME_SAVE
+    save_interval = profile.save_interval if profile else settings.DEFAULT_SAVE_INTERVAL
+    
+    params = {
+        'message_count': args.message_count or settings.DEFAULT_MESSAGE_COUNT,
+        'duration_hours': args.duration or settings.DEFAULT_DURATION_HOURS,
+        'output_format': args.format,
+        'realtime_save': realtime_save and not args.no_realtime_save,
+        'save_interval': args.save_interval or save_interval,
+        'shard_by_day': args.shard_by_day or settings.OUTPUT_SHARD_BY_DAY,
+        'profile': profile
+    }
+    
+    try:
+        # 策划配置包含 main_event，AI角色配置包含 event
+        if "main_event" in config:
+            from ..utils.planning_config_generator import PlanningConfigGenerator
+            PlanningConfigGenerator().run_from_config(args.from_config, **params)
+        else:
+            from ..utils.ai_config_generator import AIConfigGenerator
+            AIConfigGenerator().run_from_config(args.from_config, **params)
+    except ImportError as e:
+        print(f"❌ 导入错误: {e}")
+        print("请确保已安装 google-generativeai 包")
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(prog="chat-generator", description="聊天记录生成器")
+    parser.add_argument("--from-config", metavar="FILE",
+                        help="复用已保存的角色/策划配置直接生成对话（不再调用API生成角色、阶段和子事件）")
+    parser.add_argument("--message-count", type=int, help="消息数量")
+    parser.add_argument("--duration", type=float, help="聊天时长（小时）")
+    parser.add_argument("--format", choices=["qq", "wechat"], default="qq", help="输出格式")
+    parser.add_argument("--save-interval", type=int, help="实时保存间隔（条消息）")
+    parser.add_argument("--no-realtime-save", action="store_true", help="关闭实时保存")
+    parser.add_argument("--shard-by-day", action="store_true", help="按天分片保存（每天一个文件，另有 manifest.json）")
+    parser.add_argument("--profile", metavar="NAME",
+                        help="运行配置（fast/balanced/quality 或 RUN_PROFILES_FILE 中定义的档位，默认使用 RUN_PROFILE）")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], type=str.upper,
+                        help="日志级别（默认使用配置中的 LOG_LEVEL）")
+    parser.add_argument("--log-format", choices=["text", "json"], help="日志格式，json 时每行一个JSON对象")
+    parser.add_argument("--quiet", action="store_true", default=None, help="只输出警告和错误")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """主函数"""
+    args = parse_args(argv)
+    from ..core.log import configure_logging
+    configure_logging(level=args.log_level, fmt=args.log_format, quiet=args.quiet, force=True)
+    if args.from_config:
+        run_from_config(args)
+        return
+    
     while True:
         show_menu()
         
@@ -202,9 +275,9 @@ def main():
             elif choice == "3":
                 run_examples()
             elif choice == "4":
-                run_ai_generator()
+                run_ai_generator(args.profile)
             elif choice == "5":
-                run_planning_generator()
+                run_planning_generator(args.profile)
             elif choice == "6":
                 test_ai_config()
             elif choice == "7":
@@ -2,6 +2,14 @@
 Configuration management
 """
 
-from .settings import GOOGLE_AI_API_KEY, DEFAULT_MODEL, validate_config, get_config_summary
+from .settings import validate_config, get_config_summary
 
 __all__ = ["GOOGLE_AI_API_KEY", "DEFAULT_MODEL", "validate_config", "get_config_summary"]
+
+
+def __getattr__(name):
+    # 配置项延迟到首次访问时才加载（见 settings.load_settings）
+    if name in ("GOOGLE_AI_API_KEY", "DEFAULT_MODEL"):
+        from . import settings
+        return getattr(settings, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
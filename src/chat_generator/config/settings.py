@@ -3,61 +3,176 @@
 """
 配置管理模块
 支持从环境变量和.env文件加载配置
+
+配置在首次访问时才加载（读取.env文件），导入本模块本身没有额外开销
 """
 
 import os
 from pathlib import Path
-from dotenv import load_dotenv
+from typing import Any, Dict
 
-# 加载.env文件
+# .env文件路径
 env_path = Path(__file__).parent.parent.parent.parent / '.env'
-load_dotenv(env_path)
 
-# Google AI API配置
-GOOGLE_AI_API_KEY = os.getenv('GOOGLE_AI_API_KEY', '')
-DEFAULT_MODEL = os.getenv('DEFAULT_MODEL', 'gemini-2.5-flash-preview-05-20')
+_settings_loaded = False
+
+
+def _read_settings() -> Dict[str, Any]:
+    """从环境变量读取所有配置项"""
+    return {
+        # Google AI API配置
+        'GOOGLE_AI_API_KEY': os.getenv('GOOGLE_AI_API_KEY', ''),
+        'DEFAULT_MODEL': os.getenv('DEFAULT_MODEL', 'gemini-2.5-flash-preview-05-20'),
+
+        # 调试配置
+        'DEBUG': os.getenv('DEBUG', 'false').lower() == 'true',
+        'LOG_LEVEL': os.getenv('LOG_LEVEL', 'INFO'),
+        'LOG_FORMAT': os.getenv('LOG_FORMAT', 'text'),  # text 或 json（每行一个JSON对象）
+        'LOG_QUIET': os.getenv('LOG_QUIET', 'false').lower() == 'true',  # 只输出警告和错误
+        'LOG_SAMPLE_RATES': os.getenv('LOG_SAMPLE_RATES', ''),  # 高频事件的采样率，如 message.generating=10,planning.progress=100
+
+        # 默认生成参数
+        'DEFAULT_MESSAGE_COUNT': int(os.getenv('DEFAULT_MESSAGE_COUNT', '30')),
+        'DEFAULT_DURATION_HOURS': float(os.getenv('DEFAULT_DURATION_HOURS', '1.0')),
+        'DEFAULT_CHARACTER_COUNT': int(os.getenv('DEFAULT_CHARACTER_COUNT', '6')),
+
+        # 生成参数限制
+        'MIN_CHARACTERS': int(os.getenv('MIN_CHARACTERS', '5')),
+        'MAX_CHARACTERS': int(os.getenv('MAX_CHARACTERS', '500')),
+        'MIN_MESSAGE_COUNT': int(os.getenv('MIN_MESSAGE_COUNT', '10')),
+        'MAX_MESSAGE_COUNT': int(os.getenv('MAX_MESSAGE_COUNT', '100')),
+        'MIN_DURATION': float(os.getenv('MIN_DURATION', '0.1')),
+        'MAX_DURATION': float(os.getenv('MAX_DURATION', '24.0')),
+
+        # 实时保存配置
+        'DEFAULT_SAVE_INTERVAL': int(os.getenv('DEFAULT_SAVE_INTERVAL', '10')),
+        'DEFAULT_REALTIME_SAVE': os.getenv('DEFAULT_REALTIME_SAVE', 'true').lower() == 'true',
+
+        # 分页生成角色配置（超过每页数量时分页并发生成）
+        'CHARACTER_PAGE_SIZE': int(os.getenv('CHARACTER_PAGE_SIZE', '10')),
+        'CHARACTER_PAGE_WORKERS': int(os.getenv('CHARACTER_PAGE_WORKERS', '4')),
+
+        # 角色库配置（生成的角色自动保存，后续运行可直接复用）
+        'CHARACTER_LIBRARY_ENABLED': os.getenv('CHARACTER_LIBRARY_ENABLED', 'true').lower() == 'true',
+        'CHARACTER_LIBRARY_PATH': os.getenv('CHARACTER_LIBRARY_PATH', 'output/character_library.db'),
+
+        # 子事件触发频率（每100条消息触发的子事件数）
+        'SUB_EVENT_RATE': float(os.getenv('SUB_EVENT_RATE', '1.5')),
+
+        # 输出压缩配置（none/gzip/zstd，zstd需要安装zstandard）
+        'OUTPUT_COMPRESSION': os.getenv('OUTPUT_COMPRESSION', 'none').lower(),
+        'COMPRESSION_LEVEL': int(os.getenv('COMPRESSION_LEVEL', '-1')),  # -1 表示使用默认级别
+        'COMPRESSION_THREADS': int(os.getenv('COMPRESSION_THREADS', '0')),  # 0 表示使用CPU核数
+
+        # 按天分片保存（每天一个文件，另有 manifest.json）
+        'OUTPUT_SHARD_BY_DAY': os.getenv('OUTPUT_SHARD_BY_DAY', 'false').lower() == 'true',
+
+        # 运行日志配置（每次运行都写一份JSONL日志，QQ/微信文件由日志渲染）
+        'RUN_LOG_DIR': os.getenv('RUN_LOG_DIR', 'output/runs'),
+        'RUN_LOG_FSYNC': os.getenv('RUN_LOG_FSYNC', 'false').lower() == 'true',
+
+        # 额外的模板包（JSON文件路径，逗号分隔，在内置模板包之后加载）
+        'TEMPLATE_PACKS': os.getenv('TEMPLATE_PACKS', ''),
+
+        # 每次调用提示词的token上限（估算值，超出时先删减对话历史，0 表示不限制）
+        'PROMPT_TOKEN_BUDGET': int(os.getenv('PROMPT_TOKEN_BUDGET', '2000')),
+
+        # 固定上下文缓存（角色表、阶段表和要求作为系统指令/上下文缓存，每条消息只发送变化的部分）
+        'PROMPT_CONTEXT_CACHE': os.getenv('PROMPT_CONTEXT_CACHE', 'true').lower() == 'true',
+        'PROMPT_CONTEXT_CACHE_TTL': int(os.getenv('PROMPT_CONTEXT_CACHE_TTL', '3600')),  # 秒
 
-# 调试配置
-DEBUG = os.getenv('DEBUG', 'false').lower() == 'true'
-LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+        # 模板生成的进程数（1 为单进程，0 表示使用CPU核数）
+        'TEMPLATE_WORKERS': int(os.getenv('TEMPLATE_WORKERS', '1')),
 
-# 默认生成参数
-DEFAULT_MESSAGE_COUNT = int(os.getenv('DEFAULT_MESSAGE_COUNT', '30'))
-DEFAULT_DURATION_HOURS = float(os.getenv('DEFAULT_DURATION_HOURS', '1.0'))
-DEFAULT_CHARACTER_COUNT = int(os.getenv('DEFAULT_CHARACTER_COUNT', '6'))
+        # 模板生成使用NumPy批量抽样（需要安装NumPy）
+        'TEMPLATE_VECTORIZED': os.getenv('TEMPLATE_VECTORIZED', 'false').lower() == 'true',
 
-# 生成参数限制
-MIN_CHARACTERS = int(os.getenv('MIN_CHARACTERS', '5'))
-MAX_CHARACTERS = int(os.getenv('MAX_CHARACTERS', '10'))
-MIN_MESSAGE_COUNT = int(os.getenv('MIN_MESSAGE_COUNT', '10'))
-MAX_MESSAGE_COUNT = int(os.getenv('MAX_MESSAGE_COUNT', '100'))
-MIN_DURATION = float(os.getenv('MIN_DURATION', '0.1'))
-MAX_DURATION = float(os.getenv('MAX_DURATION', '24.0'))
+        # 模型分级：日常消息使用快速模型，子事件、阶段切换和决策类消息使用强模型
+        # （FAST_MODEL 为空时不分级，STRONG_MODEL 为空时使用 DEFAULT_MODEL）
+        'FAST_MODEL': os.getenv('FAST_MODEL', ''),
+        'STRONG_MODEL': os.getenv('STRONG_MODEL', ''),
+        'ROUTING_STRONG_PHASES': os.getenv('ROUTING_STRONG_PHASES', ''),  # 逗号分隔的阶段名称
+        'ROUTING_STRONG_URGENCY': os.getenv('ROUTING_STRONG_URGENCY', '高,中'),  # 子事件紧急程度
+        'ROUTING_STRONG_LEVELS': os.getenv('ROUTING_STRONG_LEVELS', '老大,负责人'),  # 角色级别
+        'ROUTING_PHASE_TRANSITIONS': os.getenv('ROUTING_PHASE_TRANSITIONS', 'true').lower() == 'true',
+
+        # 降级生成：API调用失败时用本地模板生成占位消息（运行日志中标记，之后可以回填）
+        'FALLBACK_ENABLED': os.getenv('FALLBACK_ENABLED', 'true').lower() == 'true',
+        'FALLBACK_AFTER_FAILURES': int(os.getenv('FALLBACK_AFTER_FAILURES', '3')),  # 连续失败次数，0表示不跳过API
+        'FALLBACK_COOLDOWN': float(os.getenv('FALLBACK_COOLDOWN', '60')),  # 跳过API的秒数
+        'FALLBACK_TEMPLATE_PACKS': os.getenv('FALLBACK_TEMPLATE_PACKS', ''),  # 额外的降级模板包（逗号分隔）
+
+        # 慢请求对冲：消息调用超过最近耗时的p95仍未返回时再发一次，先返回者生效
+        'HEDGE_REQUESTS': os.getenv('HEDGE_REQUESTS', 'false').lower() == 'true',
+        'HEDGE_PERCENTILE': float(os.getenv('HEDGE_PERCENTILE', '0.95')),
+        'HEDGE_MAX_RATE': float(os.getenv('HEDGE_MAX_RATE', '0.05')),  # 对冲请求占总调用数的上限
+        'HEDGE_MIN_SAMPLES': int(os.getenv('HEDGE_MIN_SAMPLES', '20')),  # 开始对冲前至少记录的调用次数
+
+        # 运行指标导出（Prometheus文本格式，端口为0且文件为空时不导出）
+        'METRICS_PORT': int(os.getenv('METRICS_PORT', '0')),
+        'METRICS_HOST': os.getenv('METRICS_HOST', '127.0.0.1'),
+        'METRICS_TEXTFILE': os.getenv('METRICS_TEXTFILE', ''),
+        'METRICS_TEXTFILE_INTERVAL': float(os.getenv('METRICS_TEXTFILE_INTERVAL', '15')),  # 秒
+
+        # 运行配置（性能档位）：fast/balanced/quality 或 RUN_PROFILES_FILE 中定义的档位，为空时使用生成器默认参数
+        'RUN_PROFILE': os.getenv('RUN_PROFILE', ''),
+        'RUN_PROFILES_FILE': os.getenv('RUN_PROFILES_FILE', ''),  # 自定义档位的JSON文件
+
+        # 请求调度配置（多个对话共享的全局并发上限）
+        'SCHEDULER_MAX_IN_FLIGHT': int(os.getenv('SCHEDULER_MAX_IN_FLIGHT', '4')),
+        'SCHEDULER_SHARED': os.getenv('SCHEDULER_SHARED', 'true').lower() == 'true',  # 未传入调度器的生成器默认共享进程级调度器
+    }
+
+
+def load_settings():
+    """加载.env文件并读取配置（只执行一次）"""
+    global _settings_loaded
+    if _settings_loaded:
+        return
+
+    # 未安装python-dotenv时只读取环境变量
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        load_dotenv = None
+    if load_dotenv is not None:
+        load_dotenv(env_path)
+
+    globals().update(_read_settings())
+    _settings_loaded = True
+
+
+def __getattr__(name: str) -> Any:
+    """首次访问配置项时加载配置"""
+    if not _settings_loaded:
+        load_settings()
+        if name in globals():
+            return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# 实时保存配置
-DEFAULT_SAVE_INTERVAL = int(os.getenv('DEFAULT_SAVE_INTERVAL', '10'))
-DEFAULT_REALTIME_SAVE = os.getenv('DEFAULT_REALTIME_SAVE', 'true').lower() == 'true'
 
 def validate_config():
     """验证配置是否有效"""
+    load_settings()
     errors = []
-    
+
     if not GOOGLE_AI_API_KEY:
         errors.append("GOOGLE_AI_API_KEY 未设置")
-    
+
     if not DEFAULT_MODEL:
         errors.append("DEFAULT_MODEL 未设置")
-    
+
     if MIN_MESSAGE_COUNT > MAX_MESSAGE_COUNT:
         errors.append("MIN_MESSAGE_COUNT 不能大于 MAX_MESSAGE_COUNT")
-    
+
     if MIN_DURATION > MAX_DURATION:
         errors.append("MIN_DURATION 不能大于 MAX_DURATION")
-    
+
     return errors
 
 def get_config_summary():
     """获取配置摘要"""
+    load_settings()
     return {
         'api_key_set': bool(GOOGLE_AI_API_KEY),
         'model': DEFAULT_MODEL,
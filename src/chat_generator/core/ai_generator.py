@@ -9,12 +9,57 @@ import os
 import json
 import time
 import random
+import uuid
 import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Union
 from dataclasses import dataclass, asdict
-import google.generativeai as genai
 from .base_generator import ChatGenerator, Character, ChatMessage
-from ..config.settings import GOOGLE_AI_API_KEY, DEFAULT_MODEL
+from .model_client import create_model
+from .profiles import RunProfile, get_profile, model_name_for_tier
+from .scheduler import RequestScheduler, get_scheduler, PRIORITY_HIGH, PRIORITY_NORMAL
+from .turn_taking import SpeakerSelector
+from .paging import generate_in_pages
+from .run_log import RunLog, load_messages, messages_from_entries, read_run_log, update_run_log
+from .fallback import FallbackComposer
+from .hedging import HedgedCaller
+from .metrics import ensure_exporter, flush_exporter, get_metrics
+from .log import get_logger
+from .reorder import ReorderBuffer
+from .prompt_builder import PromptBuilder
+from .output_writer import append_text, compressed_filename, detect_compression, write_day_shards, write_text
+from .character_library import CharacterLibrary, KIND_AI, get_character_library
+from ..config import settings
+
+log = get_logger(__name__)
+
+
+# 提示词中固定的说明文字（由 PromptBuilder 去掉缩进后发送）
+AI_CHARACTER_FIELDS = """
+请为每个角色生成以下信息：
+1. 姓名（中文）
+2. 角色身份（如：项目经理、设计师、技术专家、用户代表等）
+3. 性格特点（如：理性、感性、幽默、严肃等）
+4. 背景经历（简要描述）
+5. 专业领域（与事件相关的专长）
+6. 说话风格（如：直接、委婉、专业、通俗等）
+"""
+
+AI_CHARACTER_FORMAT = """
+请以JSON格式返回，格式如下：
+{"characters": [{"name": "角色姓名", "role": "角色身份", "personality": "性格特点",
+"background": "背景经历", "expertise": "专业领域", "speaking_style": "说话风格"}]}
+"""
+
+AI_MESSAGE_RULES = """
+要求：
+1. 消息长度控制在20-80字之间
+2. 符合角色的身份、性格和说话风格
+3. 与当前讨论事件相关
+4. 考虑对话历史，避免重复
+5. 使用中文，自然流畅
+6. 可以包含适当的语气词和表情符号
+7. 不要包含任何标记或前缀，直接输出消息内容
+"""
 
 
 @dataclass
@@ -43,17 +88,61 @@ class AICharacter:
 class AIChatGenerator:
     """AI聊天记录生成器"""
     
-    def __init__(self, api_key: str = None):
-        """初始化AI聊天生成器"""
+    def __init__(self, api_key: str = None, model: Any = None,
+                 scheduler: Optional[RequestScheduler] = None, conversation_id: str = None,
+                 character_library: Optional[CharacterLibrary] = None,
+                 profile: Union[str, RunProfile, None] = None):
+        """初始化AI聊天生成器
+
+        profile 为运行配置（档位名称或 RunProfile，未传入时使用配置中的 RUN_PROFILE），见 apply_profile
+        """
+        profile = get_profile(profile)
         # 获取API密钥：优先使用传入的，然后是环境变量，最后是配置文件
-        self.api_key = api_key or os.getenv('GOOGLE_AI_API_KEY') or GOOGLE_AI_API_KEY
+        self.api_key = api_key or os.getenv('GOOGLE_AI_API_KEY') or settings.GOOGLE_AI_API_KEY
         
-        if not self.api_key or self.api_key == "YOUR_GOOGLE_AI_API_KEY_HERE":
+        if model is None and (not self.api_key or self.api_key == "YOUR_GOOGLE_AI_API_KEY_HERE"):
             raise ValueError("请设置Google AI API密钥。请修改 config.py 文件中的 GOOGLE_AI_API_KEY 变量")
         
-        # 配置Google AI
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(DEFAULT_MODEL)
+        # 配置Google AI（传入model时直接使用，便于离线测试和基准测试）
+        # 未传入model时按档位的模型级别选择模型（FAST_MODEL / STRONG_MODEL，未配置时为 DEFAULT_MODEL）
+        self._created_model_name = None
+        if model is not None:
+            self.model = model
+        else:
+            self._created_model_name = model_name_for_tier(profile.model_tier if profile else None)
+            self.model = create_model(self.api_key, self._created_model_name)
+        self.model_name = getattr(self.model, 'model_name', None) or type(self.model).__name__
+        
+        # 每次API调用之间的间隔（秒），避免触发API限制
+        self.request_interval = 0.5
+        
+        # 慢请求对冲（HEDGE_REQUESTS，只用于逐条消息的调用）
+        self.hedger = HedgedCaller.from_settings()
+        
+        # 运行指标（进程内共享，按 conversation_id 区分，见 metrics）
+        self.metrics = get_metrics()
+        
+        # 生成消息时带上的最近对话条数
+        self.history_window = 5
+        
+        # 消息时间戳的随机抖动幅度（小时），也决定重排缓冲区的窗口
+        self.timestamp_jitter_hours = 0.05
+        
+        # 分页生成角色时每页的数量
+        self.page_size = settings.CHARACTER_PAGE_SIZE
+        
+        # 运行配置（性能档位），覆盖上面的请求间隔、历史条数和分页大小
+        self.profile: Optional[RunProfile] = None
+        self.apply_profile(profile)
+        
+        # 请求调度器：未传入时使用进程级共享调度器（SCHEDULER_SHARED=false 时不经调度器直接请求）
+        if scheduler is None and settings.SCHEDULER_SHARED:
+            scheduler = get_scheduler()
+        self.scheduler = scheduler
+        self.conversation_id = conversation_id or uuid.uuid4().hex[:8]
+        
+        # 角色库（未传入时使用 character_library.get_character_library 的共享角色库）
+        self.character_library = character_library
         
         # 初始化基础生成器
         self.base_generator = ChatGenerator()
@@ -61,59 +150,61 @@ class AIChatGenerator:
         # 存储AI角色和对话历史
         self.ai_characters: List[AICharacter] = []
         self.conversation_history: List[Dict[str, Any]] = []
+        self.run_log_path: Optional[str] = None  # 最近一次运行的JSONL日志
+        self.fallback = FallbackComposer()  # API失败时本地生成占位消息
+        self.fallback_indices: List[int] = []  # 最近一次运行中本地生成、待回填的消息序号
         self.current_event: str = ""
         self.event_context: str = ""
         
     def set_api_key(self, api_key: str):
         """设置API密钥"""
         self.api_key = api_key
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
+        self.model = create_model(self.api_key, 'gemini-pro')
+        self.model_name = 'gemini-pro'
         
+    def apply_profile(self, profile: Union[str, RunProfile, None]):
+        """应用运行配置（档位名称或 RunProfile）
+
+        设置请求间隔、历史条数和分页大小，生成对话时未指定的 realtime_save、save_interval
+        也使用档位中的值；模型由生成器自己创建时按档位的模型级别切换模型。
+        逐条生成不使用档位中的 lookahead。
+        """
+        profile = get_profile(profile)
+        if profile is None:
+            return
+        self.profile = profile
+        self.request_interval = profile.request_interval
+        self.history_window = profile.history_window
+        self.page_size = profile.page_size
+        model_name = model_name_for_tier(profile.model_tier)
+        if self._created_model_name is not None and model_name != self._created_model_name:
+            self.model = create_model(self.api_key, model_name)
+            self.model_name = getattr(self.model, 'model_name', None) or type(self.model).__name__
+            self._created_model_name = model_name
+    
     def input_event(self, event: str, context: str = ""):
         """录入事件"""
         self.current_event = event
         self.event_context = context
-        print(f"✅ 事件已录入: {event}")
+        log.info(f"✅ 事件已录入: {event}")
         if context:
-            print(f"✅ 事件背景: {context}")
+            log.info(f"✅ 事件背景: {context}")
     
-    def generate_characters_from_event(self, num_characters: int = 8) -> List[AICharacter]:
-        """基于事件生成相关角色"""
+    def generate_characters_from_event(self, num_characters: int = 8,
+                                       page_size: int = None) -> List[AICharacter]:
+        """基于事件生成相关角色（超过page_size个时分页并发生成）"""
         if not self.current_event:
             raise ValueError("请先录入事件")
         
-        prompt = f"""
-        基于以下事件，生成{num_characters}个不同的角色来参与1：
-
-        事件：{self.current_event}
-        背景：{self.event_context if self.event_context else "无特殊背景"}
-
-        请为每个角色生成以下信息：
-        1. 姓名（中文）
-        2. 角色身份（如：项目经理、设计师、技术专家、用户代表等）
-        3. 性格特点（如：理性、感性、幽默、严肃等）
-        4. 背景经历（简要描述）
-        5. 专业领域（与事件相关的专长）
-        6. 说话风格（如：直接、委婉、专业、通俗等）
-
-        请以JSON格式返回，格式如下：
-        {{
-            "characters": [
-                {{
-                    "name": "角色姓名",
-                    "role": "角色身份",
-                    "personality": "性格特点",
-                    "background": "背景经历",
-                    "expertise": "专业领域",
-                    "speaking_style": "说话风格"
-                }}
-            ]
-        }}
-        """
+        if page_size is None:
+            page_size = self.page_size
+        if num_characters > page_size:
+            return self._generate_characters_in_pages(num_characters, page_size)
+        
+        prompt = self._characters_prompt(num_characters)
         
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate_content(prompt, PRIORITY_HIGH)
             response_text = response.text.strip()
             
             # 清理和解析JSON
@@ -122,34 +213,138 @@ class AIChatGenerator:
             characters_data = data.get('characters', [])
             
             # 创建AI角色对象
-            self.ai_characters = []
-            for char_data in characters_data:
-                ai_char = AICharacter(
-                    name=char_data.get('name', ''),
-                    role=char_data.get('role', ''),
-                    personality=char_data.get('personality', ''),
-                    background=char_data.get('background', ''),
-                    expertise=char_data.get('expertise', ''),
-                    speaking_style=char_data.get('speaking_style', '')
-                )
-                self.ai_characters.append(ai_char)
+            self.ai_characters = [self._ai_character_from_dict(d) for d in characters_data]
+            self._save_to_library(self.ai_characters)
             
-            print(f"✅ 成功生成 {len(self.ai_characters)} 个AI角色")
+            log.info(f"✅ 成功生成 {len(self.ai_characters)} 个AI角色")
             for char in self.ai_characters:
-                print(f"   - {char.name} ({char.role}) - {char.personality}")
+                log.info(f"   - {char.name} ({char.role}) - {char.personality}")
             
             return self.ai_characters
             
         except json.JSONDecodeError as e:
-            print(f"❌ JSON解析失败: {e}")
-            print(f"AI返回的内容: {response_text[:200]}...")
+            log.error(f"❌ JSON解析失败: {e}")
+            log.error(f"AI返回的内容: {response_text[:200]}...")
             return self._create_default_characters()
         except Exception as e:
-            print(f"❌ 生成角色失败: {e}")
-            print(f"错误类型: {type(e).__name__}")
+            log.error(f"❌ 生成角色失败: {e}")
+            log.error(f"错误类型: {type(e).__name__}")
             # 如果AI生成失败，使用默认角色
             return self._create_default_characters()
     
+    def _characters_prompt(self, num_characters: int, exclude_names: List[str] = None,
+                           page_index: int = 0, roles: List[str] = None) -> str:
+        """构建生成角色的提示词（分页生成时附带已有的名字，避免重名）"""
+        builder = PromptBuilder()
+        builder.add(f"基于以下事件，生成{num_characters}个不同的角色来参与1：")
+        builder.add(f"事件：{self.current_event}\n背景：{self.event_context if self.event_context else '无特殊背景'}")
+        builder.add(AI_CHARACTER_FIELDS, static=True)
+        if exclude_names or page_index:
+            exclude_text = f"这是第{page_index + 1}批角色，请使用与其他批次不同的姓名和身份组合。"
+            if exclude_names:
+                exclude_text += f"以下姓名已被使用，不要重复：{'、'.join(exclude_names)}"
+            builder.add(exclude_text)
+        if roles:
+            builder.add(f"需要包含以下角色身份：{'、'.join(roles)}")
+        builder.add(AI_CHARACTER_FORMAT, static=True)
+        return builder.build()
+    
+    def _generate_characters_in_pages(self, num_characters: int, page_size: int) -> List[AICharacter]:
+        """分页并发生成大量角色，按姓名去重后合并"""
+        log.info(f"🤖 分页生成 {num_characters} 个角色（每页 {page_size} 个）...")
+        
+        characters = self._fetch_characters(num_characters, page_size)
+        if not characters:
+            log.error("❌ 分页生成角色失败，使用默认角色")
+            return self._create_default_characters()
+        
+        self.ai_characters = characters
+        self._save_to_library(self.ai_characters)
+        
+        log.info(f"✅ 成功生成 {len(self.ai_characters)} 个AI角色")
+        if len(self.ai_characters) < num_characters:
+            log.warning(f"⚠️ 去重后少于目标数量 {num_characters}")
+        return self.ai_characters
+    
+    def _fetch_characters(self, num_characters: int, page_size: int, exclude_names: List[str] = (),
+                          roles: List[str] = None) -> List[AICharacter]:
+        """分页请求角色并转换为AI角色对象（不修改当前角色列表）"""
+        def fetch_page(count: int, page_index: int, page_exclude: List[str]) -> List[Dict[str, Any]]:
+            prompt = self._characters_prompt(count, page_exclude, page_index, roles)
+            response = self._generate_content(prompt, PRIORITY_HIGH)
+            data = json.loads(self._clean_json_response(response.text.strip()))
+            return data.get('characters', [])
+        
+        characters_data = generate_in_pages(fetch_page, num_characters, page_size,
+                                            max_workers=settings.CHARACTER_PAGE_WORKERS,
+                                            exclude_names=exclude_names)
+        return [self._ai_character_from_dict(d) for d in characters_data]
+    
+    @staticmethod
+    def _ai_character_from_dict(char_data: Dict[str, Any]) -> AICharacter:
+        """从AI返回或角色库中的字典创建AI角色"""
+        return AICharacter(
+            name=char_data.get('name', ''),
+            role=char_data.get('role', ''),
+            personality=char_data.get('personality', ''),
+            background=char_data.get('background', ''),
+            expertise=char_data.get('expertise', ''),
+            speaking_style=char_data.get('speaking_style', '')
+        )
+    
+    def _get_character_library(self) -> Optional[CharacterLibrary]:
+        if self.character_library is not None:
+            return self.character_library
+        return get_character_library()
+    
+    def _save_to_library(self, characters: List[AICharacter]):
+        """把AI生成的角色存入角色库（失败不影响生成）"""
+        try:
+            library = self._get_character_library()
+            if library is not None:
+                library.add_characters(characters, KIND_AI, event=self.current_event)
+        except Exception as e:
+            log.warning(f"⚠️ 保存到角色库失败: {e}")
+    
+    def assemble_characters(self, num_characters: int = 8, roles: List[str] = None,
+                            top_up: bool = True, **filters) -> List[AICharacter]:
+        """从角色库组建角色
+        
+        roles 为必须包含的角色身份，filters 可指定 personality 等条件；
+        角色库不够时（top_up=True）只为缺少的人数和角色身份调用AI补充。
+        """
+        library = self._get_character_library()
+        if library is None:
+            return self.generate_characters_from_event(num_characters)
+        
+        picked, missing_roles = library.assemble(KIND_AI, num_characters, roles, **filters)
+        characters = [self._ai_character_from_dict(d) for d in picked]
+        log.info(f"📚 从角色库选取了 {len(characters)} 个AI角色")
+        
+        missing = num_characters - len(characters)
+        if missing > 0 and top_up:
+            if not self.current_event:
+                raise ValueError("请先录入事件")
+            log.info(f"🤖 角色库不足，补充生成 {missing} 个角色" +
+                  (f"（{'、'.join(missing_roles)}）" if missing_roles else ""))
+            try:
+                extra = self._fetch_characters(
+                    missing, self.page_size,
+                    exclude_names=[char.name for char in characters], roles=missing_roles
+                )
+            except Exception as e:
+                log.error(f"❌ 补充生成角色失败: {e}")
+                extra = []
+            self._save_to_library(extra)
+            characters.extend(extra)
+        
+        if not characters:
+            return self._create_default_characters()
+        
+        self.ai_characters = characters
+        log.info(f"✅ 共 {len(self.ai_characters)} 个AI角色")
+        return self.ai_characters
+    
     def _create_default_characters(self) -> List[AICharacter]:
         """创建默认角色（当AI生成失败时使用）"""
         default_chars = [
@@ -189,72 +384,134 @@ class AIChatGenerator:
         self.ai_characters = default_chars
         return default_chars
     
+    def _ai_message_prompt(self, character: AICharacter, context: str = "") -> str:
+        """构建生成消息的提示词（超出token上限时先删减最早的对话历史）"""
+        builder = PromptBuilder()
+        builder.add("请基于以下信息生成一条聊天消息：", static=True)
+        builder.add(
+            f"角色信息：\n"
+            f"- 姓名：{character.name}\n"
+            f"- 身份：{character.role}\n"
+            f"- 性格：{character.personality}\n"
+            f"- 背景：{character.background}\n"
+            f"- 专长：{character.expertise}\n"
+            f"- 说话风格：{character.speaking_style}"
+        )
+        builder.add(f"当前讨论事件：{self.current_event}\n"
+                    f"事件背景：{self.event_context if self.event_context else '无特殊背景'}")
+        builder.add_history(self.conversation_history[-self.history_window:])
+        builder.add(f"上下文：{context}")
+        builder.add(AI_MESSAGE_RULES, static=True)
+        builder.add("请生成消息：", static=True)
+        return builder.build()
+    
     def generate_ai_message(self, character: AICharacter, context: str = "") -> str:
         """使用AI生成单个角色的消息"""
-        # 构建角色信息
-        character_info = f"""
-        角色信息：
-        - 姓名：{character.name}
-        - 身份：{character.role}
-        - 性格：{character.personality}
-        - 背景：{character.background}
-        - 专长：{character.expertise}
-        - 说话风格：{character.speaking_style}
-        """
-        
-        # 构建对话历史
-        history_text = ""
-        if self.conversation_history:
-            history_text = "\n最近的对话历史：\n"
-            for msg in self.conversation_history[-5:]:  # 只取最近5条
-                history_text += f"- {msg['sender']}: {msg['content']}\n"
-        
-        prompt = f"""
-        请基于以下信息生成一条聊天消息：
-
-        {character_info}
-
-        当前讨论事件：{self.current_event}
-        事件背景：{self.event_context if self.event_context else "无特殊背景"}
-        
-        {history_text}
-        
-        上下文：{context}
-
-        要求：
-        1. 消息长度控制在20-80字之间
-        2. 符合角色的身份、性格和说话风格
-        3. 与当前讨论事件相关
-        4. 考虑对话历史，避免重复
-        5. 使用中文，自然流畅
-        6. 可以包含适当的语气词和表情符号
-        7. 不要包含任何标记或前缀，直接输出消息内容
+        return self._generate_ai_message(character, context)[0]
+    
+    def _generate_ai_message(self, character: AICharacter, context: str = "") -> Tuple[str, bool]:
+        """生成消息，返回 (消息, 是否为本地生成的占位消息)
 
-        请生成消息：
+        调用失败且启用降级时按讨论事件和角色性格在本地生成占位消息，之后可以回填
         """
+        if self.fallback.degraded:
+            return self.fallback.compose(character, self.current_event), True
+        
+        prompt = self._ai_message_prompt(character, context)
         
         try:
-            response = self.model.generate_content(prompt)
-            message = response.text.strip()
-            
-            # 清理消息内容
-            if message.startswith('"') and message.endswith('"'):
-                message = message[1:-1]
-            
-            return message
+            response = self._generate_content(prompt, hedge=True)
+            message = self._clean_message(response.text)
+            self.fallback.record_success()
+            return message, False
             
         except Exception as e:
-            print(f"❌ 生成消息失败: {e}")
+            log.error(f"❌ 生成消息失败: {e}", event="message.failed", sender=character.name)
+            self.fallback.record_failure()
+            if self.fallback.enabled:
+                return self.fallback.compose(character, self.current_event), True
             # 返回默认消息
-            return f"关于{self.current_event}，我觉得需要进一步讨论..."
+            return f"关于{self.current_event}，我觉得需要进一步讨论...", False
+    
+    @staticmethod
+    def _clean_message(text: str) -> str:
+        """去掉模型返回消息两端的空白和引号"""
+        message = text.strip()
+        if message.startswith('"') and message.endswith('"'):
+            message = message[1:-1]
+        return message
+    
+    def backfill_run_log(self, run_log_path: str = None) -> int:
+        """重新调用模型回填运行日志中标记为 fallback 的消息，返回回填的条数
+
+        消息按原来的序号和之前的对话历史重新生成，回填后去掉标记并记为 backfilled；
+        仍然失败的消息保持标记，可以稍后再次回填
+        """
+        path = run_log_path or self.run_log_path
+        if not path:
+            raise ValueError("没有可回填的运行日志")
+        info, entries, _ = read_run_log(path)
+        ordered = sorted(entries, key=lambda entry: entry['index'])
+        if not any(entry.get('fallback') for entry in ordered):
+            return 0
+        
+        # 角色以当前配置为准，缺少时使用运行日志中记录的
+        if not self.current_event:
+            self.current_event = info.get('event', '')
+            self.event_context = info.get('event_context', '')
+        characters = {char.name: char for char in self.ai_characters}
+        for char_data in info.get('characters', []):
+            characters.setdefault(char_data['name'], self._ai_character_from_dict(char_data))
+        
+        patched = []
+        saved_history = self.conversation_history
+        try:
+            for position, entry in enumerate(ordered):
+                character = characters.get(entry['sender'])
+                if not entry.get('fallback') or character is None:
+                    continue
+                self.conversation_history = ordered[max(0, position - self.history_window):position]
+                context = f"这是第{entry['index']+1}条消息，当前已有{entry['index']}条消息"
+                prompt = self._ai_message_prompt(character, context)
+                self.metrics.retries.inc(run=self.conversation_id, reason="backfill")
+                try:
+                    response = self._generate_content(prompt)
+                except Exception as e:
+                    log.error(f"❌ 回填第{entry['index']+1}条消息失败: {e}")
+                    continue
+                entry['content'] = self._clean_message(response.text)
+                del entry['fallback']
+                entry['backfilled'] = True
+                patched.append(entry)
+        finally:
+            self.conversation_history = saved_history
+        
+        if patched:
+            remaining = sum(1 for entry in ordered if entry.get('fallback'))
+            update_run_log(path, patched, fallback_count=remaining)
+            log.info(f"✅ 已回填 {len(patched)} 条消息，剩余 {remaining} 条待回填")
+        return len(patched)
     
     def generate_ai_conversation(self, 
                                duration_hours: float = 1.0,
                                message_count: int = 30,
                                start_time: datetime.datetime = None,
-                               realtime_save: bool = True,
-                               save_interval: int = 10) -> List[ChatMessage]:
-        """生成AI对话"""
+                               realtime_save: bool = None,
+                               save_interval: int = None,
+                               compression: str = None) -> List[ChatMessage]:
+        """生成AI对话（compression 为实时保存临时文件的压缩方式，默认使用配置）
+        
+        每次运行都写入JSONL运行日志（见 run_log），结束后路径保存在 self.run_log_path；
+        实时保存的QQ/微信临时文件由日志记录渲染。
+        realtime_save、save_interval 未指定时使用运行配置（self.profile），
+        没有运行配置时默认实时保存、每10条保存一次。
+        """
+        profile = self.profile
+        if realtime_save is None:
+            realtime_save = profile.realtime_save if profile else True
+        if save_interval is None:
+            save_interval = profile.save_interval if profile else 10
+        
         if not self.ai_characters:
             raise ValueError("请先生成角色")
         
@@ -266,48 +523,89 @@ class AIChatGenerator:
         
         self.conversation_history = []
         messages = []
+        speaker_selector = SpeakerSelector(self.ai_characters)
+        self.fallback.reset(self.event_context)
+        self.fallback_indices = []
+        
+        # 运行指标
+        ensure_exporter()
+        self.metrics.target_messages.set(message_count, run=self.conversation_id, kind="ai")
+        self.hedger.on_hedge = lambda: self.metrics.retries.inc(run=self.conversation_id, reason="hedge")
+        
+        # 运行日志（每次运行都写入，是这次运行的权威记录）
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        run_log = RunLog(os.path.join(settings.RUN_LOG_DIR, f"ai_run_{timestamp}_{self.conversation_id}.jsonl"),
+                         fsync=settings.RUN_LOG_FSYNC)
+        run_log.write_header(
+            kind="ai",
+            conversation_id=self.conversation_id,
+            event=self.current_event,
+            event_context=self.event_context,
+            model=self.model_name,
+            profile=self.profile.to_dict() if self.profile else None,
+            message_count=message_count,
+            duration_hours=duration_hours,
+            start_time=start_time.isoformat(),
+            characters=[char.to_dict() for char in self.ai_characters]
+        )
+        self.run_log_path = None
         
-        # 实时保存相关变量
+        # 实时保存的临时文件
         temp_filename_qq = None
         temp_filename_wechat = None
         if realtime_save:
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            temp_filename_qq = f"output/temp/ai_temp_qq_{timestamp}.txt"
-            temp_filename_wechat = f"output/temp/ai_temp_wechat_{timestamp}.txt"
+            temp_filename_qq = compressed_filename(
+                f"output/temp/ai_temp_qq_{timestamp}_{self.conversation_id}.txt", compression)
+            temp_filename_wechat = compressed_filename(
+                f"output/temp/ai_temp_wechat_{timestamp}_{self.conversation_id}.txt", compression)
             # 创建临时文件头部
             self._create_ai_temp_file_header(temp_filename_qq, "qq")
             self._create_ai_temp_file_header(temp_filename_wechat, "wechat")
         
-        print("🤖 开始生成AI对话...")
+        log.info("🤖 开始生成AI对话...", event="run.start", run=self.conversation_id,
+                 target=message_count)
+        if self.profile:
+            log.info(f"运行配置: {self.profile.name}", event="run.profile", **self.profile.to_dict())
+        log.info(f"运行日志: {run_log.part_filename}")
         if realtime_save:
-            print(f"实时保存: 每 {save_interval} 条消息保存一次")
-            print(f"临时文件: {temp_filename_qq}, {temp_filename_wechat}")
+            log.info(f"实时保存: 每 {save_interval} 条消息保存一次")
+            log.info(f"临时文件: {temp_filename_qq}, {temp_filename_wechat}")
+        
+        log_entries: List[Dict[str, Any]] = []  # 待写入运行日志的记录
+        status = "failed"
+        last_sender = None
+        
+        # 时间戳有抖动，先放入重排缓冲区，确定之后不会有更早的消息时再按时间顺序输出，
+        # messages、临时文件和运行日志因此都已按时间排序
+        reorder = ReorderBuffer()
+        
+        def emit(items):
+            for message, log_entry in items:
+                messages.append(message)
+                log_entries.append(log_entry)
         
         try:
             for i in range(message_count):
                 # 随机选择角色（但避免连续相同角色）
-                available_chars = self.ai_characters.copy()
-                if messages and len(messages) > 0:
-                    last_sender = messages[-1].sender
-                    available_chars = [char for char in available_chars if char.name != last_sender]
-                
-                if not available_chars:
-                    available_chars = self.ai_characters
-                
-                character = random.choice(available_chars)
+                character = speaker_selector.next_speaker(last_sender)
+                last_sender = character.name
                 
                 # 生成时间戳
                 time_progress = i / message_count
                 message_time = start_time + datetime.timedelta(
-                    hours=duration_hours * time_progress + random.uniform(-0.05, 0.05)
+                    hours=duration_hours * time_progress
+                    + random.uniform(-self.timestamp_jitter_hours, self.timestamp_jitter_hours)
                 )
                 
                 # 构建上下文
-                context = f"这是第{i+1}条消息，当前已有{len(messages)}条消息"
+                context = f"这是第{i+1}条消息，当前已有{i}条消息"
                 
                 # 生成AI消息
-                print(f"  生成第{i+1}条消息 - {character.name}...")
-                content = self.generate_ai_message(character, context)
+                log.info("  生成第%d条消息 - %s...", i + 1, character.name,
+                         event="message.generating", seq=i, index=i, sender=character.name)
+                call_start = time.perf_counter()
+                content, fallback = self._generate_ai_message(character, context)
+                call = {'model': self.model_name, 'latency': round(time.perf_counter() - call_start, 3)}
                 
                 # 创建消息对象
                 message = ChatMessage(
@@ -316,52 +614,92 @@ class AIChatGenerator:
                     timestamp=message_time
                 )
                 
-                messages.append(message)
-                
-                # 添加到对话历史
-                self.conversation_history.append({
+                # 添加到对话历史（按生成顺序）
+                history_entry = {
                     'sender': character.name,
                     'content': content,
                     'timestamp': message_time.isoformat()
-                })
+                }
+                self.conversation_history.append(history_entry)
+                self.metrics.messages.inc(run=self.conversation_id, kind="ai")
+                log_entry = {'index': i, **history_entry, 'call': call}
+                if fallback:
+                    # 本地生成的占位消息，之后可以用 backfill_run_log 回填
+                    self.fallback_indices.append(i)
+                    self.metrics.fallbacks.inc(run=self.conversation_id)
+                    log_entry['fallback'] = True
+                
+                # 之后的消息时间戳不会早于下一条的基准时间减去抖动幅度
+                reorder.push(message_time, (message, log_entry))
+                watermark = start_time + datetime.timedelta(
+                    hours=duration_hours * (i + 1) / message_count - self.timestamp_jitter_hours
+                )
+                emit(reorder.release(watermark))
                 
-                # 实时保存
-                if realtime_save and (i + 1) % save_interval == 0:
-                    self._append_to_ai_temp_files(messages[-save_interval:], temp_filename_qq, temp_filename_wechat)
-                    print(f"  💾 已保存 {i+1} 条消息到临时文件")
+                # 定期写入运行日志（实时保存时同时更新临时文件）
+                if (i + 1) % save_interval == 0:
+                    self._flush_ai_realtime(log_entries, run_log, temp_filename_qq, temp_filename_wechat)
+                    if realtime_save:
+                        log.info("  💾 已保存 %d 条消息到临时文件", i + 1, event="realtime.saved", count=i + 1)
                 
-                # 添加延迟避免API限制
-                time.sleep(0.5)
+                # 添加延迟避免API限制（降级时不调用API，不需要等待）
+                if not self.fallback.degraded:
+                    time.sleep(self.request_interval)
             
             # 保存剩余的消息
-            if realtime_save and len(messages) % save_interval != 0:
-                remaining_messages = messages[-(len(messages) % save_interval):]
-                self._append_to_ai_temp_files(remaining_messages, temp_filename_qq, temp_filename_wechat)
+            emit(reorder.drain())
+            self._flush_ai_realtime(log_entries, run_log, temp_filename_qq, temp_filename_wechat)
+            status = "completed"
             
-            # 按时间排序
-            messages.sort(key=lambda x: x.timestamp)
-            
-            print(f"✅ 成功生成 {len(messages)} 条AI对话")
+            log.info("✅ 成功生成 %d 条AI对话", len(messages), event="run.completed",
+                     run=self.conversation_id, count=len(messages))
             return messages
             
         except KeyboardInterrupt:
-            print(f"\n⚠️ 用户中断生成，已保存 {len(messages)} 条消息")
+            emit(reorder.drain())
+            log.warning("\n⚠️ 用户中断生成，已保存 %d 条消息", len(messages), event="run.interrupted",
+                        run=self.conversation_id, count=len(messages))
+            status = "interrupted"
+            # 保存尚未写入的消息
+            self._flush_ai_realtime(log_entries, run_log, temp_filename_qq, temp_filename_wechat)
             if realtime_save and messages:
-                # 保存已生成的消息
-                self._append_to_ai_temp_files(messages, temp_filename_qq, temp_filename_wechat)
-                print(f"💾 已保存到临时文件: {temp_filename_qq}, {temp_filename_wechat}")
+                log.info(f"💾 已保存到临时文件: {temp_filename_qq}, {temp_filename_wechat}")
             return messages
         except Exception as e:
-            print(f"\n❌ 生成过程中出现错误: {e}")
+            log.error(f"\n❌ 生成过程中出现错误: {e}", event="run.failed", run=self.conversation_id,
+                      count=len(messages))
+            emit(reorder.drain())
+            # 保存尚未写入的消息
+            self._flush_ai_realtime(log_entries, run_log, temp_filename_qq, temp_filename_wechat)
             if realtime_save and messages:
-                # 保存已生成的消息
-                self._append_to_ai_temp_files(messages, temp_filename_qq, temp_filename_wechat)
-                print(f"💾 已保存到临时文件: {temp_filename_qq}, {temp_filename_wechat}")
+                log.info(f"💾 已保存到临时文件: {temp_filename_qq}, {temp_filename_wechat}")
             raise
+        finally:
+            if self.fallback_indices:
+                log.warning(f"⚠️ {len(self.fallback_indices)} 条消息由本地模板生成，可用 backfill_run_log 回填",
+                            event="run.fallback", count=len(self.fallback_indices))
+            if self.hedger.hedged:
+                log.info(f"⏱️ 对冲请求 {self.hedger.hedged} 次，其中 {self.hedger.hedge_wins} 次对冲请求先返回",
+                         event="run.hedging", **self.hedger.stats())
+            self.hedger.shutdown()
+            flush_exporter()
+            summary = {'hedging': self.hedger.stats()} if self.hedger.enabled else {}
+            self.run_log_path = run_log.finalize(status, fallback_count=len(self.fallback_indices), **summary)
+            log.info(f"📝 运行日志: {self.run_log_path}", event="run.log", path=self.run_log_path, status=status)
+    
+    def _flush_ai_realtime(self, log_entries: List[Dict[str, Any]], run_log: RunLog,
+                           temp_filename_qq: Optional[str], temp_filename_wechat: Optional[str]):
+        """把尚未保存的消息写入运行日志，有临时文件时再由这批日志记录渲染追加到临时文件"""
+        if not log_entries:
+            return
+        run_log.append_messages(log_entries)
+        if temp_filename_qq:
+            self._append_to_ai_temp_files(messages_from_entries(log_entries), temp_filename_qq, temp_filename_wechat)
+        log_entries.clear()
     
     def save_ai_conversation(self, messages: List[ChatMessage], 
-                           filename: str, style: str = "qq"):
-        """保存AI对话到文件"""
+                           filename: str, style: str = "qq", compression: str = None) -> str:
+        """保存AI对话到文件（compression 为 none/gzip/zstd，默认使用配置），返回实际文件名"""
         if style == "qq":
             content = self._format_qq_style(messages)
         elif style == "wechat":
@@ -369,13 +707,28 @@ class AIChatGenerator:
         else:
             raise ValueError("不支持的格式，请使用 'qq' 或 'wechat'")
         
-        # 确保目录存在
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        filename = write_text(filename, content, compression)
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(content)
+        log.info(f"✅ AI对话已保存到: {filename}")
+        return filename
+    
+    def save_ai_conversation_by_day(self, messages: List[ChatMessage], directory: str,
+                                    style: str = "qq", compression: str = None) -> str:
+        """按天分片保存AI对话（每天一个文件，另有 manifest.json），返回manifest路径"""
+        if style == "qq":
+            render = self._format_qq_style
+        elif style == "wechat":
+            render = self._format_wechat_style
+        else:
+            raise ValueError("不支持的格式，请使用 'qq' 或 'wechat'")
         
-        print(f"✅ AI对话已保存到: {filename}")
+        manifest_filename = write_day_shards(
+            messages, directory, render, prefix=f"ai_chat_{style}", compression=compression,
+            extra={"style": style, "event": self.current_event, "conversation_id": self.conversation_id}
+        )
+        
+        log.info(f"✅ AI对话已按天分片保存到: {directory}")
+        return manifest_filename
     
     def _format_qq_style(self, messages: List[ChatMessage]) -> str:
         """格式化为QQ风格"""
@@ -446,7 +799,25 @@ class AIChatGenerator:
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(config, f, ensure_ascii=False, indent=2)
         
-        print(f"✅ AI角色配置已保存到: {filename}")
+        log.info(f"✅ AI角色配置已保存到: {filename}")
+    
+    def _generate_content(self, prompt: str, priority: int = PRIORITY_NORMAL, hedge: bool = False):
+        """调用模型生成内容，设置了调度器时经由调度器排队（hedge=True 时按 self.hedger 的策略对冲慢请求）"""
+        if hedge:
+            return self.hedger.call(self._call_model, prompt, priority)
+        return self._call_model(prompt, priority)
+    
+    def _call_model(self, prompt: str, priority: int):
+        if self.scheduler is None:
+            return self._request(prompt)
+        return self.scheduler.call(self.conversation_id, self._request, prompt, priority=priority)
+    
+    def _request(self, prompt: str):
+        """发出一次模型请求并记录指标（进行中数量、耗时、失败和token用量）"""
+        with self.metrics.track_request(self.conversation_id):
+            response = self.model.generate_content(prompt)
+        self.metrics.record_tokens(self.conversation_id, prompt, response)
+        return response
     
     def _clean_json_response(self, response_text: str) -> str:
         """清理AI返回的JSON响应"""
@@ -464,7 +835,7 @@ class AIChatGenerator:
         
         # 如果响应为空或不是JSON格式，返回默认结构
         if not response_text or not response_text.startswith('{'):
-            print("⚠️ AI返回的内容不是有效的JSON格式，使用默认数据")
+            log.warning("⚠️ AI返回的内容不是有效的JSON格式，使用默认数据")
             return '{"characters": []}'
         
         return response_text
@@ -484,11 +855,7 @@ class AIChatGenerator:
         output.append("💾 实时保存中，请勿手动编辑此文件...")
         output.append("")
         
-        # 确保目录存在
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write("\n".join(output))
+        write_text(filename, "\n".join(output), detect_compression(filename))
     
     def _append_to_ai_temp_files(self, messages: List[ChatMessage], 
                                 qq_filename: str, wechat_filename: str):
@@ -502,12 +869,8 @@ class AIChatGenerator:
             time_str = message.timestamp.strftime("%H:%M:%S")
             qq_lines.append(f"[{time_str}] {message.sender}: {message.content}")
         
-        # 确保目录存在
-        os.makedirs(os.path.dirname(qq_filename), exist_ok=True)
-        os.makedirs(os.path.dirname(wechat_filename), exist_ok=True)
-        
-        with open(qq_filename, 'a', encoding='utf-8') as f:
-            f.write("\n".join(qq_lines) + "\n")
+        # 压缩文件每次追加写入一个完整的帧
+        append_text(qq_filename, "\n".join(qq_lines) + "\n")
         
         # 微信格式
         wechat_lines = []
@@ -515,26 +878,41 @@ class AIChatGenerator:
             time_str = message.timestamp.strftime("%H:%M")
             wechat_lines.append(f"{time_str} {message.sender}\n{message.content}\n")
         
-        with open(wechat_filename, 'a', encoding='utf-8') as f:
-            f.write("\n".join(wechat_lines))
+        append_text(wechat_filename, "\n".join(wechat_lines))
     
     def finalize_ai_temp_files(self, temp_qq_filename: str, temp_wechat_filename: str,
-                              final_qq_filename: str, final_wechat_filename: str):
-        """完成AI临时文件，重命名为最终文件"""
+                              final_qq_filename: str, final_wechat_filename: str, run_log_path: str = None):
+        """完成AI临时文件：有运行日志（默认为最近一次运行的日志）时由日志渲染最终文件并删除临时文件，
+        否则把临时文件重命名为最终文件"""
         import shutil
         
+        # 临时文件是压缩的，最终文件使用同样的扩展名
+        final_qq_filename = compressed_filename(final_qq_filename, detect_compression(temp_qq_filename))
+        final_wechat_filename = compressed_filename(final_wechat_filename, detect_compression(temp_wechat_filename))
+        
+        run_log_path = run_log_path or self.run_log_path
+        if run_log_path and os.path.exists(run_log_path):
+            messages = load_messages(run_log_path)
+            self.save_ai_conversation(messages, final_qq_filename, "qq", detect_compression(temp_qq_filename))
+            self.save_ai_conversation(messages, final_wechat_filename, "wechat",
+                                      detect_compression(temp_wechat_filename))
+            for temp_filename in (temp_qq_filename, temp_wechat_filename):
+                if os.path.exists(temp_filename):
+                    os.remove(temp_filename)
+            return
+        
         if os.path.exists(temp_qq_filename):
             shutil.move(temp_qq_filename, final_qq_filename)
-            print(f"✅ AI QQ格式文件已保存到: {final_qq_filename}")
+            log.info(f"✅ AI QQ格式文件已保存到: {final_qq_filename}")
         
         if os.path.exists(temp_wechat_filename):
             shutil.move(temp_wechat_filename, final_wechat_filename)
-            print(f"✅ AI 微信格式文件已保存到: {final_wechat_filename}")
+            log.info(f"✅ AI 微信格式文件已保存到: {final_wechat_filename}")
     
     def load_characters_config(self, filename: str = "ai_characters.json"):
         """加载AI角色配置"""
         if not os.path.exists(filename):
-            print(f"❌ 配置文件不存在: {filename}")
+            log.error(f"❌ 配置文件不存在: {filename}")
             return False
         
         try:
@@ -556,11 +934,11 @@ class AIChatGenerator:
                 )
                 self.ai_characters.append(ai_char)
             
-            print(f"✅ AI角色配置已从 {filename} 加载")
+            log.info(f"✅ AI角色配置已从 {filename} 加载")
             return True
             
         except Exception as e:
-            print(f"❌ 加载配置失败: {e}")
+            log.error(f"❌ 加载配置失败: {e}")
             return False
 
 
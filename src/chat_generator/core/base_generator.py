@@ -7,8 +7,18 @@
 
 import random
 import datetime
-from typing import List
+import heapq
+import itertools
+from typing import Iterable, Iterator, List, Optional, Sequence
 from dataclasses import dataclass
+from .turn_taking import SpeakerSelector, SpeakerTurns
+from .output_writer import open_text_writer, write_lines, write_text
+from .sharding import generate_sharded, resolve_workers
+from .template_engine import DEFAULT_PERSONALITY, get_template_engine
+from .vectorized import generate_range_vectorized, resolve_vectorized
+from .log import get_logger
+
+log = get_logger(__name__)
 
 
 @dataclass
@@ -37,15 +47,26 @@ class ChatMessage:
 class ChatGenerator:
     """聊天记录生成器"""
     
-    def __init__(self):
+    def __init__(self, template_engine=None):
         self.characters: List[Character] = []
         self.messages: List[ChatMessage] = []
         self.current_topic: str = ""
         self.event_context: str = ""
         
+        # 消息模板（默认从 config/templates/*.json 加载）
+        self.template_engine = template_engine or get_template_engine()
+        self._template_tables = None
+        self._template_topic = None
+        
         # 常用表情和语气词
-        self.emojis = ["😊", "😂", "😭", "😮", "👍", "👎", "❤️", "💔", "😱", "😤", "🤔", "😴"]
-        self.interjections = ["啊", "哦", "嗯", "额", "哈哈", "嘿嘿", "呵呵", "哎", "唉", "哇"]
+        self.emojis = list(self.template_engine.emojis)
+        self.interjections = list(self.template_engine.interjections)
+        
+        # 消息时间戳的随机抖动幅度（小时）
+        self.timestamp_jitter_hours = 0.1
+        
+        # 流式生成时每段生成的消息数
+        self.stream_chunk_size = 10_000
         
     def add_character(self, character: Character):
         """添加角色"""
@@ -56,38 +77,58 @@ class ChatGenerator:
         self.current_topic = topic
         self.event_context = event_context
         
-    def generate_message_content(self, character: Character, topic: str) -> str:
-        """根据角色性格和主题生成消息内容"""
-        content_templates = [
-            f"关于{topic}，我觉得...",
-            f"说到{topic}，我想起...",
-            f"我觉得{topic}这个问题...",
-            f"对于{topic}，我的看法是...",
-            f"你们觉得{topic}怎么样？",
-            f"关于{topic}，我有不同的想法...",
-        ]
+    def compile_templates(self, topic: str):
+        """按主题编译各性格的模板查找表（生成记录前调用一次，之后每条消息只需查表）"""
+        self._template_tables = self.template_engine.compile(
+            topic, self.event_context, self.emojis, self.interjections
+        )
+        self._template_topic = topic
+        return self._template_tables
         
-        # 根据角色性格调整内容
-        if character.personality == "活泼":
-            content = random.choice(content_templates) + random.choice(self.emojis)
-        elif character.personality == "严肃":
-            content = f"关于{topic}，我认为需要认真考虑..."
-        elif character.personality == "幽默":
-            content = f"哈哈，{topic}这个话题有意思，让我想想..."
-        else:
-            content = random.choice(content_templates)
-            
-        # 添加语气词
-        if random.random() < 0.3:
-            content = random.choice(self.interjections) + "，" + content
-            
-        return content
+    def generate_message_content(self, character: Character, topic: str, rng=random) -> str:
+        """根据角色性格和主题生成消息内容（rng 为随机数来源，默认使用random模块）"""
+        tables = self._template_tables
+        if tables is None or topic != self._template_topic:
+            tables = self.compile_templates(topic)
+        
+        # 根据角色性格选择模板，没有对应性格时使用默认模板
+        table = tables.get(character.personality) or tables[DEFAULT_PERSONALITY]
+        return table.render(character, rng)
         
     def generate_chat_record(self, 
                            duration_hours: float = 1.0, 
                            message_count: int = 50,
-                           start_time: datetime.datetime = None) -> List[ChatMessage]:
-        """生成聊天记录"""
+                           start_time: datetime.datetime = None,
+                           workers: Optional[int] = None,
+                           seed: Optional[int] = None,
+                           vectorized: Optional[bool] = None) -> List[ChatMessage]:
+        """生成聊天记录
+
+        workers 为使用的进程数（默认使用配置 TEMPLATE_WORKERS，0 表示CPU核数），
+        大于1时按时间范围分片多进程生成再归并。seed 用于得到可复现的结果。
+        vectorized 为True时使用NumPy批量抽样（默认使用配置 TEMPLATE_VECTORIZED，需要安装NumPy）。
+        """
+        start_time = self._prepare_record(duration_hours, start_time)
+        workers = resolve_workers(workers, message_count)
+        vectorized = resolve_vectorized(vectorized)
+        if workers > 1:
+            self.messages = generate_sharded(self, duration_hours, message_count, start_time,
+                                             workers, seed, vectorized)
+            return self.messages
+        
+        if vectorized:
+            self.messages = generate_range_vectorized(self, 0, message_count, duration_hours,
+                                                      message_count, start_time, seed)
+            return self.messages
+        
+        rng = random if seed is None else random.Random(seed)
+        self.messages = self._generate_range(0, message_count, duration_hours, message_count,
+                                             start_time, rng)
+        return self.messages
+    
+    def _prepare_record(self, duration_hours: float,
+                        start_time: Optional[datetime.datetime]) -> datetime.datetime:
+        """检查角色和主题，返回记录的开始时间"""
         if not self.characters:
             raise ValueError("请先添加角色")
             
@@ -96,22 +137,103 @@ class ChatGenerator:
             
         if start_time is None:
             start_time = datetime.datetime.now() - datetime.timedelta(hours=duration_hours)
+        return start_time
+    
+    def iter_chat_record(self,
+                         duration_hours: float = 1.0,
+                         message_count: int = 50,
+                         start_time: datetime.datetime = None,
+                         seed: Optional[int] = None,
+                         vectorized: Optional[bool] = None) -> Iterator[ChatMessage]:
+        """按时间顺序逐条产生聊天记录，不保存到 self.messages
+
+        每次生成 stream_chunk_size 条消息，与上一段留下的消息归并后放出已经确定顺序的部分
+        （之后的消息时间戳不会早于下一段的起点减去抖动幅度），内存占用与消息总数无关。
+        各段共用同一个发言人选择器，接着上一段的最后一位发言人继续选择。
+        """
+        start_time = self._prepare_record(duration_hours, start_time)
+        vectorized = resolve_vectorized(vectorized)
+        rng = random if seed is None else random.Random(seed)
+        chunk_size = max(1, self.stream_chunk_size)
+        timestamp = lambda message: message.timestamp
+        pending: List[ChatMessage] = []
+        turns = SpeakerTurns(SpeakerSelector(self.characters))
+        
+        for begin in range(0, message_count, chunk_size):
+            end = min(begin + chunk_size, message_count)
+            if vectorized:
+                chunk = generate_range_vectorized(self, begin, end, duration_hours, message_count,
+                                                  start_time, rng.getrandbits(64), turns)
+            else:
+                chunk = self._generate_range(begin, end, duration_hours, message_count,
+                                             start_time, rng, turns)
+            pending = list(heapq.merge(pending, chunk, key=timestamp)) if pending else chunk
             
-        self.messages = []
+            # 只保留抖动窗口内可能与下一段交错的消息
+            watermark = start_time + datetime.timedelta(
+                hours=duration_hours * end / message_count - self.timestamp_jitter_hours
+            )
+            cut = len(pending)
+            while cut and pending[cut - 1].timestamp >= watermark:
+                cut -= 1
+            yield from pending[:cut]
+            pending = pending[cut:]
+        
+        yield from pending
+    
+    def generate_to_file(self, filename: str, style: str = "qq",
+                         duration_hours: float = 1.0,
+                         message_count: int = 50,
+                         start_time: datetime.datetime = None,
+                         seed: Optional[int] = None,
+                         vectorized: Optional[bool] = None,
+                         compression: str = None) -> str:
+        """边生成边写入文件（日期分隔行随消息写出），内存占用与消息总数无关，返回实际文件名
+
+        输出与 generate_chat_record 之后 save_to_file 的格式相同，但不保存到 self.messages
+        """
+        if style not in ("qq", "wechat"):
+            raise ValueError("不支持的格式，请使用 'qq' 或 'wechat'")
+        
+        messages = self.iter_chat_record(duration_hours, message_count, start_time, seed, vectorized)
+        with open_text_writer(filename, compression) as (f, filename):
+            write_lines(f, self._iter_formatted_lines(messages, style))
+        
+        log.info(f"聊天记录已保存到: {filename}")
+        return filename
+        
+    def _generate_range(self, begin: int, end: int, duration_hours: float, message_count: int,
+                        start_time: datetime.datetime, rng=random,
+                        turns: Optional[SpeakerTurns] = None,
+                        speakers: Optional[Sequence[int]] = None) -> List[ChatMessage]:
+        """生成第 begin 到 end-1 条消息（时间戳按在整段记录中的位置计算），按时间排序返回
+
+        turns 为分段生成时各段共用的发言人状态，未传入时从这一段开始重新选择；
+        speakers 为事先抽好的这一段发言人下标（多进程分片时使用），给出时不再抽取发言人
+        """
+        # 表情、语气词或事件背景可能已修改，每段记录重新编译一次模板
+        self.compile_templates(self.current_topic)
+        messages = []
+        if turns is None and speakers is None:
+            turns = SpeakerTurns(SpeakerSelector(self.characters))
         
         # 生成消息
-        for i in range(message_count):
-            # 随机选择发送者
-            sender = random.choice(self.characters)
+        for i in range(begin, end):
+            # 随机选择发送者（避免连续相同发送者）
+            if speakers is not None:
+                sender = self.characters[speakers[i - begin]]
+            else:
+                sender = self.characters[turns.next_index(rng.random)]
             
             # 生成时间戳（在时间范围内随机分布）
             time_progress = i / message_count
             message_time = start_time + datetime.timedelta(
-                hours=duration_hours * time_progress + random.uniform(-0.1, 0.1)
+                hours=duration_hours * time_progress
+                + rng.uniform(-self.timestamp_jitter_hours, self.timestamp_jitter_hours)
             )
             
             # 生成消息内容
-            content = self.generate_message_content(sender, self.current_topic)
+            content = self.generate_message_content(sender, self.current_topic, rng)
             
             # 创建消息
             message = ChatMessage(
@@ -120,76 +242,55 @@ class ChatGenerator:
                 timestamp=message_time
             )
             
-            self.messages.append(message)
+            messages.append(message)
             
         # 按时间排序
-        self.messages.sort(key=lambda x: x.timestamp)
+        messages.sort(key=lambda x: x.timestamp)
         
-        return self.messages
+        return messages
         
-    def format_qq_style(self) -> str:
-        """格式化为QQ风格"""
-        if not self.messages:
-            return "暂无聊天记录"
-            
-        output = []
-        output.append("=" * 50)
-        output.append(f"群聊记录 - {self.current_topic}")
+    def _iter_formatted_lines(self, messages: Iterable[ChatMessage], style: str) -> Iterator[str]:
+        """逐行产生QQ/微信风格的文本，遇到新的日期时输出日期分隔行"""
+        messages = iter(messages)
+        first = next(messages, None)
+        if first is None:
+            yield "暂无聊天记录"
+            return
+        
+        title = "群聊记录" if style == "qq" else "微信群聊"
+        yield "=" * 50
+        yield f"{title} - {self.current_topic}"
         if self.event_context:
-            output.append(f"事件背景: {self.event_context}")
-        output.append("=" * 50)
-        output.append("")
+            yield f"事件背景: {self.event_context}"
+        yield "=" * 50
+        yield ""
         
         current_date = None
-        for message in self.messages:
+        for message in itertools.chain((first,), messages):
             # 检查是否需要显示日期
             message_date = message.timestamp.date()
             if current_date != message_date:
                 current_date = message_date
-                output.append(f"\n{current_date.strftime('%Y年%m月%d日')}")
-                output.append("-" * 30)
+                yield f"\n{current_date.strftime('%Y年%m月%d日')}"
+                yield "-" * 30
                 
-            # 格式化时间
-            time_str = message.timestamp.strftime("%H:%M:%S")
-            
             # 格式化消息
-            output.append(f"[{time_str}] {message.sender}: {message.content}")
-            
-        return "\n".join(output)
+            if style == "qq":
+                yield f"[{message.timestamp.strftime('%H:%M:%S')}] {message.sender}: {message.content}"
+            else:
+                yield f"{message.timestamp.strftime('%H:%M')} {message.sender}\n{message.content}"
+                yield ""
+        
+    def format_qq_style(self) -> str:
+        """格式化为QQ风格"""
+        return "\n".join(self._iter_formatted_lines(self.messages, "qq"))
         
     def format_wechat_style(self) -> str:
         """格式化为微信风格"""
-        if not self.messages:
-            return "暂无聊天记录"
-            
-        output = []
-        output.append("=" * 50)
-        output.append(f"微信群聊 - {self.current_topic}")
-        if self.event_context:
-            output.append(f"事件背景: {self.event_context}")
-        output.append("=" * 50)
-        output.append("")
-        
-        current_date = None
-        for message in self.messages:
-            # 检查是否需要显示日期
-            message_date = message.timestamp.date()
-            if current_date != message_date:
-                current_date = message_date
-                output.append(f"\n{current_date.strftime('%Y年%m月%d日')}")
-                output.append("-" * 30)
-                
-            # 格式化时间
-            time_str = message.timestamp.strftime("%H:%M")
-            
-            # 格式化消息
-            output.append(f"{time_str} {message.sender}\n{message.content}")
-            output.append("")
-            
-        return "\n".join(output)
+        return "\n".join(self._iter_formatted_lines(self.messages, "wechat"))
         
-    def save_to_file(self, filename: str, style: str = "qq"):
-        """保存聊天记录到文件"""
+    def save_to_file(self, filename: str, style: str = "qq", compression: str = None) -> str:
+        """保存聊天记录到文件（compression 为 none/gzip/zstd，默认使用配置），返回实际文件名"""
         if style == "qq":
             content = self.format_qq_style()
         elif style == "wechat":
@@ -197,14 +298,10 @@ class ChatGenerator:
         else:
             raise ValueError("不支持的格式，请使用 'qq' 或 'wechat'")
         
-        # 确保目录存在
-        import os
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-            
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(content)
+        filename = write_text(filename, content, compression)
             
-        print(f"聊天记录已保存到: {filename}")
+        log.info(f"聊天记录已保存到: {filename}")
+        return filename
 
 
 def create_sample_characters() -> List[Character]:
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+角色库
+用SQLite保存生成过的角色，按角色身份、部门、级别和性格特点建立索引，
+后续运行可以直接从角色库挑选角色，只为缺少的角色调用AI补充
+
+性格是"果断、冲动"这样的特点列表，包含匹配（LIKE '%冲动%'）用不上索引，
+因此入库时把性格拆成单个特点存入 character_traits 表，按特点精确匹配走 (kind, trait) 主键
+"""
+
+import re
+import json
+import sqlite3
+import threading
+import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 角色类型
+KIND_AI = "ai"
+KIND_PLANNING = "planning"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS characters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    role TEXT NOT NULL DEFAULT '',
+    department TEXT NOT NULL DEFAULT '',
+    level TEXT NOT NULL DEFAULT '',
+    personality TEXT NOT NULL DEFAULT '',
+    event TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    UNIQUE (kind, name, role, department)
+);
+CREATE INDEX IF NOT EXISTS idx_characters_role ON characters (kind, role);
+CREATE INDEX IF NOT EXISTS idx_characters_department ON characters (kind, department);
+CREATE INDEX IF NOT EXISTS idx_characters_level ON characters (kind, level);
+CREATE TABLE IF NOT EXISTS character_traits (
+    kind TEXT NOT NULL,
+    trait TEXT NOT NULL,
+    character_id INTEGER NOT NULL,
+    PRIMARY KEY (kind, trait, character_id)
+) WITHOUT ROWID;
+DROP INDEX IF EXISTS idx_characters_personality;
+"""
+
+# 性格特点之间的分隔符
+_TRAIT_SEPARATORS = re.compile(r"[、，,；;/\s]+")
+
+
+def split_traits(personality: str) -> List[str]:
+    """把性格描述拆成单个特点（去掉空项和重复项）"""
+    return list(dict.fromkeys(trait for trait in _TRAIT_SEPARATORS.split(personality or "") if trait))
+
+
+class CharacterLibrary:
+    """SQLite角色库（线程安全，path为":memory:"时只保存在内存中）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+            self._backfill_traits()
+
+    def _backfill_traits(self):
+        """为旧版本角色库（没有 character_traits 表）中的角色补建性格特点"""
+        rows = self._conn.execute(
+            "SELECT id, kind, personality FROM characters WHERE personality != '' AND id NOT IN "
+            "(SELECT character_id FROM character_traits)"
+        ).fetchall()
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO character_traits (kind, trait, character_id) VALUES (?, ?, ?)",
+            [(row["kind"], trait, row["id"]) for row in rows for trait in split_traits(row["personality"])]
+        )
+
+    def add_characters(self, characters: Iterable[Any], kind: str, event: str = "") -> int:
+        """保存角色（角色对象需有to_dict方法，也可以直接传字典），返回新增数量"""
+        now = datetime.datetime.now().isoformat(timespec="seconds")
+        rows = []
+        for char in characters:
+            data = char.to_dict() if hasattr(char, "to_dict") else dict(char)
+            if not data.get("name"):
+                continue
+            rows.append((
+                kind, data["name"], data.get("role", ""), data.get("department", ""),
+                data.get("level", ""), data.get("personality", ""), event,
+                json.dumps(data, ensure_ascii=False), now
+            ))
+
+        added = 0
+        with self._lock, self._conn:
+            for row in rows:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO characters "
+                    "(kind, name, role, department, level, personality, event, data, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    row
+                )
+                if cursor.rowcount != 1:
+                    continue
+                added += 1
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO character_traits (kind, trait, character_id) VALUES (?, ?, ?)",
+                    [(kind, trait, cursor.lastrowid) for trait in split_traits(row[5])]
+                )
+        return added
+
+    def find(self, kind: str, role: str = None, department: str = None, level: str = None,
+             personality: str = None, exclude_names: Iterable[str] = (),
+             limit: Optional[int] = None, shuffle: bool = True) -> List[Dict[str, Any]]:
+        """查询角色
+
+        role、department、level 精确匹配（走索引）；personality 按性格特点精确匹配（走 character_traits
+        的主键），如 "冲动" 匹配性格为 "果断、冲动" 的角色，给出多个特点时要求全部具备；
+        exclude_names 中的名字不会返回。返回角色字典列表（与 to_dict 格式相同）。
+        """
+        sql = "SELECT data FROM characters WHERE kind = ?"
+        params: List[Any] = [kind]
+        for column, value in (("role", role), ("department", department), ("level", level)):
+            if value:
+                sql += f" AND {column} = ?"
+                params.append(value)
+        for trait in split_traits(personality):
+            sql += " AND id IN (SELECT character_id FROM character_traits WHERE kind = ? AND trait = ?)"
+            params.extend((kind, trait))
+        exclude_names = list(exclude_names)
+        if exclude_names:
+            sql += f" AND name NOT IN ({', '.join('?' * len(exclude_names))})"
+            params.extend(exclude_names)
+        sql += " ORDER BY RANDOM()" if shuffle else " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def assemble(self, kind: str, count: int, roles: Optional[List[str]] = None,
+                 **filters) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """从角色库组建一组不重名的角色
+
+        指定 roles 时每个角色身份各取一人，其余名额随机挑选；filters 为 find 的
+        department/level/personality 等筛选条件（角色身份通过 roles 指定）；
+        返回 (角色字典列表, 角色库中找不到的角色身份列表)。
+        """
+        if "role" in filters:
+            raise ValueError("按角色身份组建请使用 roles 参数，不能在筛选条件中指定 role")
+        reserved = sorted({"exclude_names", "limit"} & set(filters))
+        if reserved:
+            raise ValueError(f"组建角色时不能指定 {', '.join(reserved)}")
+
+        picked: List[Dict[str, Any]] = []
+        names: List[str] = []
+        missing_roles: List[str] = []
+
+        for role in roles or []:
+            if len(picked) >= count:
+                break
+            found = self.find(kind, role=role, exclude_names=names, limit=1, **filters)
+            if found:
+                picked.extend(found)
+                names.append(found[0]["name"])
+            else:
+                missing_roles.append(role)
+
+        # 为缺少的角色身份留出名额
+        remaining = count - len(picked) - len(missing_roles)
+        if remaining > 0:
+            picked.extend(self.find(kind, exclude_names=names, limit=remaining, **filters))
+
+        return picked, missing_roles
+
+    def count(self, kind: str = None) -> int:
+        """角色数量"""
+        with self._lock:
+            if kind:
+                row = self._conn.execute("SELECT COUNT(*) FROM characters WHERE kind = ?", (kind,)).fetchone()
+            else:
+                row = self._conn.execute("SELECT COUNT(*) FROM characters").fetchone()
+        return row[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+_shared_library: Optional[CharacterLibrary] = None
+_shared_lock = threading.Lock()
+
+
+def get_character_library() -> Optional[CharacterLibrary]:
+    """获取进程级共享角色库（按配置创建，CHARACTER_LIBRARY_ENABLED 为 false 时返回 None）"""
+    global _shared_library
+    with _shared_lock:
+        if _shared_library is None:
+            from ..config import settings
+            if not settings.CHARACTER_LIBRARY_ENABLED:
+                return None
+            _shared_library = CharacterLibrary(settings.CHARACTER_LIBRARY_PATH)
+        return _shared_library
+
+
+def set_character_library(library: Optional[CharacterLibrary]):
+    """替换进程级共享角色库"""
+    global _shared_library
+    with _shared_lock:
+        _shared_library = library
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地降级生成
+API调用失败（配额耗尽、服务不可用）时，用基础生成器的模板机制按阶段和角色性格
+在本地生成占位消息，保持对话的时间线和生成速度；这些消息在运行日志中标记为 fallback，
+之后可以用生成器的 backfill_run_log 重新调用模型回填。
+
+连续失败达到 FALLBACK_AFTER_FAILURES 次后进入降级状态，FALLBACK_COOLDOWN 秒内
+不再调用API、直接本地生成，冷却结束后再试探一次。
+"""
+
+import time
+import random
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .base_generator import ChatGenerator, Character
+from .template_engine import DEFAULT_PERSONALITY, TEMPLATES_DIR, TemplateEngine
+from .log import get_logger
+
+log = get_logger(__name__)
+
+# 降级模板包目录（不会被基础生成器加载）
+FALLBACK_TEMPLATES_DIR = TEMPLATES_DIR / 'fallback'
+
+
+def fallback_pack_paths() -> List[Path]:
+    """内置降级模板包和配置 FALLBACK_TEMPLATE_PACKS 中额外指定的模板包（逗号分隔）"""
+    from ..config import settings
+    extra = [p.strip() for p in (settings.FALLBACK_TEMPLATE_PACKS or "").split(",") if p.strip()]
+    return sorted(FALLBACK_TEMPLATES_DIR.glob("*.json")) + [Path(p) for p in extra]
+
+
+class FallbackComposer:
+    """降级消息生成器，同时记录连续失败次数决定是否跳过API"""
+
+    def __init__(self, template_engine: Optional[TemplateEngine] = None,
+                 after_failures: Optional[int] = None, cooldown: Optional[float] = None):
+        from ..config import settings
+        self.enabled = settings.FALLBACK_ENABLED
+        self.after_failures = settings.FALLBACK_AFTER_FAILURES if after_failures is None else after_failures
+        self.cooldown = settings.FALLBACK_COOLDOWN if cooldown is None else cooldown
+        self._template_engine = template_engine
+        self._generator: Optional[ChatGenerator] = None
+        self._personality_keys: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.count = 0
+        self._failures = 0
+        self._degraded_until = 0.0
+
+    def reset(self, event_context: str = ""):
+        """每次运行开始时重置计数和降级状态"""
+        with self._lock:
+            self.count = 0
+            self._failures = 0
+            self._degraded_until = 0.0
+        generator = self._get_generator()
+        if generator.event_context != event_context:
+            generator.event_context = event_context
+            generator._template_tables = None
+
+    def _get_generator(self) -> ChatGenerator:
+        if self._generator is None:
+            engine = self._template_engine or TemplateEngine.from_files(fallback_pack_paths())
+            self._generator = ChatGenerator(template_engine=engine)
+        return self._generator
+
+    def _personality_key(self, personality: str) -> str:
+        """把角色的性格描述（如"狡猾、多疑"）对应到模板包中的性格"""
+        key = self._personality_keys.get(personality)
+        if key is None:
+            keys = self._get_generator().template_engine.personalities
+            key = next((k for k in keys if k != DEFAULT_PERSONALITY and k in personality), DEFAULT_PERSONALITY)
+            self._personality_keys[personality] = key
+        return key
+
+    def compose(self, character: Any, topic: str, rng=random) -> str:
+        """为角色生成一条占位消息（topic 为当前阶段或讨论事件）"""
+        speaker = Character(name=character.name, personality=self._personality_key(character.personality))
+        with self._lock:
+            self.count += 1
+            return self._get_generator().generate_message_content(speaker, topic, rng)
+
+    @property
+    def degraded(self) -> bool:
+        """是否处于降级状态（此时直接本地生成，不调用API）"""
+        return self.enabled and time.monotonic() < self._degraded_until
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.after_failures and self._failures >= self.after_failures:
+                if not self.degraded:
+                    log.warning(f"⚠️ 连续 {self._failures} 次调用失败，{self.cooldown:.0f} 秒内使用本地模板生成",
+                                event="fallback.degraded", failures=self._failures, cooldown=self.cooldown)
+                self._degraded_until = time.monotonic() + self.cooldown
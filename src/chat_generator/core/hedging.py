@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对冲请求
+长时间运行时少数消息调用的耗时是中位数的十倍以上，串行生成时会拖住整个循环。
+启用后记录最近的调用耗时，一次调用超过观测到的p95耗时仍未返回时再发一个相同的请求，
+先返回的结果生效，另一个请求未开始时取消、已开始时丢弃结果。
+
+配额：已开始的请求无法取消，落败的请求仍会执行完并计入API配额，因此每次对冲都多消耗一次请求，
+最坏情况下总请求数为 调用数 × (1 + max_rate)。落败请求返回前仍占用对冲名额：
+已发出的对冲数加上仍在执行的落败请求数不超过总调用数的 max_rate，慢请求扎堆时不会越发越多。
+"""
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+
+class HedgedCaller:
+    """对冲调用：慢于p95的调用再发一次，先返回者生效"""
+
+    def __init__(self, enabled: bool = False, percentile: float = 0.95, max_rate: float = 0.05,
+                 min_samples: int = 20, window: int = 200, max_workers: int = 16):
+        """
+        percentile: 超过最近调用耗时的这一分位数时发出对冲请求
+        max_rate: 对冲请求数占总调用数的上限
+        min_samples: 至少记录这么多次调用耗时后才开始对冲
+        window: 计算分位数使用的最近调用次数
+        max_workers: 执行调用的线程数（被丢弃的慢请求在返回前仍占用线程）
+        """
+        self.enabled = enabled
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self.max_workers = max_workers
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.on_hedge: Optional[Callable[[], None]] = None  # 每次发出对冲请求时调用（用于指标统计）
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.losers_in_flight = 0  # 已有结果但仍在执行（无法取消）的落败请求数
+
+    @classmethod
+    def from_settings(cls) -> "HedgedCaller":
+        """按配置中的 HEDGE_* 创建"""
+        from ..config import settings
+        return cls(enabled=settings.HEDGE_REQUESTS, percentile=settings.HEDGE_PERCENTILE,
+                   max_rate=settings.HEDGE_MAX_RATE, min_samples=settings.HEDGE_MIN_SAMPLES)
+
+    def hedge_delay(self) -> Optional[float]:
+        """发出对冲请求前等待的秒数（样本不足时为None）"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))]
+
+    def _record(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def _reserve_hedge(self) -> bool:
+        """未超过对冲比例上限时占用一个对冲名额（仍在执行的落败请求也占用名额）"""
+        with self._lock:
+            if self.hedged + self.losers_in_flight + 1 > self.max_rate * self.calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def _track_loser(self, future):
+        """记录无法取消的落败请求，执行完后释放其占用的对冲名额"""
+        with self._lock:
+            self.losers_in_flight += 1
+        future.add_done_callback(self._loser_done)
+
+    def _loser_done(self, future):
+        with self._lock:
+            self.losers_in_flight -= 1
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="hedged-call")
+            return self._executor
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """调用 func，超过p95耗时仍未返回时对冲（未启用时直接调用）"""
+        if not self.enabled:
+            return func(*args, **kwargs)
+
+        with self._lock:
+            self.calls += 1
+        delay = self.hedge_delay()
+        start = time.perf_counter()
+        if delay is None:
+            # 样本不足，直接调用并记录耗时
+            result = func(*args, **kwargs)
+            self._record(time.perf_counter() - start)
+            return result
+
+        executor = self._get_executor()
+        primary = executor.submit(func, *args, **kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._reserve_hedge():
+            result = primary.result()
+            self._record(time.perf_counter() - start)
+            return result
+
+        if self.on_hedge is not None:
+            self.on_hedge()
+        hedge = executor.submit(func, *args, **kwargs)
+        remaining = [primary, hedge]
+        error: Optional[BaseException] = None
+        while remaining:
+            done, _ = wait(remaining, return_when=FIRST_COMPLETED)
+            for future in [f for f in remaining if f in done]:
+                remaining.remove(future)
+                error = future.exception()
+                if error is None:
+                    for other in remaining:
+                        if not other.cancel():
+                            self._track_loser(other)
+                    if future is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    self._record(time.perf_counter() - start)
+                    return future.result()
+        # 两个请求都失败时抛出后完成的那个错误
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        """调用次数、对冲次数、对冲请求先返回的次数、仍在执行的落败请求数和当前的对冲等待时间"""
+        delay = self.hedge_delay()
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'hedged': self.hedged,
+                'hedge_wins': self.hedge_wins,
+                'losers_in_flight': self.losers_in_flight,
+                'hedge_delay': None if delay is None else round(delay, 3),
+            }
+
+    def shutdown(self):
+        """关闭线程池（不等待被丢弃的慢请求）"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志
+生成器和配置生成器的状态输出统一走包的根日志器（ROOT_LOGGER）：
+- 按 LOG_LEVEL 过滤，LOG_QUIET 时只输出警告和错误
+- LOG_FORMAT=json 时每行输出一个JSON对象（时间、级别、事件名和附加字段），便于日志系统采集
+- 生成循环里的高频事件按事件名采样，每 N 条只输出一条（警告和错误不采样）
+
+文本格式只输出消息本身，和原来的 print 输出一致。
+未显式调用 configure_logging 时，第一次输出日志前按配置自动初始化。
+"""
+
+import sys
+import json
+import logging
+import datetime
+import threading
+from typing import Any, Dict, Optional
+
+# 包的根日志器（按 chat_generator 或 src.chat_generator 导入时分别为对应的包名）
+ROOT_LOGGER = __name__.rsplit(".core.log", 1)[0]
+
+# 高频事件的默认采样率（每 N 条输出一条），可以用 LOG_SAMPLE_RATES 覆盖
+DEFAULT_SAMPLE_RATES: Dict[str, int] = {
+    "message.generating": 10,
+    "planning.progress": 100,
+}
+
+_configured = False
+_config_lock = threading.Lock()
+_sample_rates: Dict[str, int] = dict(DEFAULT_SAMPLE_RATES)
+_sample_counters: Dict[str, int] = {}
+_sample_lock = threading.Lock()
+
+
+def parse_sample_rates(value: str) -> Dict[str, int]:
+    """解析 "event=N,event=N" 形式的采样率配置（忽略格式不对的项）"""
+    rates = {}
+    for item in (value or "").split(","):
+        event, sep, rate = item.partition("=")
+        if sep and event.strip() and rate.strip().isdigit():
+            rates[event.strip()] = max(1, int(rate.strip()))
+    return rates
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """输出到当前的 sys.stdout（测试和基准测试会临时替换 sys.stdout）"""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": getattr(record, "event", None),
+            "message": record.getMessage().strip(),
+        }
+        data.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None,
+                      quiet: Optional[bool] = None, sample_rates: Optional[Dict[str, int]] = None,
+                      force: bool = False):
+    """
+    初始化包的根日志器（参数为None时使用配置中的 LOG_*）
+    已经初始化过时只有 force=True 才会重新初始化
+    """
+    global _configured, _sample_rates
+    with _config_lock:
+        if _configured and not force:
+            return
+        from ..config import settings
+        level = (level or settings.LOG_LEVEL or "INFO").upper()
+        fmt = (fmt or settings.LOG_FORMAT or "text").lower()
+        quiet = settings.LOG_QUIET if quiet is None else quiet
+        if sample_rates is None:
+            sample_rates = {**DEFAULT_SAMPLE_RATES, **parse_sample_rates(settings.LOG_SAMPLE_RATES)}
+
+        handler = _StdoutHandler()
+        handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter("%(message)s"))
+        logger = logging.getLogger(ROOT_LOGGER)
+        for old in list(logger.handlers):
+            logger.removeHandler(old)
+        logger.addHandler(handler)
+        logger.propagate = False
+        numeric_level = logging.getLevelName(level)
+        if not isinstance(numeric_level, int):
+            numeric_level = logging.INFO
+        logger.setLevel(max(numeric_level, logging.WARNING) if quiet else numeric_level)
+
+        _sample_rates = dict(sample_rates)
+        with _sample_lock:
+            _sample_counters.clear()
+        _configured = True
+
+
+class EventLogger:
+    """带事件名、附加字段和采样的日志器"""
+
+    def __init__(self, name: str):
+        self.logger = logging.getLogger(name)
+
+    def _sampled(self, event: Optional[str], seq: Optional[int]) -> bool:
+        """高频事件每 N 条只输出一条；给出 seq 时按序号采样，否则按事件计数"""
+        rate = _sample_rates.get(event, 1) if event else 1
+        if rate <= 1:
+            return True
+        if seq is None:
+            with _sample_lock:
+                seq = _sample_counters.get(event, 0)
+                _sample_counters[event] = seq + 1
+        return seq % rate == 0
+
+    def _log(self, level: int, msg: str, args, event: Optional[str], seq: Optional[int],
+             exc_info: Any, fields: Dict[str, Any]):
+        if not _configured:
+            configure_logging()
+        if not self.logger.isEnabledFor(level):
+            return
+        if level < logging.WARNING and not self._sampled(event, seq):
+            return
+        if event in _sample_rates and _sample_rates[event] > 1:
+            fields["sample_rate"] = _sample_rates[event]
+        self.logger.log(level, msg, *args, exc_info=exc_info,
+                        extra={"event": event, "fields": fields})
+
+    def debug(self, msg: str, *args, event: Optional[str] = None, seq: Optional[int] = None, **fields):
+        self._log(logging.DEBUG, msg, args, event, seq, None, fields)
+
+    def info(self, msg: str, *args, event: Optional[str] = None, seq: Optional[int] = None, **fields):
+        self._log(logging.INFO, msg, args, event, seq, None, fields)
+
+    def warning(self, msg: str, *args, event: Optional[str] = None, seq: Optional[int] = None, **fields):
+        self._log(logging.WARNING, msg, args, event, seq, None, fields)
+
+    def error(self, msg: str, *args, event: Optional[str] = None, exc_info: Any = None, **fields):
+        self._log(logging.ERROR, msg, args, event, None, exc_info, fields)
+
+
+def get_logger(name: str) -> EventLogger:
+    """获取模块日志器（name 通常为 __name__，位于 ROOT_LOGGER 之下）"""
+    return EventLogger(name)
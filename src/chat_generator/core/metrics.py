@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标
+长时间运行的批量生成任务以Prometheus文本格式导出指标，供本地监控抓取：
+
+- METRICS_PORT 不为0时在 METRICS_HOST:METRICS_PORT/metrics 提供HTTP端点
+- METRICS_TEXTFILE 不为空时每隔 METRICS_TEXTFILE_INTERVAL 秒原子写入文本文件
+  （node_exporter 的 textfile collector 方式），运行结束时再写一次
+
+指标在进程内共享（见 get_metrics），按运行（conversation_id）打标签。
+只使用标准库，不依赖 prometheus_client。
+"""
+
+import os
+import time
+import threading
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .log import get_logger
+
+log = get_logger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 请求耗时直方图的分桶（秒）
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """带标签的指标（按标签值分别计数）"""
+
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.label_names}，收到 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def get(self, **labels) -> Any:
+        """当前值（测试和汇总使用）"""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def remove(self, **labels):
+        """删除一组标签的值"""
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                    for key, value in sorted(self._values.items())]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """只增不减的计数"""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """可增可减的当前值"""
+
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """按分桶统计的分布（每组标签记录各桶计数、总和和次数）"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][index] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def get(self, **labels) -> Dict[str, Any]:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return {"count": 0, "sum": 0.0} if state is None else {"count": state["count"], "sum": state["sum"]}
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, state["buckets"]):
+                    cumulative += count
+                    labels = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(round(state['sum'], 6))}")
+                lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表，负责渲染Prometheus文本格式"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+    def write_textfile(self, filename: str):
+        """原子写入文本文件（先写临时文件再重命名，抓取时不会读到写了一半的内容）"""
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(temp_filename, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(temp_filename, filename)
+
+
+class GeneratorMetrics:
+    """生成器使用的指标集合"""
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.messages = r.register(Counter(
+            "chat_generator_messages_total", "已生成的消息数", ("run", "kind")))
+        self.target_messages = r.register(Gauge(
+            "chat_generator_target_messages", "本次运行的目标消息数", ("run", "kind")))
+        self.in_flight = r.register(Gauge(
+            "chat_generator_requests_in_flight", "进行中的模型请求数", ("run",)))
+        self.latency = r.register(Histogram(
+            "chat_generator_request_latency_seconds", "模型请求耗时（秒）", ("run",)))
+        self.errors = r.register(Counter(
+            "chat_generator_request_errors_total", "失败的模型请求数", ("run",)))
+        self.retries = r.register(Counter(
+            "chat_generator_retries_total", "为同一条消息再次发出的请求数（对冲、回填）", ("run", "reason")))
+        self.fallbacks = r.register(Counter(
+            "chat_generator_fallback_messages_total", "由本地模板生成、待回填的消息数", ("run",)))
+        self.tokens = r.register(Counter(
+            "chat_generator_tokens_total", "提示词和回复的token数（没有用量信息时为估算值）", ("run", "direction")))
+        self.phase = r.register(Gauge(
+            "chat_generator_current_phase", "当前阶段（值为1的标签）", ("run", "phase")))
+        self._phases: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def set_phase(self, run: str, phase: str):
+        """记录运行的当前阶段（只保留最新的阶段标签）"""
+        with self._lock:
+            previous = self._phases.get(run)
+            self._phases[run] = phase
+        if previous is not None and previous != phase:
+            self.phase.remove(run=run, phase=previous)
+        self.phase.set(1, run=run, phase=phase)
+
+    @contextlib.contextmanager
+    def track_request(self, run: str):
+        """统计一次模型请求的进行中数量、耗时和失败"""
+        self.in_flight.inc(run=run)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.errors.inc(run=run)
+            raise
+        finally:
+            self.in_flight.dec(run=run)
+            self.latency.observe(time.perf_counter() - start, run=run)
+
+    def record_tokens(self, run: str, prompt: str, response: Any):
+        """记录token用量（优先使用响应中的 usage_metadata）"""
+        usage = getattr(response, 'usage_metadata', None)
+        prompt_tokens = getattr(usage, 'prompt_token_count', None)
+        output_tokens = getattr(usage, 'candidates_token_count', None)
+        if prompt_tokens is None or output_tokens is None:
+            from .prompt_builder import estimate_tokens
+            prompt_tokens = estimate_tokens(prompt) if prompt_tokens is None else prompt_tokens
+            if output_tokens is None:
+                output_tokens = estimate_tokens(getattr(response, 'text', '') or '')
+        self.tokens.inc(prompt_tokens, run=run, direction="prompt")
+        self.tokens.inc(output_tokens, run=run, direction="output")
+
+    def render(self) -> str:
+        return self.registry.render()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    metrics: GeneratorMetrics = None
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 抓取请求不打印访问日志
+        pass
+
+
+class MetricsExporter:
+    """HTTP端点和文本文件导出"""
+
+    def __init__(self, metrics: GeneratorMetrics):
+        self.metrics = metrics
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.textfile: Optional[str] = None
+        self._stop = threading.Event()
+        self._textfile_thread: Optional[threading.Thread] = None
+
+    def start_http(self, port: int, host: str = "127.0.0.1") -> int:
+        """启动HTTP端点，返回实际端口（port 为0时由系统分配）"""
+        handler = type("MetricsHandler", (_MetricsHandler,), {"metrics": self.metrics})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        thread = threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True)
+        thread.start()
+        return self.server.server_address[1]
+
+    def start_textfile(self, filename: str, interval: float = 15.0):
+        """定期写入文本文件"""
+        self.textfile = filename
+        self.write_textfile()
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.write_textfile()
+
+        self._textfile_thread = threading.Thread(target=loop, name="metrics-textfile", daemon=True)
+        self._textfile_thread.start()
+
+    def write_textfile(self):
+        if self.textfile:
+            try:
+                self.metrics.registry.write_textfile(self.textfile)
+            except OSError as e:
+                log.warning(f"⚠️ 写入指标文件失败: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.write_textfile()
+
+
+_metrics: Optional[GeneratorMetrics] = None
+_exporter: Optional[MetricsExporter] = None
+_lock = threading.Lock()
+_exporter_lock = threading.Lock()  # ensure_exporter 专用（创建导出时会调用 get_metrics）
+
+
+def get_metrics() -> GeneratorMetrics:
+    """获取进程级共享的指标集合"""
+    global _metrics
+    with _lock:
+        if _metrics is None:
+            _metrics = GeneratorMetrics()
+        return _metrics
+
+
+def ensure_exporter() -> Optional[MetricsExporter]:
+    """按配置启动导出（METRICS_PORT / METRICS_TEXTFILE，只启动一次），都未配置时返回None
+
+    检查、创建和保存在同一把锁内完成，多个对话同时开始运行时也只启动一个导出
+    """
+    global _exporter
+    from ..config import settings
+    with _exporter_lock:
+        if _exporter is not None:
+            return _exporter
+        if not settings.METRICS_PORT and not settings.METRICS_TEXTFILE:
+            return None
+        exporter = MetricsExporter(get_metrics())
+        if settings.METRICS_PORT:
+            try:
+                port = exporter.start_http(settings.METRICS_PORT, settings.METRICS_HOST)
+                log.info(f"📈 指标端点: http://{settings.METRICS_HOST}:{port}/metrics")
+            except OSError as e:
+                log.warning(f"⚠️ 启动指标端点失败: {e}")
+        if settings.METRICS_TEXTFILE:
+            exporter.start_textfile(settings.METRICS_TEXTFILE, settings.METRICS_TEXTFILE_INTERVAL)
+            log.info(f"📈 指标文件: {settings.METRICS_TEXTFILE}")
+        _exporter = exporter
+        return exporter
+
+
+def flush_exporter():
+    """立即写入指标文件（运行结束时调用，未配置文本文件时不做任何事）"""
+    if _exporter is not None:
+        _exporter.write_textfile()
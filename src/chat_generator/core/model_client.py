@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模型客户端
+延迟导入Google AI SDK，只有真正运行AI模式时才加载
+"""
+
+import datetime
+from typing import Any, Optional, Tuple
+
+_genai = None
+
+
+def get_genai():
+    """导入并缓存 google.generativeai 模块"""
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        _genai = genai
+    return _genai
+
+
+def create_model(api_key: str, model_name: str, **kwargs) -> Any:
+    """配置API密钥并创建模型"""
+    genai = get_genai()
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name, **kwargs)
+
+
+def create_context_model(api_key: str, model_name: str, system_instruction: str,
+                         ttl_seconds: int = 3600) -> Tuple[Optional[Any], Optional[Any]]:
+    """创建带固定上下文的模型，返回 (模型, 上下文缓存)
+
+    优先创建显式上下文缓存（CachedContent），固定上下文只在创建时计费一次；
+    SDK版本不支持或上下文低于缓存的最小长度时退回 system_instruction（缓存为None）；
+    都不支持时返回 (None, None)，由调用方把固定上下文放在提示词开头
+    """
+    genai = get_genai()
+    genai.configure(api_key=api_key)
+    try:
+        from google.generativeai import caching
+        cache = caching.CachedContent.create(
+            model=model_name,
+            system_instruction=system_instruction,
+            ttl=datetime.timedelta(seconds=ttl_seconds),
+        )
+        return genai.GenerativeModel.from_cached_content(cached_content=cache), cache
+    except Exception:
+        pass
+    try:
+        return genai.GenerativeModel(model_name, system_instruction=system_instruction), None
+    except TypeError:
+        return None, None
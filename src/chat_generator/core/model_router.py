@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模型分级路由
+日常的附和、确认类消息发给便宜、低延迟的快速模型，
+子事件、阶段切换和决策类消息升级到更强的模型。
+按阶段、子事件紧急程度和角色级别配置哪些消息走强模型，运行结束时按级别汇总调用统计
+"""
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+TIER_FAST = "fast"
+TIER_STRONG = "strong"
+TIER_AUTO = "auto"  # 按路由规则选择（见 ModelRouter.route）
+
+
+def _split_list(value: str) -> List[str]:
+    """解析逗号分隔的配置项（忽略空白和空项）"""
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+class ModelRouter:
+    """决定每条消息使用快速模型还是强模型"""
+
+    def __init__(self, strong_phases: Iterable[str] = (), strong_urgency: Iterable[str] = ("高", "中"),
+                 strong_levels: Iterable[str] = ("老大", "负责人"), phase_transitions: bool = True):
+        """
+        strong_phases: 整个阶段都使用强模型的阶段名称
+        strong_urgency: 触发子事件时使用强模型的紧急程度
+        strong_levels: 发言时使用强模型的角色级别（决策类发言）
+        phase_transitions: 每个阶段的第一条消息是否使用强模型
+        """
+        self.strong_phases = set(strong_phases)
+        self.strong_urgency = set(strong_urgency)
+        self.strong_levels = set(strong_levels)
+        self.phase_transitions = phase_transitions
+
+    @classmethod
+    def from_settings(cls) -> "ModelRouter":
+        """按配置中的 ROUTING_* 创建"""
+        from ..config import settings
+        return cls(strong_phases=_split_list(settings.ROUTING_STRONG_PHASES),
+                   strong_urgency=_split_list(settings.ROUTING_STRONG_URGENCY),
+                   strong_levels=_split_list(settings.ROUTING_STRONG_LEVELS),
+                   phase_transitions=settings.ROUTING_PHASE_TRANSITIONS)
+
+    def route(self, phase: str, sub_event: Any = None, character: Any = None,
+              phase_changed: bool = False) -> str:
+        """返回消息使用的模型级别（TIER_FAST / TIER_STRONG）"""
+        if sub_event is not None and getattr(sub_event, 'urgency', None) in self.strong_urgency:
+            return TIER_STRONG
+        if phase_changed and self.phase_transitions:
+            return TIER_STRONG
+        if phase in self.strong_phases:
+            return TIER_STRONG
+        if character is not None and getattr(character, 'level', None) in self.strong_levels:
+            return TIER_STRONG
+        return TIER_FAST
+
+
+class TierStats:
+    """按模型级别汇总调用次数、失败次数和耗时（流水线生成时由多个线程同时记录）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[str, str] = {}
+        self._latencies: Dict[str, List[float]] = {}
+        self._errors: Dict[str, int] = {}
+
+    def record(self, tier: str, model_name: str, latency: float, ok: bool = True):
+        """记录一次调用"""
+        with self._lock:
+            self._models[tier] = model_name
+            self._latencies.setdefault(tier, []).append(latency)
+            self._errors[tier] = self._errors.get(tier, 0) + (0 if ok else 1)
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """各级别的统计：模型、调用次数、失败次数、平均耗时和p95耗时（秒）"""
+        with self._lock:
+            snapshot = {tier: (self._models[tier], sorted(latencies), self._errors[tier])
+                        for tier, latencies in self._latencies.items()}
+        report = {}
+        for tier, (model_name, ordered, errors) in snapshot.items():
+            report[tier] = {
+                'model': model_name,
+                'calls': len(ordered),
+                'errors': errors,
+                'avg_latency': round(sum(ordered) / len(ordered), 3),
+                'p95_latency': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+            }
+        return report
+
+    def summary(self) -> Optional[str]:
+        """用于打印的一行汇总（没有调用时为None）"""
+        report = self.report()
+        if not report:
+            return None
+        return "，".join(f"{tier}({stats['model']}) {stats['calls']} 次、平均 {stats['avg_latency']:.2f}s"
+                        for tier, stats in sorted(report.items()))
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输出文件写入
+支持不压缩、gzip和zstd三种方式写入聊天记录和实时保存的临时文件，
+以及按天分片写入并生成 manifest.json
+
+追加写入时每次写入都是一个完整的gzip成员/zstd帧，进程中断时
+已写入的部分仍然可以正常解压；大块数据会分块多线程压缩
+"""
+
+import io
+import os
+import gzip
+import json
+import hashlib
+import datetime
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+COMPRESSION_NONE = "none"
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+
+COMPRESSION_SUFFIXES = {
+    COMPRESSION_NONE: "",
+    COMPRESSION_GZIP: ".gz",
+    COMPRESSION_ZSTD: ".zst",
+}
+
+# 超过此大小时分块多线程压缩
+PARALLEL_CHUNK_SIZE = 1 << 20
+
+_zstd = None
+
+
+def _get_zstd():
+    """延迟导入zstandard（可选依赖）"""
+    global _zstd
+    if _zstd is None:
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("使用zstd压缩需要安装zstandard: pip install zstandard") from None
+        _zstd = zstandard
+    return _zstd
+
+
+def resolve_compression(compression: Optional[str] = None) -> str:
+    """确定压缩方式（未指定时使用配置中的 OUTPUT_COMPRESSION）"""
+    if compression is None:
+        from ..config import settings
+        compression = settings.OUTPUT_COMPRESSION
+    compression = (compression or COMPRESSION_NONE).lower()
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"不支持的压缩方式: {compression}，请使用 'none'、'gzip' 或 'zstd'")
+    return compression
+
+
+def detect_compression(filename: str) -> str:
+    """根据文件扩展名判断压缩方式"""
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if suffix and filename.endswith(suffix):
+            return compression
+    return COMPRESSION_NONE
+
+
+def compressed_filename(filename: str, compression: Optional[str] = None) -> str:
+    """为文件名加上压缩扩展名（已有时不重复添加）"""
+    suffix = COMPRESSION_SUFFIXES[resolve_compression(compression)]
+    if suffix and not filename.endswith(suffix):
+        return filename + suffix
+    return filename
+
+
+def _compression_settings():
+    from ..config import settings
+    threads = settings.COMPRESSION_THREADS or os.cpu_count() or 1
+    return settings.COMPRESSION_LEVEL, max(1, threads)
+
+
+def compress_bytes(data: bytes, compression: str) -> bytes:
+    """压缩为一个或多个完整的gzip成员/zstd帧"""
+    level, threads = _compression_settings()
+
+    if compression == COMPRESSION_GZIP:
+        gzip_level = 6 if level < 0 else min(level, 9)
+        if threads > 1 and len(data) > PARALLEL_CHUNK_SIZE:
+            # zlib压缩时会释放GIL，多个gzip成员首尾相接仍是合法的gzip文件
+            chunks = [data[i:i + PARALLEL_CHUNK_SIZE] for i in range(0, len(data), PARALLEL_CHUNK_SIZE)]
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                return b"".join(executor.map(lambda chunk: gzip.compress(chunk, gzip_level), chunks))
+        return gzip.compress(data, gzip_level)
+
+    if compression == COMPRESSION_ZSTD:
+        zstd = _get_zstd()
+        zstd_level = 3 if level < 0 else level
+        # 数据较大时使用zstd自带的多线程压缩
+        compressor = zstd.ZstdCompressor(level=zstd_level,
+                                         threads=threads if len(data) > PARALLEL_CHUNK_SIZE else 0)
+        return compressor.compress(data)
+
+    return data
+
+
+def write_text(filename: str, text: str, compression: Optional[str] = None) -> str:
+    """写入文本文件（按压缩方式添加扩展名），返回实际写入的文件名"""
+    compression = resolve_compression(compression)
+    filename = compressed_filename(filename, compression)
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if compression == COMPRESSION_NONE:
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        with open(filename, 'wb') as f:
+            f.write(compress_bytes(text.encode('utf-8'), compression))
+    return filename
+
+
+def append_text(filename: str, text: str) -> str:
+    """追加文本（压缩方式由扩展名决定，每次追加写入一个完整的帧）"""
+    compression = detect_compression(filename)
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if compression == COMPRESSION_NONE:
+        with open(filename, 'a', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        with open(filename, 'ab') as f:
+            f.write(compress_bytes(text.encode('utf-8'), compression))
+            f.flush()
+    return filename
+
+
+@contextlib.contextmanager
+def open_text_writer(filename: str, compression: Optional[str] = None):
+    """打开流式写入的文本文件（按压缩方式添加扩展名），产出 (文件对象, 实际文件名)
+
+    与 write_text 不同，内容边生成边压缩写入，不需要先在内存中拼成完整的字符串
+    """
+    compression = resolve_compression(compression)
+    filename = compressed_filename(filename, compression)
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if compression == COMPRESSION_GZIP:
+        level, _ = _compression_settings()
+        f = gzip.open(filename, 'wt', encoding='utf-8', compresslevel=6 if level < 0 else min(level, 9))
+    elif compression == COMPRESSION_ZSTD:
+        zstd = _get_zstd()
+        level, threads = _compression_settings()
+        raw = open(filename, 'wb')
+        compressor = zstd.ZstdCompressor(level=3 if level < 0 else level, threads=threads)
+        f = io.TextIOWrapper(compressor.stream_writer(raw), encoding='utf-8')
+    else:
+        f = open(filename, 'w', encoding='utf-8')
+
+    with f:
+        yield f, filename
+
+
+def write_lines(f, lines: Iterable[str], batch_size: int = 1000) -> int:
+    """把逐行产生的文本以换行连接写入文件（与 "\n".join(lines) 的结果相同），返回行数"""
+    count = 0
+    batch: List[str] = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= batch_size:
+            f.write(("\n" if count else "") + "\n".join(batch))
+            count += len(batch)
+            batch = []
+    if batch:
+        f.write(("\n" if count else "") + "\n".join(batch))
+        count += len(batch)
+    return count
+
+
+def read_text(filename: str) -> str:
+    """读取文本文件（自动按扩展名解压，支持多帧文件）"""
+    compression = detect_compression(filename)
+
+    if compression == COMPRESSION_GZIP:
+        with gzip.open(filename, 'rt', encoding='utf-8') as f:
+            return f.read()
+
+    if compression == COMPRESSION_ZSTD:
+        zstd = _get_zstd()
+        with open(filename, 'rb') as f:
+            reader = zstd.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+            return reader.read().decode('utf-8')
+
+    with open(filename, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _atomic_write_json(filename: str, data: Dict[str, Any]):
+    """先写临时文件再重命名，避免读到写了一半的JSON"""
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_filename, filename)
+
+
+def _file_sha256(filename: str) -> str:
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_day_shards(messages: List[Any], directory: str, render: Callable[[List[Any]], str],
+                     prefix: str, compression: Optional[str] = None,
+                     extra: Optional[Dict[str, Any]] = None) -> str:
+    """按自然日把消息分片写入 directory，并写入 manifest.json
+
+    render 把一天的消息渲染为完整文本（每个分片都带自己的文件头）；
+    manifest 记录每个分片的文件名、消息数、时间范围、字节数和sha256校验和。
+    返回 manifest.json 的路径。
+    """
+    compression = resolve_compression(compression)
+    os.makedirs(directory, exist_ok=True)
+
+    # 按日期分组（消息通常已按时间排序，这里仍按日期和时间排序以保证分片内有序）
+    days: Dict[Any, List[Any]] = {}
+    for message in messages:
+        days.setdefault(message.timestamp.date(), []).append(message)
+
+    shards = []
+    for day in sorted(days):
+        day_messages = sorted(days[day], key=lambda m: m.timestamp)
+        filename = write_text(os.path.join(directory, f"{prefix}_{day.strftime('%Y%m%d')}.txt"),
+                              render(day_messages), compression)
+        shards.append({
+            "date": day.isoformat(),
+            "file": os.path.basename(filename),
+            "message_count": len(day_messages),
+            "start_time": day_messages[0].timestamp.isoformat(),
+            "end_time": day_messages[-1].timestamp.isoformat(),
+            "bytes": os.path.getsize(filename),
+            "sha256": _file_sha256(filename),
+        })
+
+    manifest = {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "compression": compression,
+        "total_messages": len(messages),
+        "shard_count": len(shards),
+        "shards": shards,
+    }
+    if extra:
+        manifest.update(extra)
+
+    manifest_filename = os.path.join(directory, "manifest.json")
+    _atomic_write_json(manifest_filename, manifest)
+    return manifest_filename
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分页生成
+把一次生成大量条目（如上百个角色）拆成多个小页并发请求，按名字去重后合并
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List
+
+from .log import get_logger
+
+log = get_logger(__name__)
+
+# 提示词中最多列出的已有名字数量
+MAX_EXCLUDE_NAMES = 100
+
+
+def generate_in_pages(fetch_page: Callable[[int, int, List[str]], List[Dict[str, Any]]],
+                      total: int, page_size: int, max_workers: int = 4,
+                      max_rounds: int = 3, key: str = "name",
+                      exclude_names: Iterable[str] = ()) -> List[Dict[str, Any]]:
+    """分页并发生成并合并
+
+    fetch_page(count, page_index, exclude_names) 返回一页条目。
+    同一轮的各页并发请求；合并时丢弃名字为空或重复的条目，
+    不足 total 时再补一轮（最多 max_rounds 轮），补生成时会带上已有的名字，
+    并多要20%（至少1个）以抵消再次重名。exclude_names 为事先已占用的名字。
+    """
+    if page_size < 1:
+        raise ValueError("page_size 必须大于0")
+
+    merged: List[Dict[str, Any]] = []
+    # 已占用的名字，dict 保持加入顺序，提示词中只列出最近加入的 MAX_EXCLUDE_NAMES 个
+    seen: Dict[str, None] = dict.fromkeys(exclude_names)
+    page_index = 0
+
+    for round_index in range(max_rounds):
+        missing = total - len(merged)
+        if missing <= 0:
+            break
+        if round_index:
+            missing += max(1, missing // 5)
+
+        counts = [page_size] * (missing // page_size)
+        if missing % page_size:
+            counts.append(missing % page_size)
+        exclude_names = list(seen)[-MAX_EXCLUDE_NAMES:]
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(counts)))) as executor:
+            futures = [
+                executor.submit(fetch_page, count, page_index + offset, exclude_names)
+                for offset, count in enumerate(counts)
+            ]
+            page_index += len(counts)
+
+            # 按页顺序合并，保证结果稳定
+            for future in futures:
+                try:
+                    items = future.result()
+                except Exception as e:
+                    log.warning(f"⚠️ 分页生成失败: {e}")
+                    continue
+                for item in items or []:
+                    name = str(item.get(key, "")).strip()
+                    if not name or name in seen:
+                        continue
+                    seen[name] = None
+                    merged.append(item)
+
+    return merged[:total]
@@ -10,12 +10,107 @@ import os
 import json
 import time
 import random
+import uuid
 import datetime
-from typing import List, Dict, Any, Optional, Tuple
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Union
 from dataclasses import dataclass, asdict
-import google.generativeai as genai
 from .base_generator import ChatGenerator, Character, ChatMessage
-from ..config.settings import GOOGLE_AI_API_KEY, DEFAULT_MODEL
+from .model_client import create_context_model, create_model
+from .scheduler import RequestScheduler, get_scheduler, PRIORITY_HIGH, PRIORITY_NORMAL
+from .model_router import ModelRouter, TierStats, TIER_AUTO, TIER_FAST, TIER_STRONG
+from .profiles import RunProfile, get_profile
+from .turn_taking import SpeakerSelector
+from .paging import generate_in_pages
+from .run_log import RunLog, load_messages, messages_from_entries, read_run_log, update_run_log
+from .fallback import FallbackComposer
+from .hedging import HedgedCaller
+from .metrics import ensure_exporter, flush_exporter, get_metrics
+from .log import get_logger
+from .reorder import ReorderBuffer
+from .prompt_builder import PromptBuilder, estimate_tokens
+from .output_writer import append_text, compressed_filename, detect_compression, write_day_shards, write_text
+from .character_library import CharacterLibrary, KIND_PLANNING, get_character_library
+from ..config import settings
+
+log = get_logger(__name__)
+
+
+# 提示词中固定的说明文字（由 PromptBuilder 去掉缩进后发送）
+PLANNING_CHARACTER_FIELDS = """
+请为每个角色生成以下信息：
+1. 姓名（中文，使用常见的市井名字，如：强哥、阿龙、老六等）
+2. 角色身份（如：负责人、参谋、执行员、联络人、技术员、后勤等）
+3. 部门（如：行动组、后勤组、情报组、技术组等）
+4. 级别（负责人、骨干、成员）
+5. 专业领域（列表，如：执行任务、技术操作、联络沟通、后勤保障等）
+6. 性格特点（如：果断、狡猾、冲动、胆小、贪婪等）
+7. 说话风格（如：粗俗直接、带脏话、方言、威胁性等）
+8. 职责范围（列表，如：指挥行动、技术操作、联络沟通、后勤保障等）
+9. 决策权限（高、中、低）
+
+要求：
+- 文化程度不高，说话粗俗、市井范儿十足
+- 有专业人士也有执行人员，三教九流都有
+- 不要过于职业化，要符合市井人物的真实情况
+- 说话风格要粗俗、直接、带脏话或方言
+"""
+
+PLANNING_CHARACTER_FORMAT = """
+请以JSON格式返回，格式如下：
+{"characters": [{"name": "角色姓名", "role": "角色身份", "department": "部门", "level": "级别",
+"expertise": ["专业领域1", "专业领域2"], "personality": "性格特点", "speaking_style": "说话风格",
+"responsibilities": ["职责1", "职责2"], "decision_power": "决策权限"}]}
+"""
+
+SUB_EVENT_FIELDS = """
+这些子事件应该包括：
+1. 策划阶段问题（如：目标变更、人员变动、装备丢失等）
+2. 施行阶段问题（如：行动受阻、目标反应、设备故障等）
+3. 应对阶段问题（如：被发现、外部介入、证据暴露等）
+4. 外部因素（如：外部巡逻、目击者出现、天气变化等）
+5. 内部问题（如：内讧、背叛、人员不足等）
+6. 执行细节（如：路线问题、时间延误、技术故障等）
+
+请为每个子事件生成：
+1. 事件名称
+2. 事件描述
+3. 紧急程度（高、中、低）
+4. 影响程度（高、中、低）
+5. 相关阶段（踩点摸底、制定方案、人员准备、物资准备、行动准备、开始行动、行动执行、撤退转移、被发现应对、外部侦破应对、抓捕应对、善后处理）
+6. 触发条件（列表）
+
+请以JSON格式返回：
+{"sub_events": [{"name": "事件名称", "description": "事件描述", "urgency": "紧急程度", "impact": "影响程度",
+"related_phase": "相关阶段", "trigger_conditions": ["触发条件1", "触发条件2"]}]}
+"""
+
+PLANNING_MESSAGE_RULES = """
+要求：
+1. 消息长度控制在30-100字之间
+2. 符合角色的身份、级别、专业领域和说话风格
+3. 与当前策划阶段相关，体现组织活动的特点
+4. 考虑对话历史，避免重复
+5. 使用中文，自然流畅，符合市井人物的语言特点
+6. 体现策划过程的逻辑性和现实性
+7. 如果有子事件，要体现对子事件的响应
+8. 不要包含任何标记或前缀，直接输出消息内容
+9. 说话要粗俗、直接、带脏话或方言，符合文化程度不高的特点
+10. 不要过于职业化，要符合市井人物的真实情况
+
+消息类型可以是：
+- 任务分配和进度汇报
+- 问题提出和解决方案讨论
+- 决策制定和执行确认
+- 资源协调和风险控制
+- 阶段总结和下一步规划
+- 行动执行和现场反馈
+- 应对措施和紧急处理
+- 外部动向和风险评估
+- 痕迹清理和善后处理
+- 团队保护和后路安排
+"""
 
 
 @dataclass
@@ -71,17 +166,79 @@ class SubEvent:
 class PlanningChatGenerator:
     """策划组织聊天记录生成器"""
     
-    def __init__(self, api_key: str = None):
-        """初始化策划聊天生成器"""
+    def __init__(self, api_key: str = None, model: Any = None,
+                 scheduler: Optional[RequestScheduler] = None, conversation_id: str = None,
+                 character_library: Optional[CharacterLibrary] = None, fast_model: Any = None,
+                 model_router: Optional[ModelRouter] = None,
+                 profile: Union[str, RunProfile, None] = None):
+        """初始化策划聊天生成器
+
+        model 为强模型（子事件、阶段切换和决策类消息），fast_model 为日常消息使用的快速模型；
+        都未传入时按配置中的 STRONG_MODEL / FAST_MODEL 创建，没有快速模型时所有消息都使用 model
+        profile 为运行配置（档位名称或 RunProfile，未传入时使用配置中的 RUN_PROFILE），见 apply_profile
+        """
         # 获取API密钥
-        self.api_key = api_key or os.getenv('GOOGLE_AI_API_KEY') or GOOGLE_AI_API_KEY
+        self.api_key = api_key or os.getenv('GOOGLE_AI_API_KEY') or settings.GOOGLE_AI_API_KEY
         
-        if not self.api_key or self.api_key == "YOUR_GOOGLE_AI_API_KEY_HERE":
+        if model is None and (not self.api_key or self.api_key == "YOUR_GOOGLE_AI_API_KEY_HERE"):
             raise ValueError("请设置Google AI API密钥。请修改 config.py 文件中的 GOOGLE_AI_API_KEY 变量")
         
-        # 配置Google AI
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(DEFAULT_MODEL)
+        # 配置Google AI（传入model时直接使用，便于离线测试和基准测试）
+        if model is not None:
+            self.model = model
+        else:
+            self.model = create_model(self.api_key, settings.STRONG_MODEL or settings.DEFAULT_MODEL)
+        self.model_name = getattr(self.model, 'model_name', None) or type(self.model).__name__
+        self._owns_model = model is None
+        
+        # 模型分级：日常消息使用快速模型，子事件、阶段切换和决策类消息使用强模型
+        if fast_model is None and self._owns_model and settings.FAST_MODEL:
+            fast_model = create_model(self.api_key, settings.FAST_MODEL)
+        self.tier_models: Dict[str, Any] = {TIER_STRONG: self.model}
+        if fast_model is not None:
+            self.tier_models[TIER_FAST] = fast_model
+        self.model_router = model_router or ModelRouter.from_settings()
+        self.tier_stats = TierStats()
+        
+        # 每次运行的固定上下文（角色表、阶段表、要求），见 prepare_static_context
+        self.static_context: Optional[str] = None
+        # 各级别以固定上下文为系统指令/缓存的模型，没有时固定上下文放在提示词开头
+        self._context_models: Dict[str, Any] = {}
+        self._context_caches: Dict[str, Any] = {}
+        
+        # 每次API调用之间的间隔（秒），避免触发API限制
+        self.request_interval = 0.3
+        
+        # 慢请求对冲（HEDGE_REQUESTS，只用于逐条消息的调用）
+        self.hedger = HedgedCaller.from_settings()
+        
+        # 运行指标（进程内共享，按 conversation_id 区分，见 metrics）
+        self.metrics = get_metrics()
+        
+        # 请求调度器：未传入时使用进程级共享调度器（SCHEDULER_SHARED=false 时不经调度器直接请求）
+        if scheduler is None and settings.SCHEDULER_SHARED:
+            scheduler = get_scheduler()
+        self.scheduler = scheduler
+        self.conversation_id = conversation_id or uuid.uuid4().hex[:8]
+        
+        # 角色库（未传入时使用 character_library.get_character_library 的共享角色库）
+        self.character_library = character_library
+        
+        # 生成消息时参考的最近对话条数
+        self.history_window = 3
+        
+        # 消息时间戳的随机抖动幅度（小时），也决定重排缓冲区的窗口
+        self.timestamp_jitter_hours = 0.1
+        
+        # 分页生成角色时每页的数量
+        self.page_size = settings.CHARACTER_PAGE_SIZE
+        
+        # 消息使用的模型级别（auto 按路由规则选择，见 model_router）
+        self.model_tier = TIER_AUTO
+        
+        # 运行配置（性能档位），覆盖上面的请求间隔、历史条数、分页大小和模型级别
+        self.profile: Optional[RunProfile] = None
+        self.apply_profile(profile)
         
         # 策划相关数据
         self.main_event: str = ""
@@ -89,7 +246,12 @@ class PlanningChatGenerator:
         self.planning_characters: List[PlanningCharacter] = []
         self.planning_phases: List[PlanningPhase] = []
         self.sub_events: List[SubEvent] = []
+        self.sub_event_schedule: Dict[int, SubEvent] = {}  # 消息序号 -> 子事件
+        self.sub_event_schedule_size = 0  # 子事件排期对应的消息总数
         self.conversation_history: List[Dict[str, Any]] = []
+        self.run_log_path: Optional[str] = None  # 最近一次运行的JSONL日志
+        self.fallback = FallbackComposer()  # API失败时本地生成占位消息
+        self.fallback_indices: List[int] = []  # 最近一次运行中本地生成、待回填的消息序号
         self.current_phase: str = ""
         self.phase_progress: Dict[str, float] = {}  # 各阶段进度
         self.decisions_made: List[Dict[str, Any]] = []  # 已做决策
@@ -198,62 +360,44 @@ class PlanningChatGenerator:
             )
         ]
     
+    def apply_profile(self, profile: Union[str, RunProfile, None]):
+        """应用运行配置（档位名称或 RunProfile）
+
+        设置请求间隔、历史条数、分页大小和模型级别；生成对话时未指定的
+        lookahead、realtime_save、save_interval 也使用档位中的值
+        """
+        profile = get_profile(profile)
+        if profile is None:
+            return
+        self.profile = profile
+        self.request_interval = profile.request_interval
+        self.history_window = profile.history_window
+        self.page_size = profile.page_size
+        self.model_tier = profile.model_tier
+    
     def input_planning_event(self, event: str, context: str = ""):
         """录入策划事件"""
         self.main_event = event
         self.event_context = context
-        print(f"✅ 策划事件已录入: {event}")
+        log.info(f"✅ 策划事件已录入: {event}")
         if context:
-            print(f"✅ 事件背景: {context}")
+            log.info(f"✅ 事件背景: {context}")
     
-    def generate_planning_characters(self, num_characters: int = 8) -> List[PlanningCharacter]:
-        """生成策划团队成员"""
+    def generate_planning_characters(self, num_characters: int = 8,
+                                     page_size: int = None) -> List[PlanningCharacter]:
+        """生成策划团队成员（超过page_size个时分页并发生成）"""
         if not self.main_event:
             raise ValueError("请先录入策划事件")
         
-        prompt = f"""
-        基于以下组织活动事件，生成{num_characters}个不同的组织成员来参与策划：
-
-        事件：{self.main_event}
-        背景：{self.event_context if self.event_context else "无特殊背景"}
-
-        请为每个角色生成以下信息：
-        1. 姓名（中文，使用常见的市井名字，如：强哥、阿龙、老六等）
-        2. 角色身份（如：负责人、参谋、执行员、联络人、技术员、后勤等）
-        3. 部门（如：行动组、后勤组、情报组、技术组等）
-        4. 级别（负责人、骨干、成员）
-        5. 专业领域（列表，如：执行任务、技术操作、联络沟通、后勤保障等）
-        6. 性格特点（如：果断、狡猾、冲动、胆小、贪婪等）
-        7. 说话风格（如：粗俗直接、带脏话、方言、威胁性等）
-        8. 职责范围（列表，如：指挥行动、技术操作、联络沟通、后勤保障等）
-        9. 决策权限（高、中、低）
-
-        要求：
-        - 文化程度不高，说话粗俗、市井范儿十足
-        - 有专业人士也有执行人员，三教九流都有
-        - 不要过于职业化，要符合市井人物的真实情况
-        - 说话风格要粗俗、直接、带脏话或方言
-
-        请以JSON格式返回，格式如下：
-        {{
-            "characters": [
-                {{
-                    "name": "角色姓名",
-                    "role": "角色身份",
-                    "department": "部门",
-                    "level": "级别",
-                    "expertise": ["专业领域1", "专业领域2"],
-                    "personality": "性格特点",
-                    "speaking_style": "说话风格",
-                    "responsibilities": ["职责1", "职责2"],
-                    "decision_power": "决策权限"
-                }}
-            ]
-        }}
-        """
+        if page_size is None:
+            page_size = self.page_size
+        if num_characters > page_size:
+            return self._generate_planning_characters_in_pages(num_characters, page_size)
+        
+        prompt = self._planning_characters_prompt(num_characters)
         
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate_content(prompt, PRIORITY_HIGH)
             response_text = response.text.strip()
             
             # 清理和解析JSON
@@ -262,35 +406,146 @@ class PlanningChatGenerator:
             characters_data = data.get('characters', [])
             
             # 创建策划角色对象
-            self.planning_characters = []
-            for char_data in characters_data:
-                planning_char = PlanningCharacter(
-                    name=char_data.get('name', ''),
-                    role=char_data.get('role', ''),
-                    department=char_data.get('department', ''),
-                    level=char_data.get('level', ''),
-                    expertise=char_data.get('expertise', []),
-                    personality=char_data.get('personality', ''),
-                    speaking_style=char_data.get('speaking_style', ''),
-                    responsibilities=char_data.get('responsibilities', []),
-                    decision_power=char_data.get('decision_power', '')
-                )
-                self.planning_characters.append(planning_char)
+            self.planning_characters = [self._planning_character_from_dict(d) for d in characters_data]
+            self._save_to_library(self.planning_characters)
             
-            print(f"✅ 成功生成 {len(self.planning_characters)} 个策划团队成员")
+            log.info(f"✅ 成功生成 {len(self.planning_characters)} 个策划团队成员")
             for char in self.planning_characters:
-                print(f"   - {char.name} ({char.role}) - {char.department} - {char.level}")
+                log.info(f"   - {char.name} ({char.role}) - {char.department} - {char.level}")
             
             return self.planning_characters
             
         except json.JSONDecodeError as e:
-            print(f"❌ JSON解析失败: {e}")
-            print(f"AI返回的内容: {response_text[:200]}...")
+            log.error(f"❌ JSON解析失败: {e}")
+            log.error(f"AI返回的内容: {response_text[:200]}...")
             return self._create_default_planning_characters()
         except Exception as e:
-            print(f"❌ 生成角色失败: {e}")
-            print(f"错误类型: {type(e).__name__}")
+            log.error(f"❌ 生成角色失败: {e}")
+            log.error(f"错误类型: {type(e).__name__}")
+            return self._create_default_planning_characters()
+    
+    def _planning_characters_prompt(self, num_characters: int, exclude_names: List[str] = None,
+                                    page_index: int = 0, roles: List[str] = None) -> str:
+        """构建生成策划团队成员的提示词（分页生成时附带已有的名字，避免重名）"""
+        builder = PromptBuilder()
+        builder.add(f"基于以下组织活动事件，生成{num_characters}个不同的组织成员来参与策划：")
+        builder.add(f"事件：{self.main_event}\n背景：{self.event_context if self.event_context else '无特殊背景'}")
+        builder.add(PLANNING_CHARACTER_FIELDS, static=True)
+        if exclude_names or page_index:
+            exclude_text = f"这是第{page_index + 1}批成员，请使用与其他批次不同的姓名、部门和身份组合。"
+            if exclude_names:
+                exclude_text += f"以下姓名已被使用，不要重复：{'、'.join(exclude_names)}"
+            builder.add(exclude_text)
+        if roles:
+            builder.add(f"需要包含以下角色身份：{'、'.join(roles)}")
+        builder.add(PLANNING_CHARACTER_FORMAT, static=True)
+        return builder.build()
+    
+    def _generate_planning_characters_in_pages(self, num_characters: int,
+                                               page_size: int) -> List[PlanningCharacter]:
+        """分页并发生成大量策划团队成员，按姓名去重后合并"""
+        log.info(f"🤖 分页生成 {num_characters} 个策划团队成员（每页 {page_size} 个）...")
+        
+        characters = self._fetch_planning_characters(num_characters, page_size)
+        if not characters:
+            log.error("❌ 分页生成角色失败，使用默认角色")
             return self._create_default_planning_characters()
+        
+        self.planning_characters = characters
+        self._save_to_library(self.planning_characters)
+        
+        # 人数多时只打印按级别的统计
+        level_counts: Dict[str, int] = {}
+        for char in self.planning_characters:
+            level_counts[char.level] = level_counts.get(char.level, 0) + 1
+        log.info(f"✅ 成功生成 {len(self.planning_characters)} 个策划团队成员")
+        log.info("   " + "，".join(f"{level}: {count}" for level, count in level_counts.items()))
+        if len(self.planning_characters) < num_characters:
+            log.warning(f"⚠️ 去重后少于目标数量 {num_characters}")
+        return self.planning_characters
+    
+    def _fetch_planning_characters(self, num_characters: int, page_size: int,
+                                   exclude_names: List[str] = (),
+                                   roles: List[str] = None) -> List[PlanningCharacter]:
+        """分页请求角色并转换为策划角色对象（不修改当前角色列表）"""
+        def fetch_page(count: int, page_index: int, page_exclude: List[str]) -> List[Dict[str, Any]]:
+            prompt = self._planning_characters_prompt(count, page_exclude, page_index, roles)
+            response = self._generate_content(prompt, PRIORITY_HIGH)
+            data = json.loads(self._clean_json_response(response.text.strip()))
+            return data.get('characters', [])
+        
+        characters_data = generate_in_pages(fetch_page, num_characters, page_size,
+                                            max_workers=settings.CHARACTER_PAGE_WORKERS,
+                                            exclude_names=exclude_names)
+        return [self._planning_character_from_dict(d) for d in characters_data]
+    
+    @staticmethod
+    def _planning_character_from_dict(char_data: Dict[str, Any]) -> PlanningCharacter:
+        """从AI返回或角色库中的字典创建策划角色"""
+        return PlanningCharacter(
+            name=char_data.get('name', ''),
+            role=char_data.get('role', ''),
+            department=char_data.get('department', ''),
+            level=char_data.get('level', ''),
+            expertise=char_data.get('expertise', []),
+            personality=char_data.get('personality', ''),
+            speaking_style=char_data.get('speaking_style', ''),
+            responsibilities=char_data.get('responsibilities', []),
+            decision_power=char_data.get('decision_power', '')
+        )
+    
+    def _get_character_library(self) -> Optional[CharacterLibrary]:
+        if self.character_library is not None:
+            return self.character_library
+        return get_character_library()
+    
+    def _save_to_library(self, characters: List[PlanningCharacter]):
+        """把AI生成的角色存入角色库（失败不影响生成）"""
+        try:
+            library = self._get_character_library()
+            if library is not None:
+                library.add_characters(characters, KIND_PLANNING, event=self.main_event)
+        except Exception as e:
+            log.warning(f"⚠️ 保存到角色库失败: {e}")
+    
+    def assemble_planning_characters(self, num_characters: int = 8, roles: List[str] = None,
+                                     top_up: bool = True, **filters) -> List[PlanningCharacter]:
+        """从角色库组建策划团队
+        
+        roles 为必须包含的角色身份，filters 可指定 department、level、personality；
+        角色库不够时（top_up=True）只为缺少的人数和角色身份调用AI补充。
+        """
+        library = self._get_character_library()
+        if library is None:
+            return self.generate_planning_characters(num_characters)
+        
+        picked, missing_roles = library.assemble(KIND_PLANNING, num_characters, roles, **filters)
+        characters = [self._planning_character_from_dict(d) for d in picked]
+        log.info(f"📚 从角色库选取了 {len(characters)} 个策划团队成员")
+        
+        missing = num_characters - len(characters)
+        if missing > 0 and top_up:
+            if not self.main_event:
+                raise ValueError("请先录入策划事件")
+            log.info(f"🤖 角色库不足，补充生成 {missing} 个成员" +
+                  (f"（{'、'.join(missing_roles)}）" if missing_roles else ""))
+            try:
+                extra = self._fetch_planning_characters(
+                    missing, self.page_size,
+                    exclude_names=[char.name for char in characters], roles=missing_roles
+                )
+            except Exception as e:
+                log.error(f"❌ 补充生成角色失败: {e}")
+                extra = []
+            self._save_to_library(extra)
+            characters.extend(extra)
+        
+        if not characters:
+            return self._create_default_planning_characters()
+        
+        self.planning_characters = characters
+        log.info(f"✅ 策划团队共 {len(self.planning_characters)} 人")
+        return self.planning_characters
     
     def _create_default_planning_characters(self) -> List[PlanningCharacter]:
         """创建默认犯罪组织角色"""
@@ -372,10 +627,11 @@ class PlanningChatGenerator:
         
         # 使用默认阶段，但可以根据事件调整
         self.planning_phases = self.default_phases.copy()
+        self.sub_event_schedule_size = 0
         
-        print(f"✅ 生成 {len(self.planning_phases)} 个策划阶段:")
+        log.info(f"✅ 生成 {len(self.planning_phases)} 个策划阶段:")
         for phase in self.planning_phases:
-            print(f"   - {phase.name}: {phase.description}")
+            log.info(f"   - {phase.name}: {phase.description}")
         
         return self.planning_phases
     
@@ -384,45 +640,14 @@ class PlanningChatGenerator:
         if not self.main_event:
             raise ValueError("请先录入策划事件")
         
-        prompt = f"""
-        基于以下组织活动事件，生成{num_sub_events}个可能出现的子事件或小事情：
-
-        主事件：{self.main_event}
-        背景：{self.event_context if self.event_context else "无特殊背景"}
-
-        这些子事件应该包括：
-        1. 策划阶段问题（如：目标变更、人员变动、装备丢失等）
-        2. 施行阶段问题（如：行动受阻、目标反应、设备故障等）
-        3. 应对阶段问题（如：被发现、外部介入、证据暴露等）
-        4. 外部因素（如：外部巡逻、目击者出现、天气变化等）
-        5. 内部问题（如：内讧、背叛、人员不足等）
-        6. 执行细节（如：路线问题、时间延误、技术故障等）
-
-        请为每个子事件生成：
-        1. 事件名称
-        2. 事件描述
-        3. 紧急程度（高、中、低）
-        4. 影响程度（高、中、低）
-        5. 相关阶段（踩点摸底、制定方案、人员准备、物资准备、行动准备、开始行动、行动执行、撤退转移、被发现应对、外部侦破应对、抓捕应对、善后处理）
-        6. 触发条件（列表）
-
-        请以JSON格式返回：
-        {{
-            "sub_events": [
-                {{
-                    "name": "事件名称",
-                    "description": "事件描述",
-                    "urgency": "紧急程度",
-                    "impact": "影响程度",
-                    "related_phase": "相关阶段",
-                    "trigger_conditions": ["触发条件1", "触发条件2"]
-                }}
-            ]
-        }}
-        """
+        builder = PromptBuilder()
+        builder.add(f"基于以下组织活动事件，生成{num_sub_events}个可能出现的子事件或小事情：")
+        builder.add(f"主事件：{self.main_event}\n背景：{self.event_context if self.event_context else '无特殊背景'}")
+        builder.add(SUB_EVENT_FIELDS, static=True)
+        prompt = builder.build()
         
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate_content(prompt, PRIORITY_HIGH)
             response_text = response.text.strip()
             
             # 清理和解析JSON
@@ -432,6 +657,7 @@ class PlanningChatGenerator:
             
             # 创建子事件对象
             self.sub_events = []
+            self.sub_event_schedule_size = 0
             for event_data in sub_events_data:
                 sub_event = SubEvent(
                     name=event_data.get('name', ''),
@@ -443,19 +669,19 @@ class PlanningChatGenerator:
                 )
                 self.sub_events.append(sub_event)
             
-            print(f"✅ 成功生成 {len(self.sub_events)} 个子事件:")
+            log.info(f"✅ 成功生成 {len(self.sub_events)} 个子事件:")
             for event in self.sub_events:
-                print(f"   - {event.name} ({event.urgency}紧急, {event.impact}影响)")
+                log.info(f"   - {event.name} ({event.urgency}紧急, {event.impact}影响)")
             
             return self.sub_events
             
         except json.JSONDecodeError as e:
-            print(f"❌ JSON解析失败: {e}")
-            print(f"AI返回的内容: {response_text[:200]}...")
+            log.error(f"❌ JSON解析失败: {e}")
+            log.error(f"AI返回的内容: {response_text[:200]}...")
             return self._create_default_sub_events()
         except Exception as e:
-            print(f"❌ 生成子事件失败: {e}")
-            print(f"错误类型: {type(e).__name__}")
+            log.error(f"❌ 生成子事件失败: {e}")
+            log.error(f"错误类型: {type(e).__name__}")
             return self._create_default_sub_events()
     
     def _create_default_sub_events(self) -> List[SubEvent]:
@@ -578,6 +804,7 @@ class PlanningChatGenerator:
             )
         ]
         self.sub_events = default_events
+        self.sub_event_schedule_size = 0
         return default_events
     
     def get_current_phase(self, progress: float) -> str:
@@ -593,129 +820,313 @@ class PlanningChatGenerator:
         
         return self.planning_phases[-1].name
     
-    def should_trigger_sub_event(self, current_phase: str, message_count: int) -> Optional[SubEvent]:
-        """判断是否应该触发子事件"""
-        # 每50-100条消息随机触发一个子事件
-        if message_count > 0 and message_count % random.randint(50, 100) == 0:
-            # 选择与当前阶段相关的子事件
-            related_events = [event for event in self.sub_events if event.related_phase == current_phase]
-            if related_events:
-                return random.choice(related_events)
-        
-        return None
+    def get_phase_windows(self, target_message_count: int) -> List[Tuple[str, int, int]]:
+        """各阶段对应的消息序号区间 [(阶段名, 起始序号, 结束序号(不含))]，与 get_current_phase 的划分一致"""
+        total_duration = sum(phase.duration_hours for phase in self.planning_phases)
+        windows = []
+        start = 0
+        accumulated_time = 0
+        for k, phase in enumerate(self.planning_phases):
+            accumulated_time += phase.duration_hours
+            if k == len(self.planning_phases) - 1:
+                end = target_message_count
+            else:
+                # 满足 i / target * total <= accumulated 的最大序号
+                end = min(target_message_count, int(accumulated_time / total_duration * target_message_count) + 1)
+            if end > start:
+                windows.append((phase.name, start, end))
+                start = end
+        return windows
     
-    def generate_planning_message(self, character: PlanningCharacter, 
-                                current_phase: str, context: Dict[str, Any]) -> str:
-        """生成策划消息"""
-        # 构建角色信息
-        character_info = f"""
-        角色信息：
-        - 姓名：{character.name}
-        - 身份：{character.role}
-        - 部门：{character.department}
-        - 级别：{character.level}
-        - 专业领域：{', '.join(character.expertise)}
-        - 性格：{character.personality}
-        - 说话风格：{character.speaking_style}
-        - 职责：{', '.join(character.responsibilities)}
-        - 决策权限：{character.decision_power}
+    def build_sub_event_schedule(self, target_message_count: int,
+                                 rate: float = None) -> Dict[int, SubEvent]:
+        """预先排好子事件在哪条消息触发
+        
+        每个阶段按区间长度分配 rate（每100条消息触发的子事件数）个名额，有相关子事件的阶段至少一个，
+        在区间内均匀分布并加少量抖动；同一阶段的子事件轮流使用，全部用过一次后才会重复。
+        第0条消息不触发子事件，区间内没有可用消息（如只有第0条）的阶段不排子事件。
+        结果保存在 self.sub_event_schedule，可在生成对话前查看或修改。
         """
+        if rate is None:
+            rate = settings.SUB_EVENT_RATE
         
-        # 构建当前阶段信息
-        current_phase_info = ""
-        for phase in self.planning_phases:
-            if phase.name == current_phase:
-                current_phase_info = f"""
-                当前阶段：{phase.name}
-                阶段描述：{phase.description}
-                关键任务：{', '.join(phase.key_tasks)}
-                交付物：{', '.join(phase.deliverables)}
-                """
-                break
-        
-        # 构建对话历史
-        history_text = ""
-        if self.conversation_history:
-            history_text = "\n最近的对话历史：\n"
-            for msg in self.conversation_history[-3:]:  # 只取最近3条
-                history_text += f"- {msg['sender']}: {msg['content']}\n"
-        
-        # 构建上下文信息
-        context_text = ""
-        if context.get('sub_event'):
-            sub_event = context['sub_event']
-            context_text = f"""
-            当前子事件：{sub_event.name}
-            事件描述：{sub_event.description}
-            紧急程度：{sub_event.urgency}
-            影响程度：{sub_event.impact}
-            """
-        
-        prompt = f"""
-        请基于以下信息生成一条组织活动相关的聊天消息：
+        schedule: Dict[int, SubEvent] = {}
+        for phase_name, start, end in self.get_phase_windows(target_message_count):
+            related_events = [event for event in self.sub_events if event.related_phase == phase_name]
+            # 可触发子事件的消息序号区间 [first, last]（第0条消息不触发）
+            first, last = max(start, 1), end - 1
+            if not related_events or rate <= 0 or first > last:
+                continue
+            available = last - first + 1
+            count = min(max(1, int(round((end - start) * rate / 100))), available)
+            
+            spacing = available / count
+            order: List[SubEvent] = []
+            for j in range(count):
+                if not order:
+                    order = random.sample(related_events, len(related_events))
+                slot = min(first + int((j + 0.5 + random.uniform(-0.25, 0.25)) * spacing), last)
+                if slot not in schedule:
+                    schedule[slot] = order.pop()
+        
+        self.sub_event_schedule = schedule
+        self.sub_event_schedule_size = target_message_count
+        return schedule
+    
+    def should_trigger_sub_event(self, current_phase: str, message_count: int) -> Optional[SubEvent]:
+        """判断是否应该触发子事件（查询预先排好的子事件排期）"""
+        return self.sub_event_schedule.get(message_count)
+    
+    def _build_static_context(self, full: bool) -> str:
+        """构建每次运行固定不变的上下文
 
-        {character_info}
+        full=True 时包含完整的角色表和阶段表（作为系统指令/上下文缓存时使用），
+        否则只有事件和要求，发言人和当前阶段的详细信息随每条提示词发送
+        """
+        builder = PromptBuilder(token_budget=0)
+        builder.add("你负责为组织活动群聊逐条生成聊天消息。以下信息在整个对话中保持不变，"
+                    "每次请求会给出发言人、当前阶段、最近的对话和其他变化的信息。", static=True)
+        builder.add(f"主活动事件：{self.main_event}\n"
+                    f"事件背景：{self.event_context if self.event_context else '无特殊背景'}")
+        if full:
+            builder.add("角色表（姓名｜身份｜部门｜级别）：\n" +
+                        "\n".join(self._character_line(char) for char in self.planning_characters))
+            builder.add("策划阶段：\n" + "\n".join(self._phase_line(phase) for phase in self.planning_phases))
+        builder.add(PLANNING_MESSAGE_RULES, static=True)
+        return builder.build()
+    
+    @staticmethod
+    def _character_line(character: PlanningCharacter) -> str:
+        return (f"- {character.name}｜{character.role}｜{character.department}｜{character.level}｜"
+                f"专业：{', '.join(character.expertise)}｜性格：{character.personality}｜"
+                f"说话风格：{character.speaking_style}｜职责：{', '.join(character.responsibilities)}｜"
+                f"决策权限：{character.decision_power}")
+    
+    @staticmethod
+    def _phase_line(phase: PlanningPhase) -> str:
+        return (f"- {phase.name}：{phase.description}｜关键任务：{', '.join(phase.key_tasks)}｜"
+                f"交付物：{', '.join(phase.deliverables)}")
+    
+    def _create_context_model(self, system_instruction: str, tier: str = TIER_STRONG):
+        """创建以固定上下文为系统指令/缓存的模型，返回 (模型, 缓存)"""
+        model_name = settings.FAST_MODEL if tier == TIER_FAST else (settings.STRONG_MODEL or settings.DEFAULT_MODEL)
+        return create_context_model(self.api_key, model_name, system_instruction,
+                                    settings.PROMPT_CONTEXT_CACHE_TTL)
+    
+    def tier_model_name(self, tier: str) -> str:
+        """某个级别实际使用的模型名称"""
+        model = self.tier_models.get(tier, self.model)
+        return getattr(model, 'model_name', None) or type(model).__name__
+    
+    def prepare_static_context(self) -> str:
+        """每次运行开始时构建固定上下文，并尽量创建带上下文缓存的模型（只创建一次）
 
-        主活动事件：{self.main_event}
-        事件背景：{self.event_context if self.event_context else "无特殊背景"}
+        自行创建模型且启用 PROMPT_CONTEXT_CACHE 时，角色表、阶段表和要求作为系统指令/上下文缓存，
+        每条消息只发送发言人姓名、阶段名称、对话历史等变化的部分；
+        否则事件和要求放在每条提示词的开头（各次调用前缀相同），其余信息放在后面
+        """
+        self.release_static_context()
+        if settings.PROMPT_CONTEXT_CACHE and self._owns_model:
+            static_context = self._build_static_context(full=True)
+            # 缓存与模型绑定，分级时每个级别各创建一份
+            for tier in self.tier_models:
+                try:
+                    model, cache = self._create_context_model(static_context, tier)
+                except Exception as e:
+                    log.warning(f"⚠️ 创建上下文缓存失败，固定上下文将随每条消息发送: {e}")
+                    model, cache = None, None
+                if model is not None:
+                    self._context_models[tier] = model
+                    if cache is not None:
+                        self._context_caches[tier] = cache
+            if self._context_models:
+                log.info(f"🗂️ 固定上下文已{'缓存' if self._context_caches else '设为系统指令'}"
+                      f"（约 {estimate_tokens(static_context)} tokens）")
+                self.static_context = static_context
+                return static_context
         
-        {current_phase_info}
+        self.static_context = self._build_static_context(full=False)
+        return self.static_context
+    
+    def release_static_context(self):
+        """运行结束时删除上下文缓存"""
+        for cache in self._context_caches.values():
+            try:
+                cache.delete()
+            except Exception as e:
+                log.warning(f"⚠️ 删除上下文缓存失败: {e}")
+        self._context_models = {}
+        self._context_caches = {}
+    
+    def _planning_message_prompt(self, character: PlanningCharacter,
+                                 current_phase: str, context: Dict[str, Any]) -> str:
+        """构建生成策划消息的提示词
+
+        固定上下文在前（已作为系统指令/缓存时不再发送），之后是每条消息变化的部分：
+        发言人、当前阶段、对话历史、子事件和进度。超出token上限时先删减最早的对话历史
+        """
+        builder = PromptBuilder()
+        if context.get('tier', TIER_STRONG) in self._context_models:
+            # 角色表和阶段表已在上下文缓存中，只需给出姓名和阶段名称
+            builder.add(f"发言人：{character.name}（{character.role}）")
+            builder.add(f"当前阶段：{current_phase}")
+        else:
+            builder.add(self.static_context or self._build_static_context(full=False), static=True)
+            builder.add("发言人：\n" + self._character_line(character))
+            phase = next((p for p in self.planning_phases if p.name == current_phase), None)
+            builder.add("当前阶段：\n" + self._phase_line(phase) if phase else f"当前阶段：{current_phase}")
         
-        {history_text}
+        # 对话历史（流水线生成时使用派发时的历史快照）
+        history = context.get('history')
+        if history is None:
+            history = self.conversation_history[-self.history_window:]
+        builder.add_history(history)
         
-        {context_text}
+        # 子事件
+        sub_event = context.get('sub_event')
+        if sub_event:
+            builder.add(
+                f"当前子事件：{sub_event.name}\n"
+                f"事件描述：{sub_event.description}\n"
+                f"紧急程度：{sub_event.urgency}\n"
+                f"影响程度：{sub_event.impact}"
+            )
         
-        上下文：{context.get('general_context', '')}
-
-        要求：
-        1. 消息长度控制在30-100字之间
-        2. 符合角色的身份、级别、专业领域和说话风格
-        3. 与当前策划阶段相关，体现组织活动的特点
-        4. 考虑对话历史，避免重复
-        5. 使用中文，自然流畅，符合市井人物的语言特点
-        6. 体现策划过程的逻辑性和现实性
-        7. 如果有子事件，要体现对子事件的响应
-        8. 不要包含任何标记或前缀，直接输出消息内容
-        9. 说话要粗俗、直接、带脏话或方言，符合文化程度不高的特点
-        10. 不要过于职业化，要符合市井人物的真实情况
-
-        消息类型可以是：
-        - 任务分配和进度汇报
-        - 问题提出和解决方案讨论
-        - 决策制定和执行确认
-        - 资源协调和风险控制
-        - 阶段总结和下一步规划
-        - 行动执行和现场反馈
-        - 应对措施和紧急处理
-        - 外部动向和风险评估
-        - 痕迹清理和善后处理
-        - 团队保护和后路安排
+        builder.add(f"上下文：{context.get('general_context', '')}")
+        builder.add(f"请以{character.name}的身份生成一条消息：")
+        return builder.build()
+    
+    def generate_planning_message(self, character: PlanningCharacter, 
+                                current_phase: str, context: Dict[str, Any]) -> str:
+        """生成策划消息
 
-        请生成消息：
+        context['tier'] 决定使用的模型级别。调用失败时 context['failed'] 为True；
+        启用降级时按阶段和角色性格在本地生成占位消息，并设置 context['fallback'] 以便之后回填
         """
+        if self.fallback.degraded:
+            return self._fallback_message(character, current_phase, context)
+        
+        prompt = self._planning_message_prompt(character, current_phase, context)
+        tier = context.get('tier', TIER_STRONG)
+        model = self._context_models.get(tier) or self.tier_models.get(tier)
         
         try:
-            response = self.model.generate_content(prompt)
-            message = response.text.strip()
-            
-            # 清理消息内容
-            if message.startswith('"') and message.endswith('"'):
-                message = message[1:-1]
-            
+            response = self._generate_content(prompt, model=model, hedge=True)
+            message = self._clean_message(response.text)
+            self.fallback.record_success()
             return message
             
         except Exception as e:
-            print(f"❌ 生成消息失败: {e}")
+            log.error(f"❌ 生成消息失败: {e}", event="message.failed", sender=character.name,
+                      phase=current_phase)
+            context['failed'] = True
+            self.fallback.record_failure()
+            if self.fallback.enabled:
+                return self._fallback_message(character, current_phase, context)
             # 返回默认消息
             return f"关于{current_phase}阶段，我需要进一步确认..."
     
+    def _fallback_message(self, character: PlanningCharacter, current_phase: str,
+                          context: Dict[str, Any]) -> str:
+        """本地生成占位消息并标记为待回填"""
+        context['fallback'] = True
+        return self.fallback.compose(character, current_phase)
+    
+    @staticmethod
+    def _clean_message(text: str) -> str:
+        """去掉模型返回消息两端的空白和引号"""
+        message = text.strip()
+        if message.startswith('"') and message.endswith('"'):
+            message = message[1:-1]
+        return message
+    
+    def backfill_run_log(self, run_log_path: str = None) -> int:
+        """重新调用模型回填运行日志中标记为 fallback 的消息，返回回填的条数
+
+        消息按原来的序号、阶段、子事件和之前的对话历史重新生成，回填后去掉标记并记为 backfilled；
+        仍然失败的消息保持标记，可以稍后再次回填。QQ/微信格式可以之后由运行日志重新渲染
+        """
+        path = run_log_path or self.run_log_path
+        if not path:
+            raise ValueError("没有可回填的运行日志")
+        info, entries, end = read_run_log(path)
+        ordered = sorted(entries, key=lambda entry: entry['index'])
+        if not any(entry.get('fallback') for entry in ordered):
+            return 0
+        
+        # 角色和子事件以当前配置为准，缺少时使用运行日志中记录的
+        if not self.main_event:
+            self.main_event = info.get('event', '')
+            self.event_context = info.get('event_context', '')
+        characters = {char.name: char for char in self.planning_characters}
+        for char_data in info.get('characters', []):
+            characters.setdefault(char_data['name'], self._planning_character_from_dict(char_data))
+        sub_events = {event.name: event for event in self.sub_events}
+        for event_data in info.get('sub_events', []):
+            sub_events.setdefault(event_data['name'], SubEvent(**event_data))
+        total = info.get('target_message_count') or len(ordered)
+        
+        self.prepare_static_context()
+        patched = []
+        try:
+            for position, entry in enumerate(ordered):
+                character = characters.get(entry['sender'])
+                if not entry.get('fallback') or character is None:
+                    continue
+                context = {
+                    'general_context': f"第{entry['index']+1}条消息，当前进度{entry['index'] / total:.1%}",
+                    'sub_event': sub_events.get(entry.get('sub_event')),
+                    'history': ordered[max(0, position - self.history_window):position],
+                    'tier': TIER_STRONG
+                }
+                prompt = self._planning_message_prompt(character, entry.get('phase', ''), context)
+                self.metrics.retries.inc(run=self.conversation_id, reason="backfill")
+                try:
+                    response = self._generate_content(prompt, model=self._context_models.get(TIER_STRONG))
+                except Exception as e:
+                    log.error(f"❌ 回填第{entry['index']+1}条消息失败: {e}")
+                    continue
+                entry['content'] = self._clean_message(response.text)
+                del entry['fallback']
+                entry['backfilled'] = True
+                patched.append(entry)
+        finally:
+            self.release_static_context()
+            self.static_context = None
+        
+        if patched:
+            remaining = sum(1 for entry in ordered if entry.get('fallback'))
+            update_run_log(path, patched, fallback_count=remaining)
+            log.info(f"✅ 已回填 {len(patched)} 条消息，剩余 {remaining} 条待回填")
+        return len(patched)
+    
     def generate_planning_conversation(self, 
                                      total_duration_hours: float = 48.0,
                                      target_message_count: int = 2000,
                                      start_time: datetime.datetime = None,
-                                     realtime_save: bool = True,
-                                     save_interval: int = 10) -> List[ChatMessage]:
-        """生成策划组织对话"""
+                                     realtime_save: bool = None,
+                                     save_interval: int = None,
+                                     lookahead: int = None,
+                                     compression: str = None) -> List[ChatMessage]:
+        """生成策划组织对话
+        
+        lookahead > 1 时最多同时发出 lookahead 个消息请求：发送者、阶段、时间和子事件
+        不依赖上一条消息的内容，可以提前确定；每个请求使用派发时已有的对话历史，
+        结果按顺序提交。历史最多滞后 lookahead-1 条消息。
+        compression 为实时保存临时文件的压缩方式（none/gzip/zstd，默认使用配置）。
+        每次运行都写入JSONL运行日志（见 run_log），结束后路径保存在 self.run_log_path；
+        实时保存的QQ/微信临时文件由日志记录渲染。
+        realtime_save、save_interval、lookahead 未指定时使用运行配置（self.profile），
+        没有运行配置时默认实时保存、每10条保存一次、串行生成。
+        """
+        profile = self.profile
+        if realtime_save is None:
+            realtime_save = profile.realtime_save if profile else True
+        if save_interval is None:
+            save_interval = profile.save_interval if profile else 10
+        if lookahead is None:
+            lookahead = profile.lookahead if profile else 1
+        
         if not self.planning_characters:
             raise ValueError("请先生成策划团队成员")
         
@@ -725,77 +1136,135 @@ class PlanningChatGenerator:
         if start_time is None:
             start_time = datetime.datetime.now() - datetime.timedelta(hours=total_duration_hours)
         
-        # 生成策划阶段和子事件
-        self.generate_planning_phases()
-        self.generate_sub_events()
+        # 生成策划阶段和子事件（已生成或从配置加载时直接复用）
+        if not self.planning_phases:
+            self.generate_planning_phases()
+        if not self.sub_events:
+            self.generate_sub_events()
+        
+        # 子事件排期（已为相同消息数排好时直接复用）
+        if self.sub_event_schedule_size != target_message_count:
+            self.build_sub_event_schedule(target_message_count)
+        
+        # 固定上下文（角色表、阶段表、要求）每次运行只构建一次
+        self.prepare_static_context()
         
         self.conversation_history = []
         messages = []
+        self.speaker_selector = SpeakerSelector(self.planning_characters)
         self.phase_progress = {}
         self.decisions_made = []
         self.issues_raised = []
+        self.current_phase = ""
+        self.tier_stats = TierStats()
+        self.fallback.reset(self.event_context)
+        self.fallback_indices = []
+        
+        # 运行指标
+        ensure_exporter()
+        self.metrics.target_messages.set(target_message_count, run=self.conversation_id, kind="planning")
+        self.hedger.on_hedge = lambda: self.metrics.retries.inc(run=self.conversation_id, reason="hedge")
+        
+        # 运行日志（每次运行都写入，是这次运行的权威记录）
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        run_log = RunLog(os.path.join(settings.RUN_LOG_DIR,
+                                      f"planning_run_{timestamp}_{self.conversation_id}.jsonl"),
+                         fsync=settings.RUN_LOG_FSYNC)
+        run_log.write_header(
+            kind="planning",
+            conversation_id=self.conversation_id,
+            event=self.main_event,
+            event_context=self.event_context,
+            model=self.model_name,
+            tier_models={tier: self.tier_model_name(tier) for tier in self.tier_models},
+            profile=self.profile.to_dict() if self.profile else None,
+            target_message_count=target_message_count,
+            total_duration_hours=total_duration_hours,
+            start_time=start_time.isoformat(),
+            characters=[char.to_dict() for char in self.planning_characters],
+            phases=[asdict(phase) for phase in self.planning_phases],
+            sub_events=[asdict(event) for event in self.sub_events]
+        )
+        self.run_log_path = None
         
-        # 实时保存相关变量
+        # 实时保存的临时文件
         temp_filename_qq = None
         temp_filename_wechat = None
         if realtime_save:
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            temp_filename_qq = f"output/temp/planning_temp_qq_{timestamp}.txt"
-            temp_filename_wechat = f"output/temp/planning_temp_wechat_{timestamp}.txt"
+            temp_filename_qq = compressed_filename(
+                f"output/temp/planning_temp_qq_{timestamp}_{self.conversation_id}.txt", compression)
+            temp_filename_wechat = compressed_filename(
+                f"output/temp/planning_temp_wechat_{timestamp}_{self.conversation_id}.txt", compression)
             # 创建临时文件头部
             self._create_temp_file_header(temp_filename_qq, "qq")
             self._create_temp_file_header(temp_filename_wechat, "wechat")
         
-        print("🤖 开始生成策划组织对话...")
-        print(f"目标消息数量: {target_message_count}")
-        print(f"预计时长: {total_duration_hours} 小时")
+        log.info("🤖 开始生成策划组织对话...", event="run.start", run=self.conversation_id,
+                 target=target_message_count)
+        log.info(f"目标消息数量: {target_message_count}")
+        log.info(f"预计时长: {total_duration_hours} 小时")
+        log.info(f"运行日志: {run_log.part_filename}")
         if realtime_save:
-            print(f"实时保存: 每 {save_interval} 条消息保存一次")
-            print(f"临时文件: {temp_filename_qq}, {temp_filename_wechat}")
+            log.info(f"实时保存: 每 {save_interval} 条消息保存一次")
+            log.info(f"临时文件: {temp_filename_qq}, {temp_filename_wechat}")
+        if self.profile:
+            log.info(f"运行配置: {self.profile.name}", event="run.profile", **self.profile.to_dict())
+        if lookahead > 1:
+            log.info(f"流水线生成: 最多 {lookahead} 个请求同时进行")
+        
+        lookahead = max(1, lookahead)
+        executor = ThreadPoolExecutor(max_workers=lookahead) if lookahead > 1 else None
+        pending = deque()  # (slot, future)，按消息顺序排列
+        next_index = 0
+        last_sender = None
+        planned_phase = ""  # 最近规划的一条消息所在阶段（规划可能领先提交lookahead条）
+        log_entries: List[Dict[str, Any]] = []  # 待写入运行日志的记录
+        status = "failed"
+        
+        # 时间戳有抖动，先放入重排缓冲区，确定之后不会有更早的消息时再按时间顺序输出，
+        # messages、临时文件和运行日志因此都已按时间排序
+        reorder = ReorderBuffer()
+        
+        def emit(items):
+            for message, log_entry in items:
+                messages.append(message)
+                log_entries.append(log_entry)
         
         try:
-            for i in range(target_message_count):
-                # 计算当前进度
-                progress = i / target_message_count
-                current_phase = self.get_current_phase(progress)
-                
-                # 更新阶段进度
-                if current_phase not in self.phase_progress:
-                    self.phase_progress[current_phase] = 0.0
-                self.phase_progress[current_phase] = progress
-                
-                # 随机选择角色（避免连续相同角色）
-                available_chars = self.planning_characters.copy()
-                if messages and len(messages) > 0:
-                    last_sender = messages[-1].sender
-                    available_chars = [char for char in available_chars if char.name != last_sender]
-                
-                if not available_chars:
-                    available_chars = self.planning_characters
+            while next_index < target_message_count or pending:
+                # 派发：保持最多lookahead个请求在途
+                while next_index < target_message_count and len(pending) < lookahead:
+                    slot = self._plan_planning_slot(next_index, target_message_count, start_time,
+                                                    total_duration_hours, last_sender, planned_phase)
+                    last_sender = slot['character'].name
+                    planned_phase = slot['current_phase']
+                    slot['context']['history'] = self.conversation_history[-self.history_window:]
+                    
+                    if executor is None:
+                        future = Future()
+                        future.set_result(self._generate_slot_message(slot))
+                    else:
+                        future = executor.submit(self._generate_slot_message, slot)
+                    pending.append((slot, future))
+                    next_index += 1
+                    
+                    # 添加延迟避免API限制（降级时不调用API，不需要等待）
+                    if not self.fallback.degraded:
+                        time.sleep(self.request_interval)
                 
-                character = random.choice(available_chars)
-                
-                # 生成时间戳
-                time_progress = i / target_message_count
-                message_time = start_time + datetime.timedelta(
-                    hours=total_duration_hours * time_progress + random.uniform(-0.1, 0.1)
-                )
-                
-                # 判断是否触发子事件
-                sub_event = self.should_trigger_sub_event(current_phase, i)
-                
-                # 构建上下文
-                context = {
-                    'general_context': f"第{i+1}条消息，当前进度{progress:.1%}",
-                    'current_phase': current_phase,
-                    'sub_event': sub_event
-                }
+                # 按顺序提交最早的一条
+                slot, future = pending.popleft()
+                content = future.result()
+                character = slot['character']
+                message_time = slot['message_time']
+                sub_event = slot['sub_event']
+                i = slot['index']
                 
-                # 生成策划消息
-                if i % 100 == 0:  # 每100条消息显示一次进度
-                    print(f"  生成进度: {i+1}/{target_message_count} ({progress:.1%}) - 当前阶段: {current_phase}")
-                
-                content = self.generate_planning_message(character, current_phase, context)
+                # 按提交顺序更新阶段和阶段进度（规划时不修改生成器状态）
+                self.phase_progress[slot['current_phase']] = slot['progress']
+                if slot['current_phase'] != self.current_phase:
+                    self.current_phase = slot['current_phase']
+                    self.metrics.set_phase(self.conversation_id, self.current_phase)
                 
                 # 创建消息对象
                 message = ChatMessage(
@@ -804,54 +1273,174 @@ class PlanningChatGenerator:
                     timestamp=message_time
                 )
                 
-                messages.append(message)
-                
-                # 添加到对话历史
-                self.conversation_history.append({
+                # 添加到对话历史（按生成顺序）
+                history_entry = {
                     'sender': character.name,
                     'content': content,
                     'timestamp': message_time.isoformat(),
-                    'phase': current_phase,
+                    'phase': slot['current_phase'],
                     'sub_event': sub_event.name if sub_event else None
-                })
+                }
+                self.conversation_history.append(history_entry)
+                self.metrics.messages.inc(run=self.conversation_id, kind="planning")
+                log_entry = {'index': i, **history_entry, 'call': slot.get('call')}
+                if slot['context'].get('fallback'):
+                    # 本地生成的占位消息，之后可以用 backfill_run_log 回填
+                    self.fallback_indices.append(i)
+                    self.metrics.fallbacks.inc(run=self.conversation_id)
+                    log_entry['fallback'] = True
                 
-                # 实时保存
-                if realtime_save and (i + 1) % save_interval == 0:
-                    self._append_to_temp_files(messages[-save_interval:], temp_filename_qq, temp_filename_wechat)
-                    print(f"  💾 已保存 {i+1} 条消息到临时文件")
+                # 之后的消息时间戳不会早于下一条的基准时间减去抖动幅度
+                reorder.push(message_time, (message, log_entry))
+                watermark = start_time + datetime.timedelta(
+                    hours=total_duration_hours * (i + 1) / target_message_count - self.timestamp_jitter_hours
+                )
+                emit(reorder.release(watermark))
                 
-                # 添加延迟避免API限制
-                time.sleep(0.3)
+                # 定期写入运行日志（实时保存时同时更新临时文件）
+                if (i + 1) % save_interval == 0:
+                    self._flush_realtime(log_entries, run_log, temp_filename_qq, temp_filename_wechat)
+                    if realtime_save:
+                        log.info("  💾 已保存 %d 条消息到临时文件", i + 1, event="realtime.saved", count=i + 1)
             
             # 保存剩余的消息
-            if realtime_save and len(messages) % save_interval != 0:
-                remaining_messages = messages[-(len(messages) % save_interval):]
-                self._append_to_temp_files(remaining_messages, temp_filename_qq, temp_filename_wechat)
-            
-            # 按时间排序
-            messages.sort(key=lambda x: x.timestamp)
+            emit(reorder.drain())
+            self._flush_realtime(log_entries, run_log, temp_filename_qq, temp_filename_wechat)
+            status = "completed"
             
-            print(f"✅ 成功生成 {len(messages)} 条策划组织对话")
+            log.info("✅ 成功生成 %d 条策划组织对话", len(messages), event="run.completed",
+                     run=self.conversation_id, count=len(messages))
             return messages
             
         except KeyboardInterrupt:
-            print(f"\n⚠️ 用户中断生成，已保存 {len(messages)} 条消息")
+            emit(reorder.drain())
+            log.warning("\n⚠️ 用户中断生成，已保存 %d 条消息", len(messages), event="run.interrupted",
+                        run=self.conversation_id, count=len(messages))
+            status = "interrupted"
+            # 保存尚未写入的消息
+            self._flush_realtime(log_entries, run_log, temp_filename_qq, temp_filename_wechat)
             if realtime_save and messages:
-                # 保存已生成的消息
-                self._append_to_temp_files(messages, temp_filename_qq, temp_filename_wechat)
-                print(f"💾 已保存到临时文件: {temp_filename_qq}, {temp_filename_wechat}")
+                log.info(f"💾 已保存到临时文件: {temp_filename_qq}, {temp_filename_wechat}")
             return messages
         except Exception as e:
-            print(f"\n❌ 生成过程中出现错误: {e}")
+            log.error(f"\n❌ 生成过程中出现错误: {e}", event="run.failed", run=self.conversation_id,
+                      count=len(messages))
+            emit(reorder.drain())
+            # 保存尚未写入的消息
+            self._flush_realtime(log_entries, run_log, temp_filename_qq, temp_filename_wechat)
             if realtime_save and messages:
-                # 保存已生成的消息
-                self._append_to_temp_files(messages, temp_filename_qq, temp_filename_wechat)
-                print(f"💾 已保存到临时文件: {temp_filename_qq}, {temp_filename_wechat}")
+                log.info(f"💾 已保存到临时文件: {temp_filename_qq}, {temp_filename_wechat}")
             raise
+        finally:
+            if executor is not None:
+                for _, future in pending:
+                    future.cancel()
+                executor.shutdown(wait=False)
+            tier_summary = self.tier_stats.summary()
+            if tier_summary:
+                log.info(f"📊 模型调用: {tier_summary}", event="run.tiers", tiers=self.tier_stats.report())
+            if self.fallback_indices:
+                log.warning(f"⚠️ {len(self.fallback_indices)} 条消息由本地模板生成，可用 backfill_run_log 回填",
+                            event="run.fallback", count=len(self.fallback_indices))
+            if self.hedger.hedged:
+                log.info(f"⏱️ 对冲请求 {self.hedger.hedged} 次，其中 {self.hedger.hedge_wins} 次对冲请求先返回",
+                         event="run.hedging", **self.hedger.stats())
+            self.hedger.shutdown()
+            flush_exporter()
+            summary = {'hedging': self.hedger.stats()} if self.hedger.enabled else {}
+            self.run_log_path = run_log.finalize(status, tiers=self.tier_stats.report(),
+                                                 fallback_count=len(self.fallback_indices), **summary)
+            log.info(f"📝 运行日志: {self.run_log_path}", event="run.log", path=self.run_log_path, status=status)
+            self.release_static_context()
+            self.static_context = None
+    
+    def _generate_slot_message(self, slot: Dict[str, Any]) -> str:
+        """生成一个消息槽位的内容，并在槽位中记录调用信息（模型级别、模型、耗时）"""
+        tier = slot['context']['tier']
+        call_start = time.perf_counter()
+        content = self.generate_planning_message(slot['character'], slot['current_phase'], slot['context'])
+        latency = time.perf_counter() - call_start
+        model_name = self.tier_model_name(tier)
+        failed = slot['context'].get('failed', False)
+        if failed or not slot['context'].get('fallback'):
+            # 降级期间没有调用API的消息不计入统计
+            self.tier_stats.record(tier, model_name, latency, ok=not failed)
+        slot['call'] = {
+            'tier': tier,
+            'model': model_name,
+            'latency': round(latency, 3)
+        }
+        return content
+    
+    def _flush_realtime(self, log_entries: List[Dict[str, Any]], run_log: RunLog,
+                        temp_filename_qq: Optional[str], temp_filename_wechat: Optional[str]):
+        """把尚未保存的消息写入运行日志，有临时文件时再由这批日志记录渲染追加到临时文件"""
+        if not log_entries:
+            return
+        run_log.append_messages(log_entries)
+        if temp_filename_qq:
+            self._append_to_temp_files(messages_from_entries(log_entries), temp_filename_qq, temp_filename_wechat)
+        log_entries.clear()
+    
+    def _plan_planning_slot(self, i: int, target_message_count: int, start_time: datetime.datetime,
+                            total_duration_hours: float, last_sender: Optional[str],
+                            previous_phase: str = "") -> Dict[str, Any]:
+        """确定第i条消息的发送者、阶段、时间戳和子事件（不依赖之前消息的内容）
+
+        previous_phase 为上一条规划的消息所在阶段；当前阶段和阶段进度在提交时才更新
+        """
+        # 计算当前进度
+        progress = i / target_message_count
+        current_phase = self.get_current_phase(progress)
+        
+        # 按级别和决策权限加权选择角色（避免连续相同角色）
+        character = self.speaker_selector.next_speaker(last_sender)
+        
+        # 生成时间戳
+        time_progress = i / target_message_count
+        message_time = start_time + datetime.timedelta(
+            hours=total_duration_hours * time_progress
+            + random.uniform(-self.timestamp_jitter_hours, self.timestamp_jitter_hours)
+        )
+        
+        # 判断是否触发子事件
+        sub_event = self.should_trigger_sub_event(current_phase, i)
+        
+        # 选择模型级别（没有快速模型时都使用强模型）
+        phase_changed = current_phase != previous_phase
+        if TIER_FAST not in self.tier_models:
+            tier = TIER_STRONG
+        elif self.model_tier == TIER_AUTO:
+            tier = self.model_router.route(current_phase, sub_event, character, phase_changed)
+        else:
+            tier = self.model_tier
+        
+        # 构建上下文
+        context = {
+            'general_context': f"第{i+1}条消息，当前进度{progress:.1%}",
+            'current_phase': current_phase,
+            'sub_event': sub_event,
+            'tier': tier
+        }
+        
+        # 生成策划消息
+        # 进度按 planning.progress 的采样率输出（默认每100条一次）
+        log.info("  生成进度: %d/%d (%.1f%%) - 当前阶段: %s", i + 1, target_message_count, progress * 100,
+                 current_phase, event="planning.progress", seq=i, index=i, phase=current_phase)
+        
+        return {
+            'index': i,
+            'character': character,
+            'current_phase': current_phase,
+            'progress': progress,
+            'message_time': message_time,
+            'sub_event': sub_event,
+            'context': context
+        }
     
     def save_planning_conversation(self, messages: List[ChatMessage], 
-                                 filename: str, style: str = "qq"):
-        """保存策划对话到文件"""
+                                 filename: str, style: str = "qq", compression: str = None) -> str:
+        """保存策划对话到文件（compression 为 none/gzip/zstd，默认使用配置），返回实际文件名"""
         if style == "qq":
             content = self._format_qq_style(messages)
         elif style == "wechat":
@@ -859,13 +1448,28 @@ class PlanningChatGenerator:
         else:
             raise ValueError("不支持的格式，请使用 'qq' 或 'wechat'")
         
-        # 确保目录存在
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        filename = write_text(filename, content, compression)
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(content)
+        log.info(f"✅ 策划对话已保存到: {filename}")
+        return filename
+    
+    def save_planning_conversation_by_day(self, messages: List[ChatMessage], directory: str,
+                                          style: str = "qq", compression: str = None) -> str:
+        """按天分片保存策划对话（每天一个文件，另有 manifest.json），返回manifest路径"""
+        if style == "qq":
+            render = self._format_qq_style
+        elif style == "wechat":
+            render = self._format_wechat_style
+        else:
+            raise ValueError("不支持的格式，请使用 'qq' 或 'wechat'")
+        
+        manifest_filename = write_day_shards(
+            messages, directory, render, prefix=f"planning_chat_{style}", compression=compression,
+            extra={"style": style, "event": self.main_event, "conversation_id": self.conversation_id}
+        )
         
-        print(f"✅ 策划对话已保存到: {filename}")
+        log.info(f"✅ 策划对话已按天分片保存到: {directory}")
+        return manifest_filename
     
     def _format_qq_style(self, messages: List[ChatMessage]) -> str:
         """格式化为QQ风格"""
@@ -956,7 +1560,71 @@ class PlanningChatGenerator:
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(config, f, ensure_ascii=False, indent=2)
         
-        print(f"✅ 策划配置已保存到: {filename}")
+        log.info(f"✅ 策划配置已保存到: {filename}")
+    
+    def load_planning_config(self, filename: str = "planning_config.json"):
+        """加载策划配置（角色、阶段和子事件），加载后生成对话无需再调用API生成这些内容"""
+        if not os.path.exists(filename):
+            log.error(f"❌ 配置文件不存在: {filename}")
+            return False
+        
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            
+            self.main_event = config.get("main_event", "")
+            self.event_context = config.get("event_context", "")
+            
+            self.planning_characters = []
+            for char_data in config.get("characters", []):
+                planning_char = PlanningCharacter(
+                    name=char_data["name"],
+                    role=char_data["role"],
+                    department=char_data["department"],
+                    level=char_data["level"],
+                    expertise=char_data["expertise"],
+                    personality=char_data["personality"],
+                    speaking_style=char_data["speaking_style"],
+                    responsibilities=char_data["responsibilities"],
+                    decision_power=char_data["decision_power"]
+                )
+                self.planning_characters.append(planning_char)
+            
+            self.planning_phases = [PlanningPhase(**phase_data) for phase_data in config.get("phases", [])]
+            self.sub_events = [SubEvent(**event_data) for event_data in config.get("sub_events", [])]
+            self.sub_event_schedule_size = 0
+            
+            log.info(f"✅ 策划配置已从 {filename} 加载")
+            log.info(f"   团队成员: {len(self.planning_characters)} 人, "
+                  f"策划阶段: {len(self.planning_phases)} 个, 子事件: {len(self.sub_events)} 个")
+            return True
+            
+        except Exception as e:
+            log.error(f"❌ 加载配置失败: {e}")
+            return False
+    
+    def _generate_content(self, prompt: str, priority: int = PRIORITY_NORMAL, model: Any = None,
+                          hedge: bool = False):
+        """调用模型生成内容（model 默认为 self.model），设置了调度器时经由调度器排队
+
+        hedge=True 时按 self.hedger 的策略对冲慢请求
+        """
+        model = model or self.model
+        if hedge:
+            return self.hedger.call(self._call_model, model, prompt, priority)
+        return self._call_model(model, prompt, priority)
+    
+    def _call_model(self, model: Any, prompt: str, priority: int):
+        if self.scheduler is None:
+            return self._request(model, prompt)
+        return self.scheduler.call(self.conversation_id, self._request, model, prompt, priority=priority)
+    
+    def _request(self, model: Any, prompt: str):
+        """发出一次模型请求并记录指标（进行中数量、耗时、失败和token用量）"""
+        with self.metrics.track_request(self.conversation_id):
+            response = model.generate_content(prompt)
+        self.metrics.record_tokens(self.conversation_id, prompt, response)
+        return response
     
     def _clean_json_response(self, response_text: str) -> str:
         """清理AI返回的JSON响应"""
@@ -974,7 +1642,7 @@ class PlanningChatGenerator:
         
         # 如果响应为空或不是JSON格式，返回默认结构
         if not response_text or not response_text.startswith('{'):
-            print("⚠️ AI返回的内容不是有效的JSON格式，使用默认数据")
+            log.warning("⚠️ AI返回的内容不是有效的JSON格式，使用默认数据")
             return '{"characters": [], "sub_events": []}'
         
         return response_text
@@ -1002,11 +1670,7 @@ class PlanningChatGenerator:
         output.append("💾 实时保存中，请勿手动编辑此文件...")
         output.append("")
         
-        # 确保目录存在
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write("\n".join(output))
+        write_text(filename, "\n".join(output), detect_compression(filename))
     
     def _append_to_temp_files(self, messages: List[ChatMessage], 
                             qq_filename: str, wechat_filename: str):
@@ -1020,12 +1684,8 @@ class PlanningChatGenerator:
             time_str = message.timestamp.strftime("%H:%M:%S")
             qq_lines.append(f"[{time_str}] {message.sender}: {message.content}")
         
-        # 确保目录存在
-        os.makedirs(os.path.dirname(qq_filename), exist_ok=True)
-        os.makedirs(os.path.dirname(wechat_filename), exist_ok=True)
-        
-        with open(qq_filename, 'a', encoding='utf-8') as f:
-            f.write("\n".join(qq_lines) + "\n")
+        # 压缩文件每次追加写入一个完整的帧
+        append_text(qq_filename, "\n".join(qq_lines) + "\n")
         
         # 微信格式
         wechat_lines = []
@@ -1033,21 +1693,36 @@ class PlanningChatGenerator:
             time_str = message.timestamp.strftime("%H:%M")
             wechat_lines.append(f"{time_str} {message.sender}\n{message.content}\n")
         
-        with open(wechat_filename, 'a', encoding='utf-8') as f:
-            f.write("\n".join(wechat_lines))
+        append_text(wechat_filename, "\n".join(wechat_lines))
     
     def finalize_temp_files(self, temp_qq_filename: str, temp_wechat_filename: str,
-                          final_qq_filename: str, final_wechat_filename: str):
-        """完成临时文件，重命名为最终文件"""
+                          final_qq_filename: str, final_wechat_filename: str, run_log_path: str = None):
+        """完成临时文件：有运行日志（默认为最近一次运行的日志）时由日志渲染最终文件并删除临时文件，
+        否则把临时文件重命名为最终文件"""
         import shutil
         
+        # 临时文件是压缩的，最终文件使用同样的扩展名
+        final_qq_filename = compressed_filename(final_qq_filename, detect_compression(temp_qq_filename))
+        final_wechat_filename = compressed_filename(final_wechat_filename, detect_compression(temp_wechat_filename))
+        
+        run_log_path = run_log_path or self.run_log_path
+        if run_log_path and os.path.exists(run_log_path):
+            messages = load_messages(run_log_path)
+            self.save_planning_conversation(messages, final_qq_filename, "qq", detect_compression(temp_qq_filename))
+            self.save_planning_conversation(messages, final_wechat_filename, "wechat",
+                                            detect_compression(temp_wechat_filename))
+            for temp_filename in (temp_qq_filename, temp_wechat_filename):
+                if os.path.exists(temp_filename):
+                    os.remove(temp_filename)
+            return
+        
         if os.path.exists(temp_qq_filename):
             shutil.move(temp_qq_filename, final_qq_filename)
-            print(f"✅ QQ格式文件已保存到: {final_qq_filename}")
+            log.info(f"✅ QQ格式文件已保存到: {final_qq_filename}")
         
         if os.path.exists(temp_wechat_filename):
             shutil.move(temp_wechat_filename, final_wechat_filename)
-            print(f"✅ 微信格式文件已保存到: {final_wechat_filename}")
+            log.info(f"✅ 微信格式文件已保存到: {final_wechat_filename}")
 
 
 def main():
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行配置（性能档位）
+把影响吞吐量的参数打包成命名的档位，一次切换而不用分别调整：
+并发（流水线请求数）、分页大小、请求间隔、历史条数、模型级别和保存策略。
+
+内置 fast、balanced、quality 三个档位；RUN_PROFILES_FILE 指定的JSON文件可以新增档位
+或覆盖内置档位的部分参数（"base" 指定继承的档位），RUN_PROFILE 选择默认使用的档位。
+"""
+
+import json
+from dataclasses import asdict, dataclass, fields, replace
+from typing import Any, Dict, Optional, Union
+
+from .model_router import TIER_AUTO, TIER_FAST, TIER_STRONG
+
+MODEL_TIERS = (TIER_FAST, TIER_AUTO, TIER_STRONG)
+
+
+@dataclass(frozen=True)
+class RunProfile:
+    """一组吞吐量相关的运行参数"""
+    name: str
+    lookahead: int = 1  # 同时进行的消息请求数（策划生成器的流水线生成）
+    page_size: int = 10  # 分页生成角色时每页的数量
+    request_interval: float = 0.3  # 每条消息调用之间的间隔（秒）
+    history_window: int = 3  # 生成消息时参考的最近对话条数
+    model_tier: str = TIER_AUTO  # fast/strong 所有消息使用该级别，auto 按路由规则选择
+    realtime_save: bool = True
+    save_interval: int = 10  # 实时保存间隔（条消息）
+
+    def __post_init__(self):
+        if self.model_tier not in MODEL_TIERS:
+            raise ValueError(f"运行配置 {self.name} 的 model_tier 无效: {self.model_tier}"
+                             f"（可选: {', '.join(MODEL_TIERS)}）")
+        if self.lookahead < 1 or self.page_size < 1 or self.save_interval < 1 or self.history_window < 1:
+            raise ValueError(f"运行配置 {self.name} 的参数无效: {asdict(self)}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+# 内置档位
+BUILTIN_PROFILES: Dict[str, RunProfile] = {
+    # 吞吐量优先：多请求并发、不等待、只带少量历史，日常消息全部使用快速模型
+    "fast": RunProfile(name="fast", lookahead=8, page_size=20, request_interval=0.0, history_window=2,
+                       model_tier=TIER_FAST, realtime_save=True, save_interval=100),
+    # 默认档位：和未指定档位时的行为接近，适度并发
+    "balanced": RunProfile(name="balanced", lookahead=4, page_size=10, request_interval=0.1,
+                           history_window=3, model_tier=TIER_AUTO, realtime_save=True, save_interval=20),
+    # 质量优先：串行生成、带更多历史，所有消息使用强模型，频繁保存
+    "quality": RunProfile(name="quality", lookahead=1, page_size=5, request_interval=0.5, history_window=8,
+                          model_tier=TIER_STRONG, realtime_save=True, save_interval=10),
+}
+
+
+def load_profiles(path: Optional[str] = None) -> Dict[str, RunProfile]:
+    """
+    内置档位加上文件中定义的档位（path 为空时使用配置中的 RUN_PROFILES_FILE）
+    文件格式: {"档位名": {"base": "balanced", "lookahead": 6, ...}}，未指定 base 时
+    同名内置档位作为基础，没有同名档位时使用字段默认值
+    """
+    from ..config import settings
+    profiles = dict(BUILTIN_PROFILES)
+    path = path or settings.RUN_PROFILES_FILE
+    if not path:
+        return profiles
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    known = {field.name for field in fields(RunProfile)}
+    for name, values in data.items():
+        values = dict(values)
+        base_name = values.pop("base", name)
+        unknown = set(values) - known
+        if unknown:
+            raise ValueError(f"运行配置 {name} 包含未知参数: {', '.join(sorted(unknown))}")
+        values["name"] = name
+        base = profiles.get(base_name)
+        if base is None and base_name != name:
+            raise ValueError(f"运行配置 {name} 继承的档位不存在: {base_name}")
+        profiles[name] = replace(base, **values) if base is not None else RunProfile(**values)
+    return profiles
+
+
+def get_profile(profile: Union[str, RunProfile, None] = None,
+                path: Optional[str] = None) -> Optional[RunProfile]:
+    """
+    按名称获取档位（已是 RunProfile 时直接返回）
+    未指定名称时使用配置中的 RUN_PROFILE，也未配置时返回None（使用生成器自身的默认参数）
+    """
+    if isinstance(profile, RunProfile):
+        return profile
+    from ..config import settings
+    name = profile or settings.RUN_PROFILE
+    if not name:
+        return None
+    profiles = load_profiles(path)
+    if name not in profiles:
+        raise ValueError(f"未知的运行配置: {name}（可选: {', '.join(profiles)}）")
+    return profiles[name]
+
+
+def model_name_for_tier(tier: Optional[str]) -> str:
+    """档位的模型级别对应的模型名称（对应级别未配置模型时使用 DEFAULT_MODEL）"""
+    from ..config import settings
+    if tier == TIER_FAST and settings.FAST_MODEL:
+        return settings.FAST_MODEL
+    if tier == TIER_STRONG and settings.STRONG_MODEL:
+        return settings.STRONG_MODEL
+    return settings.DEFAULT_MODEL
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+提示词构建
+把提示词拆成若干文本块拼接：
+
+- 去掉每行首尾的空白和多余空行（源码中三引号字符串的缩进不再随每次调用发送）
+- 固定的说明文字（static=True）只压缩一次并缓存，同一提示词中重复的文本块只保留一份
+- 按估算的token数限制每次调用的长度，超出时先从最早的对话历史开始删减，再删减可选文本块
+"""
+
+import functools
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def _minify(text: str) -> str:
+    lines = []
+    blank = False
+    for line in text.strip().splitlines():
+        line = line.strip()
+        if not line:
+            blank = True
+            continue
+        if blank and lines:
+            lines.append("")
+        lines.append(line)
+        blank = False
+    return "\n".join(lines)
+
+
+@functools.lru_cache(maxsize=256)
+def _minify_static(text: str) -> str:
+    return _minify(text)
+
+
+def minify(text: str, static: bool = False) -> str:
+    """去掉每行首尾空白，连续空行合并为一行（static=True 时缓存结果）"""
+    return _minify_static(text) if static else _minify(text)
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中日韩字符约每字1个token，其他字符约每4个字符1个token"""
+    cjk = 0
+    for char in text:
+        if char >= "⺀":
+            cjk += 1
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _resolve_budget(token_budget: Optional[int]) -> int:
+    if token_budget is None:
+        from ..config import settings
+        token_budget = settings.PROMPT_TOKEN_BUDGET
+    return max(0, token_budget)
+
+
+class PromptBuilder:
+    """按文本块构建提示词
+
+    token_budget 为每次调用的token上限（默认使用配置 PROMPT_TOKEN_BUDGET，0 表示不限制）
+    """
+
+    def __init__(self, token_budget: Optional[int] = None):
+        self.token_budget = _resolve_budget(token_budget)
+        # (文本, 是否可删减)，对话历史占一个位置，文本为None
+        self._blocks: List[Tuple[Optional[str], bool]] = []
+        self._seen = set()
+        self._history_title = ""
+        self._history: List[str] = []
+        self.tokens = 0
+        self.trimmed_history = 0
+
+    def add(self, text: str, static: bool = False, optional: bool = False) -> "PromptBuilder":
+        """添加一个文本块（空文本和重复的文本块会被忽略）
+
+        static: 固定的说明文字，压缩结果会被缓存
+        optional: 超出token上限时可以删掉（在对话历史删完之后）
+        """
+        text = minify(text, static) if text else ""
+        if text and text not in self._seen:
+            self._seen.add(text)
+            self._blocks.append((text, optional))
+        return self
+
+    def add_history(self, history: Iterable[Dict[str, Any]],
+                    title: str = "最近的对话历史：") -> "PromptBuilder":
+        """添加对话历史（每条为含 sender、content 的字典），超出token上限时从最早的开始删减"""
+        self._history_title = title
+        self._history = [f"- {msg['sender']}: {minify(str(msg['content']))}" for msg in history]
+        self._blocks.append((None, False))
+        return self
+
+    def _render(self, history: List[str], dropped: set) -> str:
+        parts = []
+        for index, (text, _) in enumerate(self._blocks):
+            if text is None:
+                if history:
+                    parts.append("\n".join([self._history_title] + history))
+            elif index not in dropped:
+                parts.append(text)
+        return "\n".join(parts)
+
+    def build(self) -> str:
+        """拼接提示词，超出token上限时依次删减对话历史和可选文本块"""
+        history = list(self._history)
+        dropped = set()
+        prompt = self._render(history, dropped)
+        self.tokens = estimate_tokens(prompt)
+
+        if self.token_budget:
+            optional = [i for i, (text, is_optional) in enumerate(self._blocks) if is_optional]
+            while self.tokens > self.token_budget and (history or optional):
+                if history:
+                    history.pop(0)
+                else:
+                    dropped.add(optional.pop())
+                prompt = self._render(history, dropped)
+                self.tokens = estimate_tokens(prompt)
+
+        self.trimmed_history = len(self._history) - len(history)
+        return prompt
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重排缓冲区
+消息按生成顺序产生，但时间戳带有随机抖动，可能比前一条更早。
+缓冲区只保留抖动窗口内的消息，一旦确定之后不会再出现更早的消息就按时间顺序放出，
+这样实时保存和流式输出不需要在结束时整体排序
+"""
+
+import heapq
+import datetime
+from typing import Any, List, Optional, Tuple
+
+
+class ReorderBuffer:
+    """按时间戳重排的有界缓冲区
+
+    调用方保证之后推入的消息时间戳都不早于 watermark（通常为下一条消息的基准时间减去抖动幅度），
+    release(watermark) 放出所有早于 watermark 的消息。相同时间戳按推入顺序放出。
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size
+        self._heap: List[Tuple[datetime.datetime, int, Any]] = []
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, timestamp: datetime.datetime, item: Any):
+        """推入一条消息"""
+        heapq.heappush(self._heap, (timestamp, self._seq, item))
+        self._seq += 1
+
+    def release(self, watermark: datetime.datetime) -> List[Any]:
+        """按时间顺序放出早于 watermark 的消息（超过 max_size 时强制放出最早的消息）"""
+        released = []
+        while self._heap and (self._heap[0][0] < watermark or
+                              (self.max_size is not None and len(self._heap) > self.max_size)):
+            released.append(heapq.heappop(self._heap)[2])
+        return released
+
+    def drain(self) -> List[Any]:
+        """按时间顺序放出所有剩余消息"""
+        released = []
+        while self._heap:
+            released.append(heapq.heappop(self._heap)[2])
+        return released
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行日志
+每次对话生成都写一份只追加的JSONL日志，作为这次运行的权威记录：
+
+- 第一行是运行信息（type=run），之后每行一条消息（type=message），
+  包含发送者、时间、阶段、子事件和模型调用信息，结束时写入 type=end（含各模型级别的调用统计）
+- 运行中写入 *.jsonl.part，每批写完立即flush，进程中断时最多丢失最后一行（读取时跳过写坏的行）
+- 结束时原子重命名为最终文件名；QQ/微信格式的文本由日志渲染
+"""
+
+import os
+import json
+import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .base_generator import ChatMessage
+
+PART_SUFFIX = ".part"
+
+
+class RunLog:
+    """只追加的JSONL运行日志"""
+
+    def __init__(self, filename: str, fsync: bool = False):
+        """filename 为最终文件名，运行中写入 filename + '.part'"""
+        self.filename = filename
+        self.part_filename = filename + PART_SUFFIX
+        self.fsync = fsync
+        self.message_count = 0
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.part_filename, 'a', encoding='utf-8')
+
+    def _write(self, records: Iterable[Dict[str, Any]]):
+        lines = [json.dumps(record, ensure_ascii=False) + "\n" for record in records]
+        if not lines:
+            return
+        self._file.write("".join(lines))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def write_header(self, **info):
+        """写入运行信息"""
+        self._write([{
+            "type": "run",
+            "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            **info
+        }])
+
+    def append_messages(self, entries: Iterable[Dict[str, Any]]):
+        """追加一批消息记录（每条需包含 sender、content、timestamp）"""
+        records = [{"type": "message", **entry} for entry in entries]
+        self.message_count += len(records)
+        self._write(records)
+
+    def finalize(self, status: str = "completed", **summary) -> str:
+        """写入结束记录（summary 为额外的汇总信息，如各模型级别的调用统计）并原子重命名为最终文件，返回最终文件名"""
+        if self._file.closed:
+            return self.filename
+        self._write([{
+            "type": "end",
+            "status": status,
+            "message_count": self.message_count,
+            "finished_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            **summary
+        }])
+        self._file.close()
+        os.replace(self.part_filename, self.filename)
+        return self.filename
+
+
+def read_run_log(filename: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """读取运行日志，返回 (运行信息, 消息记录列表, 结束记录)
+
+    也可以读取未完成的 .part 文件；写坏的行（通常是中断时的最后一行）会被跳过。
+    """
+    info: Dict[str, Any] = {}
+    entries: List[Dict[str, Any]] = []
+    end: Optional[Dict[str, Any]] = None
+
+    with open(filename, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            record_type = record.pop("type", None)
+            if record_type == "message":
+                entries.append(record)
+            elif record_type == "run":
+                info = record
+            elif record_type == "end":
+                end = record
+
+    return info, entries, end
+
+
+def update_run_log(filename: str, entries: Iterable[Dict[str, Any]], **end_fields):
+    """用更新后的消息记录（按 index 对应）替换已完成运行日志中的记录，end_fields 更新结束记录
+
+    先写临时文件再原子替换，替换前中断时原日志不受影响
+    """
+    updates = {entry["index"]: entry for entry in entries}
+    temp_filename = filename + ".tmp"
+    with open(filename, 'r', encoding='utf-8') as src, open(temp_filename, 'w', encoding='utf-8') as dst:
+        for line in src:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("type") == "message" and record.get("index") in updates:
+                record = {"type": "message", **updates[record["index"]]}
+            elif record.get("type") == "end":
+                record.update(end_fields)
+            dst.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(temp_filename, filename)
+
+
+def messages_from_entries(entries: Iterable[Dict[str, Any]]) -> List[ChatMessage]:
+    """把日志中的消息记录转换为按时间排序的消息对象"""
+    messages = [
+        ChatMessage(
+            sender=entry["sender"],
+            content=entry["content"],
+            timestamp=datetime.datetime.fromisoformat(entry["timestamp"])
+        )
+        for entry in entries
+    ]
+    messages.sort(key=lambda x: x.timestamp)
+    return messages
+
+
+def load_messages(filename: str) -> List[ChatMessage]:
+    """读取运行日志中的消息（按时间排序），用于渲染QQ/微信格式"""
+    _, entries, _ = read_run_log(filename)
+    return messages_from_entries(entries)
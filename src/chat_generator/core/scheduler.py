@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求调度器
+多个生成器实例共享的模型请求调度：按对话公平排队、支持优先级和全局并发上限
+"""
+
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+# 优先级（数值越小越优先）
+PRIORITY_HIGH = 0      # 角色、子事件等准备阶段的调用
+PRIORITY_NORMAL = 1    # 普通消息
+PRIORITY_LOW = 2       # 回填等后台任务
+
+
+class _Task:
+    """排队中的请求"""
+
+    __slots__ = ("conversation_id", "func", "args", "kwargs", "future", "enqueued_at")
+
+    def __init__(self, conversation_id: str, func: Callable, args: tuple, kwargs: dict):
+        self.conversation_id = conversation_id
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class RequestScheduler:
+    """请求调度器
+
+    - 同一优先级内按对话轮询（round-robin），长对话不会挤占其他对话
+    - 不同优先级之间严格按优先级出队
+    - 全局同时执行的请求数不超过 max_in_flight
+    """
+
+    def __init__(self, max_in_flight: int = 4):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight 必须大于0")
+        self.max_in_flight = max_in_flight
+        self._cond = threading.Condition()
+        # 优先级 -> {对话ID: 待执行请求队列}，OrderedDict的顺序即轮询顺序
+        self._queues: Dict[int, "OrderedDict[str, deque]"] = {}
+        self._in_flight = 0
+        self._workers: List[threading.Thread] = []
+        self._shutdown = False
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def submit(self, conversation_id: str, func: Callable, *args,
+               priority: int = PRIORITY_NORMAL, **kwargs) -> Future:
+        """提交请求，返回Future"""
+        task = _Task(conversation_id, func, args, kwargs)
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("调度器已关闭")
+            queues = self._queues.setdefault(priority, OrderedDict())
+            queues.setdefault(conversation_id, deque()).append(task)
+            stats = self._conversation_stats(conversation_id)
+            stats["submitted"] += 1
+            self._ensure_workers()
+            self._cond.notify()
+        return task.future
+
+    def call(self, conversation_id: str, func: Callable, *args,
+             priority: int = PRIORITY_NORMAL, **kwargs) -> Any:
+        """提交请求并等待结果"""
+        return self.submit(conversation_id, func, *args, priority=priority, **kwargs).result()
+
+    def set_max_in_flight(self, max_in_flight: int):
+        """调整全局并发上限"""
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight 必须大于0")
+        with self._cond:
+            self.max_in_flight = max_in_flight
+            self._ensure_workers()
+            self._cond.notify_all()
+
+    def pending_count(self) -> int:
+        """排队中的请求数"""
+        with self._cond:
+            return sum(len(q) for queues in self._queues.values() for q in queues.values())
+
+    def in_flight_count(self) -> int:
+        """执行中的请求数"""
+        with self._cond:
+            return self._in_flight
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """各对话的请求统计（提交数、完成数、失败数、平均排队时间）"""
+        with self._cond:
+            result = {}
+            for conversation_id, stats in self._stats.items():
+                data = dict(stats)
+                completed = data["completed"] + data["failed"]
+                data["avg_wait"] = data.pop("total_wait") / completed if completed else 0.0
+                result[conversation_id] = data
+            return result
+
+    def shutdown(self, wait: bool = True):
+        """关闭调度器，排队中的请求会被取消"""
+        with self._cond:
+            self._shutdown = True
+            for queues in self._queues.values():
+                for queue in queues.values():
+                    for task in queue:
+                        task.future.cancel()
+            self._queues.clear()
+            self._cond.notify_all()
+            workers = list(self._workers)
+        if wait:
+            for worker in workers:
+                worker.join()
+
+    def _conversation_stats(self, conversation_id: str) -> Dict[str, float]:
+        if conversation_id not in self._stats:
+            self._stats[conversation_id] = {"submitted": 0, "completed": 0, "failed": 0, "total_wait": 0.0}
+        return self._stats[conversation_id]
+
+    def _ensure_workers(self):
+        # 工作线程数与并发上限一致，按需创建
+        while len(self._workers) < self.max_in_flight:
+            worker = threading.Thread(target=self._worker_loop, name=f"request-scheduler-{len(self._workers)}",
+                                      daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _pop_next(self) -> Optional[_Task]:
+        """按优先级取出下一个请求，同一优先级内轮询各对话"""
+        for priority in sorted(self._queues):
+            queues = self._queues[priority]
+            while queues:
+                conversation_id, queue = next(iter(queues.items()))
+                task = queue.popleft()
+                if queue:
+                    queues.move_to_end(conversation_id)
+                else:
+                    del queues[conversation_id]
+                if task.future.set_running_or_notify_cancel():
+                    return task
+            del self._queues[priority]
+        return None
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                task = None
+                while not self._shutdown:
+                    if self._in_flight < self.max_in_flight:
+                        task = self._pop_next()
+                        if task is not None:
+                            break
+                    self._cond.wait()
+                if task is None:
+                    return
+                self._in_flight += 1
+                stats = self._conversation_stats(task.conversation_id)
+                stats["total_wait"] += time.monotonic() - task.enqueued_at
+
+            try:
+                value = task.func(*task.args, **task.kwargs)
+            except BaseException as e:
+                task.future.set_exception(e)
+                succeeded = False
+            else:
+                task.future.set_result(value)
+                succeeded = True
+
+            with self._cond:
+                self._in_flight -= 1
+                stats["completed" if succeeded else "failed"] += 1
+                self._cond.notify()
+
+
+_shared_scheduler: Optional[RequestScheduler] = None
+_shared_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """获取进程级共享调度器（首次调用时按配置创建）"""
+    global _shared_scheduler
+    with _shared_lock:
+        if _shared_scheduler is None:
+            from ..config import settings
+            _shared_scheduler = RequestScheduler(settings.SCHEDULER_MAX_IN_FLIGHT)
+        return _shared_scheduler
+
+
+def set_scheduler(scheduler: Optional[RequestScheduler]):
+    """替换进程级共享调度器"""
+    global _shared_scheduler
+    with _shared_lock:
+        _shared_scheduler = scheduler
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板生成的多进程分片
+把一段聊天记录按时间范围切成若干连续分片，每个工作进程用独立的随机数流生成一个分片，
+各分片内部已按时间排序，最后k路归并为一份完整记录
+
+分片之间只在边界附近因时间戳抖动而交错，归并是线性的；
+分片的随机数种子由总种子和分片序号确定，同样的种子和进程数得到同样的结果
+
+发言人序列是一条马尔可夫链，由主进程按顺序为所有分片抽好再分给各工作进程，
+每个分片接着上一个分片的最后一位发言人，分片交界处也不会出现连续相同的发言人
+"""
+
+import os
+import heapq
+import random
+import datetime
+from array import array
+from operator import attrgetter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, List, Optional, Sequence, Tuple
+
+# 每个分片的最少消息数，消息太少时多进程的启动和传输开销大于收益
+MIN_SHARD_SIZE = 5_000
+
+
+def resolve_workers(workers: Optional[int], message_count: int) -> int:
+    """确定实际使用的进程数（未指定时使用配置 TEMPLATE_WORKERS，0 表示CPU核数）"""
+    if workers is None:
+        from ..config import settings
+        workers = settings.TEMPLATE_WORKERS
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, message_count // MIN_SHARD_SIZE))
+
+
+def shard_bounds(message_count: int, shards: int) -> List[Tuple[int, int]]:
+    """把 [0, message_count) 切成 shards 个连续区间"""
+    base, extra = divmod(message_count, shards)
+    bounds = []
+    begin = 0
+    for index in range(shards):
+        end = begin + base + (1 if index < extra else 0)
+        bounds.append((begin, end))
+        begin = end
+    return bounds
+
+
+def shard_seeds(seed: Optional[int], shards: int) -> List[int]:
+    """为每个分片派生独立的随机数种子"""
+    if seed is None:
+        seed = int.from_bytes(os.urandom(8), "big")
+    root = random.Random(seed)
+    return [root.getrandbits(64) for _ in range(shards)]
+
+
+def shard_speakers(generator: Any, bounds: Sequence[Tuple[int, int]], seed: int,
+                   vectorized: bool = False) -> List[Any]:
+    """按顺序抽取各分片的发言人下标，每个分片从上一个分片的最后一位发言人接着选择"""
+    from .turn_taking import SpeakerSelector, SpeakerTurns
+
+    turns = SpeakerTurns(SpeakerSelector(generator.characters))
+    speakers = []
+    if vectorized:
+        from .vectorized import _get_numpy, _speaker_indices
+        np = _get_numpy()
+        rng = np.random.default_rng(seed)
+        for begin, end in bounds:
+            indices = _speaker_indices(np, rng, turns.selector, end - begin, turns.previous)
+            turns.previous = int(indices[-1])
+            speakers.append(indices.astype(np.uint32))
+    else:
+        rand = random.Random(seed).random
+        for begin, end in bounds:
+            speakers.append(array('I', (turns.next_index(rand) for _ in range(begin, end))))
+    return speakers
+
+
+def encode_shard(messages: Sequence[Any], start_time: datetime.datetime):
+    """把分片编码为紧凑的列式结构，进程间传输比逐个序列化消息对象快得多
+
+    返回 (消息类型, (发送者, 内容)去重表, 表下标数组, 相对start_time的微秒偏移数组)
+    """
+    table = {}
+    codes = array('I')
+    offsets = array('q')
+    microsecond = datetime.timedelta(microseconds=1)
+    for message in messages:
+        key = (message.sender, message.content)
+        code = table.get(key)
+        if code is None:
+            code = table[key] = len(table)
+        codes.append(code)
+        offsets.append((message.timestamp - start_time) // microsecond)
+    message_class = type(messages[0]) if messages else None
+    return message_class, list(table), codes, offsets
+
+
+def decode_shard(encoded, start_time: datetime.datetime) -> List[Any]:
+    """还原 encode_shard 编码的分片"""
+    message_class, table, codes, offsets = encoded
+    timedelta = datetime.timedelta
+    return [
+        message_class(*table[code], start_time + timedelta(microseconds=offset))
+        for code, offset in zip(codes, offsets)
+    ]
+
+
+def _generate_shard(args):
+    """工作进程：生成一个分片并编码"""
+    generator, begin, end, duration_hours, message_count, start_time, seed, speakers, vectorized = args
+    if vectorized:
+        from .vectorized import generate_range_vectorized
+        messages = generate_range_vectorized(generator, begin, end, duration_hours, message_count,
+                                             start_time, seed, speakers=speakers)
+    else:
+        messages = generator._generate_range(begin, end, duration_hours, message_count,
+                                             start_time, random.Random(seed), speakers=speakers)
+    return encode_shard(messages, start_time)
+
+
+def merge_shards(shards: Sequence[List[Any]]) -> List[Any]:
+    """k路归并各分片（每个分片已按时间排序）"""
+    if len(shards) == 1:
+        return list(shards[0])
+    return list(heapq.merge(*shards, key=attrgetter("timestamp")))
+
+
+def generate_sharded(generator: Any, duration_hours: float, message_count: int,
+                     start_time: datetime.datetime, workers: int,
+                     seed: Optional[int] = None, vectorized: bool = False) -> List[Any]:
+    """用 workers 个进程分片生成聊天记录，返回按时间排序的消息列表（vectorized 时各分片用NumPy批量生成）"""
+    bounds = shard_bounds(message_count, workers)
+    # 最后一个种子用于发言人序列
+    *seeds, speaker_seed = shard_seeds(seed, workers + 1)
+    speakers = shard_speakers(generator, bounds, speaker_seed, vectorized)
+
+    # 工作进程只需要角色、主题等配置，不传已有的消息
+    messages, generator.messages = generator.messages, []
+    try:
+        tasks = [
+            (generator, begin, end, duration_hours, message_count, start_time, shard_seed,
+             indices, vectorized)
+            for (begin, end), shard_seed, indices in zip(bounds, seeds, speakers)
+        ]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            encoded = list(executor.map(_generate_shard, tasks))
+    finally:
+        generator.messages = messages
+
+    return merge_shards([decode_shard(shard, start_time) for shard in encoded])
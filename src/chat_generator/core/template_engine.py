@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板引擎
+从JSON模板包加载基础生成器的消息模板，按性格预编译为查找表
+
+模板包格式（见 config/templates/default.json）::
+
+    {
+      "name": "default",
+      "emojis": ["😊", ...],
+      "interjections": ["啊", ...],
+      "interjection_rate": 0.3,
+      "personalities": {
+        "default": {"templates": ["关于{topic}，我觉得..."]},
+        "活泼": {"templates": [...], "emoji_rate": 1.0}
+      }
+    }
+
+模板中可以使用的槽位：记录级的 {topic}、{event_context} 在编译时直接代入，
+角色级的 {name}、{nickname} 编译为按下标填充的格式串。
+多个模板包中同名性格的模板会合并；没有匹配的性格时使用 default。
+"""
+
+import json
+import random
+import string
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 内置模板包目录
+TEMPLATES_DIR = Path(__file__).parent.parent / 'config' / 'templates'
+
+DEFAULT_PACK = "default"
+DEFAULT_PERSONALITY = "default"
+
+# 编译时代入的记录级槽位
+RECORD_SLOTS = ("topic", "event_context")
+# 生成每条消息时按角色填充的槽位
+CHARACTER_SLOTS = ("name", "nickname")
+
+
+def _compile_template(template: str, values: Dict[str, str], pack_name: str) -> Tuple[str, Tuple[str, ...]]:
+    """把模板编译为 (文本, 角色槽位)
+
+    记录级槽位直接代入；有角色槽位时文本为 {0}、{1} 形式的格式串，按角色槽位的顺序填充
+    """
+    parts = []
+    character_slots: List[str] = []
+    for literal, field, _, _ in string.Formatter().parse(template):
+        parts.append((literal, None))
+        if field is None:
+            continue
+        if field in RECORD_SLOTS:
+            parts.append((values.get(field, ""), None))
+        elif field in CHARACTER_SLOTS:
+            parts.append((None, field))
+            character_slots.append(field)
+        else:
+            raise ValueError(f"模板包 {pack_name} 中的模板使用了未知槽位 {{{field}}}: {template}")
+
+    if not character_slots:
+        return "".join(text for text, _ in parts), ()
+
+    # 保留下来的文本还要再经过一次 str.format，需要转义花括号
+    text = []
+    index = 0
+    for literal, slot in parts:
+        if slot is None:
+            text.append(literal.replace("{", "{{").replace("}", "}}"))
+        else:
+            text.append(f"{{{index}}}")
+            index += 1
+    return "".join(text), tuple(character_slots)
+
+
+class PersonalityTable:
+    """一种性格编译后的查找表"""
+
+    __slots__ = ("templates", "texts", "emojis", "emoji_rate", "prefixes", "interjection_rate")
+
+    def __init__(self, templates: List[Tuple[str, Tuple[str, ...]]], emojis: Sequence[str],
+                 emoji_rate: float, interjections: Sequence[str], interjection_rate: float):
+        self.templates = templates
+        # 所有模板都不含角色槽位时直接从文本列表中抽取
+        self.texts = None if any(slots for _, slots in templates) else [text for text, _ in templates]
+        self.emojis = list(emojis)
+        self.emoji_rate = emoji_rate if self.emojis else 0.0
+        self.prefixes = [interjection + "，" for interjection in interjections]
+        self.interjection_rate = interjection_rate if self.prefixes else 0.0
+
+    def render(self, character: Any = None, rng=random) -> str:
+        """抽取模板并生成一条消息"""
+        if self.texts is not None:
+            text = rng.choice(self.texts)
+        else:
+            text, slots = rng.choice(self.templates)
+            if slots:
+                text = text.format(*[getattr(character, slot, "") for slot in slots])
+
+        emoji_rate = self.emoji_rate
+        if emoji_rate and (emoji_rate >= 1.0 or rng.random() < emoji_rate):
+            text += rng.choice(self.emojis)
+
+        if rng.random() < self.interjection_rate:
+            text = rng.choice(self.prefixes) + text
+
+        return text
+
+
+class TemplateEngine:
+    """模板引擎：合并多个模板包，按记录级槽位编译出各性格的查找表"""
+
+    def __init__(self, packs: Iterable[Dict[str, Any]] = ()):
+        self.pack_names: List[str] = []
+        self.emojis: List[str] = []
+        self.interjections: List[str] = []
+        self.interjection_rate = 0.3
+        self.personalities: Dict[str, Dict[str, Any]] = {}
+        for pack in packs:
+            self.add_pack(pack)
+
+    @classmethod
+    def from_files(cls, paths: Iterable[str]) -> "TemplateEngine":
+        """从JSON文件加载模板包"""
+        engine = cls()
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                pack = json.load(f)
+            pack.setdefault("name", Path(path).stem)
+            engine.add_pack(pack)
+        return engine
+
+    def add_pack(self, pack: Dict[str, Any]):
+        """合并一个模板包（同名性格的模板追加到已有模板之后）"""
+        name = pack.get("name", f"pack{len(self.pack_names)}")
+        personalities = pack.get("personalities", {})
+        if not isinstance(personalities, dict):
+            raise ValueError(f"模板包 {name} 的 personalities 必须是对象")
+
+        # 先校验模板，避免合并了一半的模板包
+        for personality, config in personalities.items():
+            templates = config.get("templates", [])
+            if not isinstance(templates, list) or not all(isinstance(t, str) for t in templates):
+                raise ValueError(f"模板包 {name} 中性格 {personality} 的 templates 必须是字符串列表")
+            for template in templates:
+                _compile_template(template, {}, name)
+
+        self.pack_names.append(name)
+        self.emojis.extend(e for e in pack.get("emojis", []) if e not in self.emojis)
+        self.interjections.extend(i for i in pack.get("interjections", []) if i not in self.interjections)
+        if "interjection_rate" in pack:
+            self.interjection_rate = float(pack["interjection_rate"])
+
+        for personality, config in personalities.items():
+            merged = self.personalities.setdefault(personality, {"templates": [], "emoji_rate": 0.0})
+            merged["templates"].extend(config.get("templates", []))
+            if "emoji_rate" in config:
+                merged["emoji_rate"] = float(config["emoji_rate"])
+            if "interjection_rate" in config:
+                merged["interjection_rate"] = float(config["interjection_rate"])
+
+    def compile(self, topic: str = "", event_context: str = "",
+                emojis: Optional[Sequence[str]] = None,
+                interjections: Optional[Sequence[str]] = None) -> Dict[str, PersonalityTable]:
+        """代入记录级槽位，编译出 {性格: 查找表}
+
+        emojis / interjections 默认使用模板包中的表情和语气词
+        """
+        values = {"topic": topic, "event_context": event_context}
+        emojis = self.emojis if emojis is None else emojis
+        interjections = self.interjections if interjections is None else interjections
+
+        tables = {}
+        for personality, config in self.personalities.items():
+            if not config["templates"]:
+                continue
+            tables[personality] = PersonalityTable(
+                [_compile_template(t, values, personality) for t in config["templates"]],
+                emojis,
+                config["emoji_rate"],
+                interjections,
+                config.get("interjection_rate", self.interjection_rate),
+            )
+        if DEFAULT_PERSONALITY not in tables:
+            raise ValueError("模板包中缺少 default 性格的模板")
+        return tables
+
+
+def template_pack_paths() -> List[Path]:
+    """内置模板包和配置 TEMPLATE_PACKS 中额外指定的模板包（逗号分隔）"""
+    from ..config import settings
+    paths = sorted(TEMPLATES_DIR.glob("*.json"))
+    # default.json 最先加载，其他模板包在它的基础上追加
+    paths.sort(key=lambda p: p.stem != DEFAULT_PACK)
+    extra = [p.strip() for p in (settings.TEMPLATE_PACKS or "").split(",") if p.strip()]
+    return paths + [Path(p) for p in extra]
+
+
+_default_engine: Optional[TemplateEngine] = None
+
+
+def get_template_engine() -> TemplateEngine:
+    """获取默认模板引擎（首次调用时加载模板包）"""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = TemplateEngine.from_files(template_pack_paths())
+    return _default_engine
+
+
+def set_template_engine(engine: Optional[TemplateEngine]):
+    """替换默认模板引擎（传入None时下次重新加载）"""
+    global _default_engine
+    _default_engine = engine
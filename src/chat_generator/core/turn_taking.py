@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+发言人选择引擎
+按角色权重和马尔可夫转移矩阵选择下一位发言人，使用别名表实现O(1)抽样
+"""
+
+import random
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# 级别权重：级别越高发言越多
+LEVEL_WEIGHTS = {
+    "老大": 3.0, "负责人": 3.0, "高层": 3.0,
+    "骨干": 2.0, "中层": 2.0,
+    "马仔": 1.0, "成员": 1.0, "基层": 1.0,
+}
+
+# 决策权限权重
+DECISION_POWER_WEIGHTS = {"高": 1.5, "中": 1.2, "低": 1.0}
+
+
+def character_weight(character: Any) -> float:
+    """根据角色的 level 和 decision_power 计算发言权重（没有这些属性时为1）"""
+    level = getattr(character, "level", "")
+    decision_power = getattr(character, "decision_power", "")
+    return LEVEL_WEIGHTS.get(level, 1.0) * DECISION_POWER_WEIGHTS.get(decision_power, 1.0)
+
+
+class AliasTable:
+    """别名表（Vose算法），构建O(n)，抽样O(1)"""
+
+    __slots__ = ("size", "prob", "alias")
+
+    def __init__(self, weights: Sequence[float]):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("权重必须非空且总和大于0")
+
+        self.size = n
+        self.prob = [0.0] * n
+        self.alias = list(range(n))
+
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while small and large:
+            lo = small.pop()
+            hi = large.pop()
+            self.prob[lo] = scaled[lo]
+            self.alias[lo] = hi
+            scaled[hi] = scaled[hi] + scaled[lo] - 1.0
+            if scaled[hi] < 1.0:
+                small.append(hi)
+            else:
+                large.append(hi)
+
+        # 剩余项因浮点误差可能略偏离1，直接视为1
+        for i in large + small:
+            self.prob[i] = 1.0
+
+    def sample(self, rand: Callable[[], float] = random.random) -> int:
+        """按权重抽取一个下标"""
+        u = rand() * self.size
+        i = int(u)
+        if i >= self.size:
+            i = self.size - 1
+        return i if u - i < self.prob[i] else self.alias[i]
+
+
+class SpeakerSelector:
+    """发言人选择器
+
+    下一位发言人的分布由上一位发言人决定（马尔可夫转移矩阵的一行），
+    默认第 i 行为各角色权重、且上一位发言人的权重乘以 repeat_factor
+    （avoid_repeat=True 时为0，即不连续发言）。每行的别名表在首次用到时构建并缓存。
+    """
+
+    def __init__(self, characters: Sequence[Any],
+                 weights: Optional[Sequence[float]] = None,
+                 avoid_repeat: bool = True,
+                 repeat_factor: float = 0.0,
+                 transition: Optional[Sequence[Sequence[float]]] = None):
+        if not characters:
+            raise ValueError("角色列表不能为空")
+
+        self.characters: List[Any] = list(characters)
+        self.weights: List[float] = list(weights) if weights is not None else [
+            character_weight(char) for char in self.characters
+        ]
+        if len(self.weights) != len(self.characters):
+            raise ValueError("权重数量必须与角色数量一致")
+        if transition is not None and len(transition) != len(self.characters):
+            raise ValueError("转移矩阵行数必须与角色数量一致")
+
+        self.repeat_factor = 0.0 if avoid_repeat else (repeat_factor if repeat_factor > 0 else 1.0)
+        self.transition = transition
+        self._index: Dict[str, int] = {getattr(char, "name", str(i)): i for i, char in enumerate(self.characters)}
+        self._initial = AliasTable(self.weights)
+        self._rows: Dict[int, AliasTable] = {}
+
+    def _row(self, previous: int) -> AliasTable:
+        table = self._rows.get(previous)
+        if table is None:
+            if self.transition is not None:
+                row = list(self.transition[previous])
+            else:
+                row = list(self.weights)
+                row[previous] *= self.repeat_factor
+            # 只有一个角色或整行为0时退回初始分布
+            table = AliasTable(row) if sum(row) > 0 else self._initial
+            self._rows[previous] = table
+        return table
+
+    def next_index(self, previous: Optional[int] = None,
+                   rand: Callable[[], float] = random.random) -> int:
+        """根据上一位发言人的下标选择下一位（rand 为使用的随机数函数）"""
+        if previous is None:
+            return self._initial.sample(rand)
+        return self._row(previous).sample(rand)
+
+    def next_speaker(self, last_sender: Optional[str] = None) -> Any:
+        """根据上一位发言人的名字选择下一位发言的角色"""
+        previous = self._index.get(last_sender) if last_sender is not None else None
+        return self.characters[self.next_index(previous)]
+
+
+class SpeakerTurns:
+    """跨多段生成共用的发言人选择器和上一位发言人的下标
+
+    分段生成（如流式输出）时每段接着上一段的最后一位发言人继续选择，
+    段与段之间也不会出现连续相同的发言人
+    """
+
+    __slots__ = ("selector", "previous")
+
+    def __init__(self, selector: SpeakerSelector, previous: Optional[int] = None):
+        self.selector = selector
+        self.previous = previous
+
+    def next_index(self, rand: Callable[[], float] = random.random) -> int:
+        """选择下一位发言人并记为上一位"""
+        self.previous = self.selector.next_index(self.previous, rand)
+        return self.previous
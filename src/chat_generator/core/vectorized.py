@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板生成的NumPy批量路径
+整段记录的发言人、模板、表情、语气词和时间抖动都用几次NumPy调用一次性抽取，
+再由下标数组直接查表得到消息文本，不再逐条调用random
+
+每个角色的所有可能消息（语气词 × 模板 × 表情）预先拼好放在一张表里，
+一条消息的内容就是表中的一个下标；NumPy为可选依赖
+"""
+
+import gc
+import datetime
+import contextlib
+from typing import Any, Dict, List, Optional
+
+from .template_engine import DEFAULT_PERSONALITY
+
+_np = None
+
+
+def _get_numpy():
+    """延迟导入NumPy（可选依赖）"""
+    global _np
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("批量生成需要安装NumPy: pip install numpy") from None
+        _np = numpy
+    return _np
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    """批量创建大量不含循环引用的对象时暂停分代GC，避免反复扫描新对象"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def resolve_vectorized(vectorized: Optional[bool] = None) -> bool:
+    """确定是否使用批量路径（未指定时使用配置 TEMPLATE_VECTORIZED）"""
+    if vectorized is None:
+        from ..config import settings
+        vectorized = settings.TEMPLATE_VECTORIZED
+    return bool(vectorized)
+
+
+def _speaker_indices(np, rng, selector: Any, count: int, previous: Optional[int] = None):
+    """抽取发言人下标序列（previous 为上一段最后一位发言人的下标）
+
+    各角色权重相同且不连续发言时（模板生成的默认情况），下一位发言人在其余 n-1 人中均匀分布，
+    等价于上一位的下标加上 [1, n-1] 中的随机数再取模，可以用累加和一次算出；
+    否则按马尔可夫链逐条抽样
+    """
+    n = len(selector.characters)
+    if n == 1:
+        return np.zeros(count, dtype=np.int64)
+
+    uniform = selector.transition is None and selector.repeat_factor == 0 and \
+        min(selector.weights) == max(selector.weights)
+    if uniform:
+        steps = rng.integers(1, n, size=count)
+        steps[0] = rng.integers(0, n) if previous is None else previous + steps[0]
+        return np.cumsum(steps) % n
+
+    indices = np.empty(count, dtype=np.int64)
+    draws = rng.random(count)
+    position = iter(draws.tolist())
+    rand = position.__next__
+    for i in range(count):
+        previous = selector.next_index(previous, rand)
+        indices[i] = previous
+    return indices
+
+
+def _character_tables(generator: Any, tables: Dict[str, Any]):
+    """为每个角色拼出所有可能的消息文本
+
+    返回 (文本表, 每个角色在文本表中的起始下标, 模板数, 表情数, 语气词数, 表情概率, 语气词概率)，
+    第 c 个角色的消息 (语气词p, 模板t, 表情e) 位于 base[c] + (p * T + t) * (E + 1) + e，
+    p、e 为0表示不加语气词/表情
+    """
+    texts: List[str] = []
+    bases, template_counts, emoji_counts, prefix_counts, emoji_rates, prefix_rates = [], [], [], [], [], []
+    shared: Dict[int, int] = {}
+
+    for character in generator.characters:
+        table = tables.get(character.personality) or tables[DEFAULT_PERSONALITY]
+        templates = table.texts if table.texts is not None else [
+            text.format(*[getattr(character, slot, "") for slot in slots]) if slots else text
+            for text, slots in table.templates
+        ]
+
+        # 不含角色槽位的查找表可以在同性格的角色之间共用
+        base = shared.get(id(table)) if table.texts is not None else None
+        if base is None:
+            base = len(texts)
+            emojis = [""] + table.emojis
+            for prefix in [""] + table.prefixes:
+                for template in templates:
+                    texts.extend(prefix + template + emoji for emoji in emojis)
+            if table.texts is not None:
+                shared[id(table)] = base
+
+        bases.append(base)
+        template_counts.append(len(templates))
+        emoji_counts.append(len(table.emojis))
+        prefix_counts.append(len(table.prefixes))
+        emoji_rates.append(table.emoji_rate)
+        prefix_rates.append(table.interjection_rate)
+
+    return texts, bases, template_counts, emoji_counts, prefix_counts, emoji_rates, prefix_rates
+
+
+def generate_range_vectorized(generator: Any, begin: int, end: int, duration_hours: float,
+                              message_count: int, start_time: datetime.datetime,
+                              seed: Optional[int] = None, turns: Any = None,
+                              speakers: Any = None) -> List[Any]:
+    """批量生成第 begin 到 end-1 条消息，按时间排序返回（与 ChatGenerator._generate_range 对应）
+
+    speakers 为事先抽好的这一段发言人下标（多进程分片时使用），给出时不再抽取发言人
+    """
+    from .base_generator import ChatMessage
+    from .turn_taking import SpeakerSelector, SpeakerTurns
+
+    np = _get_numpy()
+    rng = np.random.default_rng(seed)
+    count = end - begin
+    if count <= 0:
+        return []
+
+    # 发言人
+    if speakers is not None:
+        speakers = np.asarray(speakers, dtype=np.int64)
+    else:
+        if turns is None:
+            turns = SpeakerTurns(SpeakerSelector(generator.characters))
+        speakers = _speaker_indices(np, rng, turns.selector, count, turns.previous)
+        turns.previous = int(speakers[-1])
+
+    # 消息内容：按角色取出各项参数，一次性抽取模板、表情和语气词下标
+    tables = generator.compile_templates(generator.current_topic)
+    texts, *columns = _character_tables(generator, tables)
+    bases, template_counts, emoji_counts, prefix_counts, emoji_rates, prefix_rates = [
+        np.asarray(column)[speakers] for column in columns
+    ]
+
+    template_index = (rng.random(count) * template_counts).astype(np.int64)
+    has_emoji = (emoji_rates >= 1.0) | (rng.random(count) < emoji_rates)
+    emoji_code = np.where(has_emoji, 1 + (rng.random(count) * emoji_counts).astype(np.int64), 0)
+    has_prefix = rng.random(count) < prefix_rates
+    prefix_code = np.where(has_prefix, 1 + (rng.random(count) * prefix_counts).astype(np.int64), 0)
+    codes = bases + (prefix_code * template_counts + template_index) * (emoji_counts + 1) + emoji_code
+
+    # 时间戳（微秒偏移），按时间排序
+    jitter = generator.timestamp_jitter_hours
+    hours = np.arange(begin, end) / message_count * duration_hours + rng.uniform(-jitter, jitter, count)
+    offsets = np.rint(hours * 3_600_000_000).astype(np.int64)
+    order = np.argsort(offsets, kind="stable")
+    offsets = offsets[order]
+
+    names = np.array([character.name for character in generator.characters], dtype=object)
+    with _gc_paused():
+        senders = names[speakers[order]].tolist()
+        contents = np.array(texts, dtype=object)[codes[order]].tolist()
+        if start_time.tzinfo is None:
+            timestamps = (np.datetime64(start_time, "us") + offsets.astype("timedelta64[us]")).astype(object).tolist()
+        else:
+            timedelta = datetime.timedelta
+            timestamps = [start_time + timedelta(microseconds=offset) for offset in offsets.tolist()]
+        return list(map(ChatMessage, senders, contents, timestamps))
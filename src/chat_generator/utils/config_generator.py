@@ -9,6 +9,9 @@ import json
 import datetime
 from typing import List, Dict, Any
 from ..core.base_generator import ChatGenerator, Character
+from ..core.log import get_logger
+
+log = get_logger(__name__)
 
 class ConfigGenerator:
     """基础配置生成器"""
@@ -137,8 +140,8 @@ class ConfigGenerator:
     
     def _run_generator(self):
         """运行生成器"""
-        print("\n🚀 开始生成聊天记录...")
-        print("=" * 50)
+        log.info("\n🚀 开始生成聊天记录...")
+        log.info("=" * 50)
         
         try:
             generator = ChatGenerator()
@@ -164,9 +167,9 @@ class ConfigGenerator:
             
             generator.save_to_file(filename, format_type=self.config['format'])
             
-            print(f"✅ 聊天记录已生成: {filename}")
-            print(f"   消息数量: {len(generator.messages)}")
-            print(f"   参与角色: {len(generator.characters)}")
+            log.info(f"✅ 聊天记录已生成: {filename}")
+            log.info(f"   消息数量: {len(generator.messages)}")
+            log.info(f"   参与角色: {len(generator.characters)}")
             
         except Exception as e:
-            print(f"❌ 生成失败: {e}")
+            log.error(f"❌ 生成失败: {e}")
@@ -5,10 +5,16 @@
 用于配置策划组织聊天记录生成器
 """
 
+import os
 import datetime
 from typing import Dict, Any
 from ..core.planning_generator import PlanningChatGenerator
-from ..config.settings import GOOGLE_AI_API_KEY, DEFAULT_MODEL
+from ..core.run_log import load_messages
+from ..core.character_library import KIND_PLANNING, get_character_library
+from ..core.log import get_logger
+from ..config import settings
+
+log = get_logger(__name__)
 
 class PlanningConfigGenerator:
     """策划配置生成器"""
@@ -16,8 +22,9 @@ class PlanningConfigGenerator:
     def __init__(self):
         self.config: Dict[str, Any] = {}
     
-    def interactive_setup(self):
-        """交互式配置设置"""
+    def interactive_setup(self, profile: Any = None):
+        """交互式配置设置（profile 为运行配置，为空时使用 RUN_PROFILE）"""
+        self.config['profile'] = profile
         print("📋 策划组织聊天记录生成器配置")
         print("=" * 50)
         
@@ -25,8 +32,12 @@ class PlanningConfigGenerator:
         if not self._check_api_key():
             return
         
+        # 选择已保存的配置（可选）
+        self._setup_config_file()
+        
         # 设置事件
-        self._setup_event()
+        if not self.config.get('config_file'):
+            self._setup_event()
         
         # 设置参数
         self._setup_parameters()
@@ -36,7 +47,7 @@ class PlanningConfigGenerator:
     
     def _check_api_key(self):
         """检查API密钥"""
-        if not GOOGLE_AI_API_KEY:
+        if not settings.GOOGLE_AI_API_KEY:
             print("❌ 未设置Google AI API密钥")
             print("   请先设置.env文件中的GOOGLE_AI_API_KEY")
             return False
@@ -44,6 +55,39 @@ class PlanningConfigGenerator:
         print("✅ API密钥已设置")
         return True
     
+    def run_from_config(self, config_file: str, message_count: int, duration_hours: float,
+                        output_format: str = "qq", realtime_save: bool = True, save_interval: int = 10,
+                        shard_by_day: bool = False, profile: Any = None):
+        """使用已保存的配置直接运行生成器（复用角色、阶段和子事件，不再调用API生成）"""
+        if not self._check_api_key():
+            return
+        
+        self.config = {
+            'config_file': config_file,
+            'message_count': message_count,
+            'duration_hours': duration_hours,
+            'format': output_format,
+            'realtime_save': realtime_save,
+            'save_interval': save_interval,
+            'shard_by_day': shard_by_day,
+            'profile': profile
+        }
+        self._run_generator()
+    
+    def _setup_config_file(self):
+        """选择已保存的配置文件"""
+        print("\n📂 复用已保存的配置")
+        print("-" * 30)
+        
+        while True:
+            config_file = input("配置文件路径 (可选，留空则通过API重新生成): ").strip()
+            if not config_file:
+                return
+            if os.path.exists(config_file):
+                self.config['config_file'] = config_file
+                return
+            print(f"❌ 配置文件不存在: {config_file}")
+    
     def _setup_event(self):
         """设置事件"""
         print("\n🎯 设置策划事件")
@@ -61,18 +105,26 @@ class PlanningConfigGenerator:
         print("\n⚙️ 设置生成参数")
         print("-" * 30)
         
-        # 角色数量
-        while True:
+        # 角色数量（从配置加载时使用配置中的角色）
+        while not self.config.get('config_file'):
             try:
-                count = int(input("角色数量 (5-10): "))
-                if 5 <= count <= 10:
+                count = int(input(f"角色数量 ({settings.MIN_CHARACTERS}-{settings.MAX_CHARACTERS}): "))
+                if settings.MIN_CHARACTERS <= count <= settings.MAX_CHARACTERS:
                     self.config['character_count'] = count
                     break
                 else:
-                    print("❌ 角色数量必须在5-10之间")
+                    print(f"❌ 角色数量必须在{settings.MIN_CHARACTERS}-{settings.MAX_CHARACTERS}之间")
             except ValueError:
                 print("❌ 请输入有效数字")
         
+        # 角色库中已有角色时可以直接挑选，只为不足的部分调用API
+        if not self.config.get('config_file'):
+            library = get_character_library()
+            available = library.count(KIND_PLANNING) if library is not None else 0
+            if available:
+                choice = input(f"角色库中有 {available} 个角色，是否优先从角色库挑选? (y/n, 默认y): ").strip().lower()
+                self.config['use_library'] = choice != 'n'
+        
         # 消息数量
         while True:
             try:
@@ -133,24 +185,34 @@ class PlanningConfigGenerator:
     
     def _run_generator(self):
         """运行生成器"""
-        print("\n🚀 开始生成策划聊天记录...")
-        print("=" * 50)
+        log.info("\n🚀 开始生成策划聊天记录...")
+        log.info("=" * 50)
         
         try:
-            generator = PlanningChatGenerator()
-            
-            # 设置事件
-            generator.input_planning_event(self.config['event'])
+            generator = PlanningChatGenerator(profile=self.config.get('profile'))
             
-            # 生成角色
-            print("🤖 正在生成策划角色...")
-            characters = generator.generate_planning_characters(self.config['character_count'])
-            print(f"✅ 生成了 {len(characters)} 个角色")
-            
-            # 生成子事件
-            print("📋 正在生成子事件...")
-            sub_events = generator.generate_sub_events(5)
-            print(f"✅ 生成了 {len(sub_events)} 个子事件")
+            if self.config.get('config_file'):
+                # 复用已保存的角色、阶段和子事件，不调用API
+                if not generator.load_planning_config(self.config['config_file']):
+                    return
+                self.config['event'] = generator.main_event
+                self.config['character_count'] = len(generator.planning_characters)
+            else:
+                # 设置事件
+                generator.input_planning_event(self.config['event'])
+                
+                # 生成角色
+                if self.config.get('use_library'):
+                    characters = generator.assemble_planning_characters(self.config['character_count'])
+                else:
+                    log.info("🤖 正在生成策划角色...")
+                    characters = generator.generate_planning_characters(self.config['character_count'])
+                log.info(f"✅ 生成了 {len(characters)} 个角色")
+                
+                # 生成子事件
+                log.info("📋 正在生成子事件...")
+                sub_events = generator.generate_sub_events(5)
+                log.info(f"✅ 生成了 {len(sub_events)} 个子事件")
             
             # 生成策划聊天记录
             messages = generator.generate_planning_conversation(
@@ -160,25 +222,32 @@ class PlanningConfigGenerator:
                 save_interval=self.config['save_interval']
             )
             
+            # 运行日志是权威记录，有日志时从日志渲染输出文件
+            if generator.run_log_path:
+                messages = load_messages(generator.run_log_path)
+            
             # 保存文件
             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            generator.save_planning_conversation(messages, f"output/chat_records/planning_chat_{self.config['format']}_{timestamp}.txt", self.config['format'])
+            if self.config.get('shard_by_day', settings.OUTPUT_SHARD_BY_DAY):
+                output_file = generator.save_planning_conversation_by_day(messages, f"output/chat_records/planning_chat_{self.config['format']}_{timestamp}", self.config['format'])
+            else:
+                output_file = generator.save_planning_conversation(messages, f"output/chat_records/planning_chat_{self.config['format']}_{timestamp}.txt", self.config['format'])
             generator.save_planning_config(f"output/configs/planning_config_{timestamp}.json")
             
             result = {
                 'message_count': len(messages),
-                'output_file': f"output/chat_records/planning_chat_{self.config['format']}_{timestamp}.txt"
+                'output_file': output_file
             }
             
             if result:
-                print("✅ 策划聊天记录生成完成!")
-                print(f"   事件: {self.config['event']}")
-                print(f"   角色数量: {self.config['character_count']}")
-                print(f"   消息数量: {result.get('message_count', 0)}")
-                print(f"   输出文件: {result.get('output_file', '未知')}")
+                log.info("✅ 策划聊天记录生成完成!")
+                log.info(f"   事件: {self.config['event']}")
+                log.info(f"   角色数量: {self.config['character_count']}")
+                log.info(f"   消息数量: {result.get('message_count', 0)}")
+                log.info(f"   输出文件: {result.get('output_file', '未知')}")
             else:
-                print("❌ 策划聊天记录生成失败")
+                log.error("❌ 策划聊天记录生成失败")
             
         except Exception as e:
-            print(f"❌ 生成失败: {e}")
-            print("   请检查API密钥和网络连接")
+            log.error(f"❌ 生成失败: {e}")
+            log.error("   请检查API密钥和网络连接")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试共用的工具
+假模型、临时工作目录和准备好事件、角色、阶段和子事件的策划生成器
+（测试脚本先把 src 和项目根目录加入 sys.path，再 from tests.helpers import ...）
+"""
+
+import os
+import time
+import tempfile
+import threading
+import contextlib
+from typing import Optional
+
+from chat_generator.core.planning_generator import PlanningChatGenerator
+
+
+class EchoModel:
+    """记录收到的提示词、返回固定内容的假模型
+
+    text 中的 {call} 替换为第几次调用，{model_name} 替换为模型名称；
+    latency 为每次调用的耗时，peak 记录最大并发调用数。
+    子类可以重写 reply 按提示词返回不同内容或抛出异常。
+    """
+
+    def __init__(self, text: str = "收到。", model_name: str = "EchoModel", latency: float = 0.0):
+        self.text = text
+        self.model_name = model_name
+        self.latency = latency
+        self.prompts = []
+        self.current = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    @property
+    def calls(self) -> int:
+        return len(self.prompts)
+
+    def reply(self, prompt: str, call: int) -> str:
+        return self.text.format(call=call, model_name=self.model_name)
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            self.prompts.append(prompt)
+            call = len(self.prompts)
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            text = self.reply(prompt, call)
+        finally:
+            with self._lock:
+                self.current -= 1
+
+        class Response:
+            pass
+        response = Response()
+        response.text = text
+        return response
+
+
+@contextlib.contextmanager
+def in_tempdir():
+    """在临时目录中运行（生成器写入的 output/ 不会留在仓库里）"""
+    old_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.chdir(tmpdir)
+        try:
+            yield tmpdir
+        finally:
+            os.chdir(old_cwd)
+
+
+def make_planning_generator(model=None, event: Optional[str] = "公司年会策划",
+                            **kwargs) -> PlanningChatGenerator:
+    """不等待请求间隔的策划生成器；给出 event 时录入事件并创建默认的角色、阶段和子事件"""
+    generator = PlanningChatGenerator(model=model or EchoModel(), **kwargs)
+    generator.request_interval = 0
+    if event:
+        generator.input_planning_event(event)
+        generator._create_default_planning_characters()
+        generator.generate_planning_phases()
+        generator._create_default_sub_events()
+    return generator
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试角色库
+生成的角色自动入库，之后从角色库组建角色，只为缺少的角色身份调用AI
+"""
+
+import os
+import re
+import sys
+import sqlite3
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+
+from chat_generator.core.character_library import CharacterLibrary, KIND_PLANNING, split_traits
+from chat_generator.core.planning_generator import PlanningChatGenerator
+
+
+class RoleModel:
+    """按提示词生成角色的假模型，提示词中要求的角色身份会原样返回"""
+
+    # 所有实例共用的编号，保证不同模型生成的名字不重复
+    next_id = 0
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        count = int(re.search(r"生成(\d+)个", prompt).group(1))
+        match = re.search(r"需要包含以下角色身份：(\S+)", prompt)
+        roles = match.group(1).split("、") if match else []
+        offset = RoleModel.next_id
+        RoleModel.next_id += count
+        characters = []
+        for i in range(count):
+            role = roles[i] if i < len(roles) else "成员"
+            characters.append(
+                f'{{"name": "角色{offset + i}", "role": "{role}", "department": "行动组", '
+                f'"level": "成员", "personality": "果断、冲动", "decision_power": "低"}}'
+            )
+
+        class Response:
+            text = '{"characters": [' + ", ".join(characters) + ']}'
+        return Response()
+
+
+def make_generator(model, library) -> PlanningChatGenerator:
+    generator = PlanningChatGenerator(model=model, character_library=library)
+    generator.input_planning_event("公司年会策划")
+    return generator
+
+
+def test_library_persists_and_queries():
+    """测试角色入库、去重和按索引字段查询"""
+    print("🧪 测试角色库保存和查询")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "library", "characters.db")
+        generator = make_generator(RoleModel(), CharacterLibrary(path))
+        generator.generate_planning_characters(6)
+        generator.character_library.close()
+
+        # 重新打开后数据仍在，重复保存不会产生重复记录
+        with CharacterLibrary(path) as library:
+            assert library.count(KIND_PLANNING) == 6
+            assert library.add_characters(generator.planning_characters, KIND_PLANNING) == 0
+            assert len(library.find(KIND_PLANNING, department="行动组")) == 6
+            assert len(library.find(KIND_PLANNING, personality="冲动", limit=2)) == 2
+            assert library.find(KIND_PLANNING, role="老大") == []
+            assert library.count("ai") == 0
+
+            # 角色身份只能通过 roles 指定
+            assert len(library.assemble(KIND_PLANNING, 2, department="行动组")[0]) == 2
+            for filters in ({"role": "成员"}, {"limit": 1}):
+                try:
+                    library.assemble(KIND_PLANNING, 2, **filters)
+                    raise AssertionError("筛选条件与 assemble 的参数冲突时应抛出 ValueError")
+                except ValueError as e:
+                    assert "role" not in filters or "roles" in str(e)
+    print("✅ 角色库保存和查询正常")
+
+
+def test_assemble_without_api_calls():
+    """测试角色库足够时不调用API"""
+    library = CharacterLibrary(":memory:")
+    make_generator(RoleModel(), library).generate_planning_characters(8)
+
+    model = RoleModel()
+    generator = make_generator(model, library)
+    characters = generator.assemble_planning_characters(5)
+    assert len(characters) == 5
+    assert len({char.name for char in characters}) == 5
+    assert model.prompts == []
+
+
+def test_assemble_tops_up_missing_roles():
+    """测试只为缺少的角色身份补充生成"""
+    print("🧪 测试角色库不足时补充生成")
+
+    library = CharacterLibrary(":memory:")
+    make_generator(RoleModel(), library).generate_planning_characters(4)
+
+    model = RoleModel()
+    generator = make_generator(model, library)
+    characters = generator.assemble_planning_characters(6, roles=["成员", "军师", "技术员"])
+
+    roles = [char.role for char in characters]
+    assert len(characters) == 6
+    assert len({char.name for char in characters}) == 6
+    assert "军师" in roles and "技术员" in roles
+    assert len(model.prompts) == 1
+    assert "需要包含以下角色身份：军师、技术员" in model.prompts[0]
+    # 补充的角色也进入角色库
+    assert library.count(KIND_PLANNING) == 6
+    print(f"✅ 从角色库选取 {6 - 2} 个，补充生成 2 个")
+
+
+def test_personality_traits_use_index():
+    """测试按性格特点查询走索引，旧版本角色库打开时补建性格特点"""
+    assert split_traits("果断、冲动, 忠诚；果断") == ["果断", "冲动", "忠诚"]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "characters.db")
+        # 旧版本角色库：只有 characters 表和 personality 索引
+        conn = sqlite3.connect(path)
+        conn.executescript(
+            "CREATE TABLE characters (id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, "
+            "name TEXT NOT NULL, role TEXT NOT NULL DEFAULT '', department TEXT NOT NULL DEFAULT '', "
+            "level TEXT NOT NULL DEFAULT '', personality TEXT NOT NULL DEFAULT '', "
+            "event TEXT NOT NULL DEFAULT '', data TEXT NOT NULL, created_at TEXT NOT NULL, "
+            "UNIQUE (kind, name, role, department));"
+            "CREATE INDEX idx_characters_personality ON characters (kind, personality);"
+        )
+        conn.execute("INSERT INTO characters (kind, name, personality, data, created_at) VALUES (?, ?, ?, ?, ?)",
+                     (KIND_PLANNING, "老角色", "狡猾、多疑", '{"name": "老角色"}', "2025-01-01T00:00:00"))
+        conn.commit()
+        conn.close()
+
+        with CharacterLibrary(path) as library:
+            assert [c["name"] for c in library.find(KIND_PLANNING, personality="多疑")] == ["老角色"]
+            library.add_characters([
+                {"name": "甲", "personality": "果断、冲动"},
+                {"name": "乙", "personality": "冲动、忠诚"},
+            ], KIND_PLANNING)
+            assert {c["name"] for c in library.find(KIND_PLANNING, personality="冲动")} == {"甲", "乙"}
+            assert [c["name"] for c in library.find(KIND_PLANNING, personality="冲动、忠诚")] == ["乙"]
+            assert library.find(KIND_PLANNING, personality="冲") == []  # 按特点精确匹配
+            assert library.find("ai", personality="冲动") == []
+
+            plan = " ".join(row[-1] for row in library._conn.execute(
+                "EXPLAIN QUERY PLAN SELECT data FROM characters WHERE kind = ? AND id IN "
+                "(SELECT character_id FROM character_traits WHERE kind = ? AND trait = ?)",
+                (KIND_PLANNING, KIND_PLANNING, "冲动")))
+            assert "SCAN character_traits" not in plan and "character_traits USING PRIMARY KEY" in plan, plan
+            index_names = {row[0] for row in library._conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+            assert "idx_characters_personality" not in index_names
+
+
+if __name__ == "__main__":
+    test_library_persists_and_queries()
+    test_assemble_without_api_calls()
+    test_assemble_tops_up_missing_roles()
+    test_personality_traits_use_index()
+    print("🎯 测试完成！")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试分页生成角色
+大量角色按页并发生成，重名的角色会被去掉并补齐
+"""
+
+import re
+import sys
+import threading
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+
+from chat_generator.core.character_library import CharacterLibrary
+from chat_generator.core.paging import MAX_EXCLUDE_NAMES, generate_in_pages
+from chat_generator.core.planning_generator import PlanningChatGenerator
+
+
+class PagedCharacterModel:
+    """按提示词中的数量返回角色的假模型，每页第一个角色都叫"强哥\""""
+
+    def __init__(self):
+        self.prompts = []
+        self.lock = threading.Lock()
+        self.counter = 0
+
+    def generate_content(self, prompt, **kwargs):
+        count = int(re.search(r"生成(\d+)个", prompt).group(1))
+        with self.lock:
+            self.prompts.append(prompt)
+            start = self.counter
+            self.counter += count
+        characters = ['{"name": "强哥", "level": "老大"}'] + [
+            f'{{"name": "成员{start + i}", "level": "成员"}}' for i in range(1, count)
+        ]
+
+        class Response:
+            text = '{"characters": [' + ", ".join(characters) + ']}'
+        return Response()
+
+
+def test_generate_in_pages_dedup_and_top_up():
+    """测试去重后补生成"""
+    print("🧪 测试分页去重和补齐")
+
+    def fetch_page(count, page_index, exclude_names):
+        # 每页都返回一个重复的名字和一个空名字
+        items = [{"name": "重复"}, {"name": ""}]
+        items += [{"name": f"p{page_index}-{i}"} for i in range(count - 1)]
+        return items
+
+    result = generate_in_pages(fetch_page, total=25, page_size=10, max_workers=3)
+    names = [item["name"] for item in result]
+    assert len(names) == 25
+    assert len(set(names)) == 25
+    assert "" not in names
+    print(f"✅ 得到 {len(names)} 个不重复的条目")
+
+
+def test_generate_in_pages_failed_page():
+    """测试某一页失败时其他页仍然合并"""
+    def fetch_page(count, page_index, exclude_names):
+        if page_index == 1:
+            raise RuntimeError("模拟失败")
+        return [{"name": f"p{page_index}-{i}"} for i in range(count)]
+
+    result = generate_in_pages(fetch_page, total=20, page_size=10, max_rounds=2)
+    assert len(result) == 20
+
+
+def test_exclude_names_are_most_recent():
+    """测试补生成时提示词带上的是最近加入的名字，顺序与加入顺序一致"""
+    existing = [f"已有{i}" for i in range(150)]
+    received = []
+
+    def fetch_page(count, page_index, exclude_names):
+        received.append(list(exclude_names))
+        # 第一轮只返回一半，触发补生成
+        return [{"name": f"p{page_index}-{i}"} for i in range(count // 2 or count)]
+
+    generate_in_pages(fetch_page, total=40, page_size=40, max_rounds=2, exclude_names=existing)
+    assert received[0] == existing[-MAX_EXCLUDE_NAMES:]
+    expected = (existing + [f"p0-{i}" for i in range(20)])[-MAX_EXCLUDE_NAMES:]
+    assert received[1] == expected
+
+
+def test_planning_characters_in_pages():
+    """测试策划生成器分页生成大量角色"""
+    print("🧪 测试分页生成120个策划团队成员")
+
+    model = PagedCharacterModel()
+    generator = PlanningChatGenerator(model=model, character_library=CharacterLibrary(":memory:"))
+    generator.input_planning_event("公司年会策划")
+    characters = generator.generate_planning_characters(120, page_size=20)
+
+    names = [char.name for char in characters]
+    assert len(names) == 120
+    assert len(set(names)) == 120
+    # 第一轮6页，有5个重名需要补一轮
+    assert len(model.prompts) > 6
+    assert any("不要重复" in prompt and "强哥" in prompt for prompt in model.prompts[6:])
+    print(f"✅ 生成 {len(names)} 个成员，共调用模型 {len(model.prompts)} 次")
+
+
+if __name__ == "__main__":
+    test_generate_in_pages_dedup_and_top_up()
+    test_generate_in_pages_failed_page()
+    test_exclude_names_are_most_recent()
+    test_planning_characters_in_pages()
+    print("🎯 测试完成！")
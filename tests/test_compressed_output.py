@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试压缩输出
+gzip/zstd保存和追加写入，中断后已写入的帧仍可读取
+"""
+
+import os
+import sys
+import tempfile
+import datetime
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+
+from chat_generator.core import output_writer
+from chat_generator.core.output_writer import append_text, read_text, write_text
+from chat_generator.core.planning_generator import PlanningChatGenerator
+from chat_generator.core.base_generator import ChatMessage
+
+
+def compressions():
+    """可用的压缩方式（未安装zstandard时跳过zstd）"""
+    result = ["none", "gzip"]
+    try:
+        output_writer._get_zstd()
+        result.append("zstd")
+    except ImportError:
+        print("⚠️ 未安装zstandard，跳过zstd")
+    return result
+
+
+def test_write_and_append_round_trip():
+    """测试整文件写入和逐帧追加"""
+    print("🧪 测试压缩写入和追加")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for compression in compressions():
+            filename = write_text(os.path.join(tmpdir, "out", "record.txt"), "头部\n", compression)
+            for i in range(5):
+                append_text(filename, f"第{i}条消息\n")
+            expected = "头部\n" + "".join(f"第{i}条消息\n" for i in range(5))
+            assert read_text(filename) == expected
+            print(f"✅ {compression}: {os.path.basename(filename)}")
+
+
+def test_parallel_gzip_chunks():
+    """测试大块数据分块多线程压缩后仍是合法的gzip文件"""
+    text = "聊天记录内容 " * 400_000
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = write_text(os.path.join(tmpdir, "big.txt"), text, "gzip")
+        assert filename.endswith(".gz")
+        assert read_text(filename) == text
+        assert os.path.getsize(filename) < len(text.encode("utf-8")) // 10
+
+
+def test_truncated_append_keeps_complete_frames():
+    """测试最后一帧写坏时之前的帧仍可读取"""
+    import zlib
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = write_text(os.path.join(tmpdir, "temp.txt"), "头部\n", "gzip")
+        append_text(filename, "完整的一帧\n")
+        complete_size = os.path.getsize(filename)
+        append_text(filename, "被截断的一帧\n" * 100)
+        with open(filename, "r+b") as f:
+            f.truncate(complete_size + 10)
+
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        with open(filename, "rb") as f:
+            data = f.read()
+        recovered = b""
+        while data:
+            recovered += decompressor.decompress(data)
+            if not decompressor.eof:
+                break
+            data = decompressor.unused_data
+            decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        assert recovered.decode("utf-8") == "头部\n完整的一帧\n"
+
+
+def test_planning_temp_files_compressed():
+    """测试策划生成器的实时保存和最终保存使用压缩"""
+    generator = PlanningChatGenerator(model=object())
+    generator.input_planning_event("公司年会策划")
+    generator._create_default_planning_characters()
+    messages = [
+        ChatMessage(sender="强哥", content=f"消息{i}", timestamp=datetime.datetime(2025, 1, 1, 9, i))
+        for i in range(20)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        qq_file = os.path.join(tmpdir, "temp", "qq.txt.gz")
+        wechat_file = os.path.join(tmpdir, "temp", "wechat.txt.gz")
+        generator._create_temp_file_header(qq_file, "qq")
+        generator._create_temp_file_header(wechat_file, "wechat")
+        generator._append_to_temp_files(messages[:10], qq_file, wechat_file)
+        generator._append_to_temp_files(messages[10:], qq_file, wechat_file)
+        assert "[09:19:00] 强哥: 消息19" in read_text(qq_file)
+
+        final_qq = os.path.join(tmpdir, "final_qq.txt")
+        final_wechat = os.path.join(tmpdir, "final_wechat.txt")
+        generator.finalize_temp_files(qq_file, wechat_file, final_qq, final_wechat)
+        assert os.path.exists(final_qq + ".gz") and os.path.exists(final_wechat + ".gz")
+
+        saved = generator.save_planning_conversation(messages, os.path.join(tmpdir, "record.txt"), "qq", "gzip")
+        assert saved.endswith(".gz")
+        assert "消息0" in read_text(saved)
+
+
+if __name__ == "__main__":
+    test_write_and_append_round_trip()
+    test_parallel_gzip_chunks()
+    test_truncated_append_keeps_complete_frames()
+    test_planning_temp_files_compressed()
+    print("🎯 测试完成！")
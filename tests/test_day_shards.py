@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试按天分片保存
+多天的对话每天一个文件，manifest.json 记录消息数、时间范围、字节数和校验和
+"""
+
+import os
+import sys
+import json
+import hashlib
+import tempfile
+import datetime
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+
+from chat_generator.core.base_generator import ChatMessage
+from chat_generator.core.output_writer import read_text
+from chat_generator.core.planning_generator import PlanningChatGenerator
+
+
+def make_messages(hours: int = 72):
+    """每小时一条消息"""
+    start = datetime.datetime(2025, 1, 1, 9, 0, 0)
+    return [
+        ChatMessage(sender="强哥", content=f"消息{i}", timestamp=start + datetime.timedelta(hours=i))
+        for i in range(hours)
+    ]
+
+
+def make_generator() -> PlanningChatGenerator:
+    generator = PlanningChatGenerator(model=object())
+    generator.input_planning_event("公司年会策划")
+    generator._create_default_planning_characters()
+    return generator
+
+
+def test_shards_and_manifest():
+    """测试分片文件和manifest内容"""
+    print("🧪 测试按天分片保存")
+
+    messages = make_messages()
+    generator = make_generator()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        directory = os.path.join(tmpdir, "planning_chat")
+        manifest_file = generator.save_planning_conversation_by_day(messages, directory, "qq")
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        # 9点开始的72小时跨4个自然日
+        assert manifest["shard_count"] == 4
+        assert manifest["total_messages"] == 72
+        assert sum(shard["message_count"] for shard in manifest["shards"]) == 72
+        assert [shard["date"] for shard in manifest["shards"]] == [
+            "2025-01-01", "2025-01-02", "2025-01-03", "2025-01-04"
+        ]
+        assert manifest["shards"][0]["start_time"] == "2025-01-01T09:00:00"
+        assert manifest["shards"][0]["end_time"] == "2025-01-01T23:00:00"
+
+        for shard in manifest["shards"]:
+            path = os.path.join(directory, shard["file"])
+            with open(path, 'rb') as f:
+                data = f.read()
+            assert len(data) == shard["bytes"]
+            assert hashlib.sha256(data).hexdigest() == shard["sha256"]
+            content = read_text(path)
+            assert content.count("强哥: 消息") == shard["message_count"]
+    print(f"✅ 共 {manifest['shard_count']} 个分片")
+
+
+def test_compressed_shards():
+    """测试压缩分片"""
+    generator = make_generator()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manifest_file = generator.save_planning_conversation_by_day(make_messages(30), tmpdir, "wechat", "gzip")
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        assert manifest["compression"] == "gzip"
+        assert all(shard["file"].endswith(".txt.gz") for shard in manifest["shards"])
+        assert "消息29" in read_text(os.path.join(tmpdir, manifest["shards"][-1]["file"]))
+
+
+if __name__ == "__main__":
+    test_shards_and_manifest()
+    test_compressed_shards()
+    print("🎯 测试完成！")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试本地降级生成和回填
+API调用失败时按阶段和角色性格用本地模板生成占位消息，运行日志中标记，之后重新调用模型回填
+"""
+
+import sys
+import datetime
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+sys.path.insert(0, str(project_root))
+
+from chat_generator.core.ai_generator import AIChatGenerator
+from chat_generator.core.fallback import FallbackComposer
+from chat_generator.core.planning_generator import PlanningChatGenerator
+from chat_generator.core.run_log import load_messages, read_run_log
+from tests.helpers import EchoModel, in_tempdir, make_planning_generator
+
+
+class OutageModel(EchoModel):
+    """第 fail_from 次调用起模拟配额耗尽的假模型（recover 后恢复正常）"""
+
+    def __init__(self, fail_from: int):
+        super().__init__("模型回复{call}")
+        self.fail_from = fail_from
+        self.failing = True
+
+    def reply(self, prompt, call):
+        if self.failing and call >= self.fail_from:
+            raise RuntimeError("429 Resource has been exhausted")
+        return super().reply(prompt, call)
+
+
+def make_fallback_generator(model) -> PlanningChatGenerator:
+    generator = make_planning_generator(model, event=None)
+    generator.fallback = FallbackComposer(after_failures=3, cooldown=3600)
+    generator.input_planning_event("公司年会策划")
+    generator._create_default_planning_characters()
+    generator.generate_planning_phases()
+    generator._create_default_sub_events()
+    return generator
+
+
+def test_planning_fallback_and_backfill():
+    """测试策划对话在API不可用时继续生成，之后回填"""
+    print("🧪 测试策划对话降级生成")
+
+    model = OutageModel(fail_from=11)
+    with in_tempdir():
+        generator = make_fallback_generator(model)
+        messages = generator.generate_planning_conversation(
+            total_duration_hours=48.0,
+            target_message_count=40,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+            save_interval=10
+        )
+        assert len(messages) == 40
+        # 连续失败3次后不再调用API
+        assert model.calls == 13
+        assert generator.fallback_indices == list(range(10, 40))
+
+        _, entries, end = read_run_log(generator.run_log_path)
+        assert end["fallback_count"] == 30
+        flagged = [entry for entry in entries if entry.get("fallback")]
+        assert sorted(entry["index"] for entry in flagged) == list(range(10, 40))
+        # 占位消息按阶段生成，不是同一句话
+        assert len({entry["content"] for entry in flagged}) > 5
+        assert all(entry["phase"] in entry["content"] for entry in flagged)
+        print(f"✅ {len(flagged)} 条占位消息，{len({e['content'] for e in flagged})} 种不同内容")
+
+        # API恢复后回填
+        model.failing = False
+        assert generator.backfill_run_log() == 30
+        _, entries, end = read_run_log(generator.run_log_path)
+        assert end["fallback_count"] == 0
+        assert not any(entry.get("fallback") for entry in entries)
+        assert sum(1 for entry in entries if entry.get("backfilled")) == 30
+        assert all(m.content.startswith("模型回复") for m in load_messages(generator.run_log_path))
+        assert generator.backfill_run_log() == 0
+    print("✅ 回填完成")
+
+
+def test_fallback_disabled_keeps_default_message():
+    """测试关闭降级时仍返回原来的默认消息"""
+    generator = make_fallback_generator(OutageModel(fail_from=1))
+    generator.fallback.enabled = False
+    with in_tempdir():
+        messages = generator.generate_planning_conversation(
+            total_duration_hours=24.0,
+            target_message_count=5,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+            realtime_save=False
+        )
+    assert all(m.content.endswith("我需要进一步确认...") for m in messages)
+    assert not generator.fallback_indices
+
+
+def test_ai_fallback_and_backfill():
+    """测试AI对话的降级生成和回填"""
+    model = OutageModel(fail_from=4)
+    with in_tempdir():
+        generator = AIChatGenerator(model=model)
+        generator.request_interval = 0
+        generator.fallback = FallbackComposer(after_failures=2, cooldown=3600)
+        generator.input_event("产品发布会")
+        generator._create_default_characters()
+        messages = generator.generate_ai_conversation(
+            duration_hours=1.0,
+            message_count=12,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+            save_interval=5
+        )
+        assert len(messages) == 12 and model.calls == 5
+        assert generator.fallback_indices == list(range(3, 12))
+        _, entries, _ = read_run_log(generator.run_log_path)
+        assert all("产品发布会" in entry["content"] for entry in entries if entry.get("fallback"))
+
+        model.failing = False
+        assert generator.backfill_run_log() == 9
+        _, entries, end = read_run_log(generator.run_log_path)
+        assert end["fallback_count"] == 0
+        assert all(entry["content"].startswith("模型回复") for entry in entries)
+
+
+if __name__ == "__main__":
+    test_planning_fallback_and_backfill()
+    test_fallback_disabled_keeps_default_message()
+    test_ai_fallback_and_backfill()
+    print("🎯 测试完成！")
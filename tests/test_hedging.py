@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试对冲请求
+调用超过观测到的p95耗时仍未返回时再发一次，先返回的结果生效，对冲比例有上限
+"""
+
+import sys
+import time
+import datetime
+import threading
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+sys.path.insert(0, str(project_root))
+
+from chat_generator.core.hedging import HedgedCaller
+from chat_generator.core.run_log import read_run_log
+from tests.helpers import in_tempdir, make_planning_generator
+
+
+class TailModel:
+    """大多数调用很快，指定的第几次调用很慢的假模型"""
+
+    def __init__(self, slow_calls, latency: float = 0.005, slow_latency: float = 1.0):
+        self.slow_calls = set(slow_calls)
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(self.slow_latency if call in self.slow_calls else self.latency)
+
+        class Response:
+            text = f"第{call}次调用"
+        return Response()
+
+
+def test_hedge_cuts_tail():
+    """测试慢调用被对冲，总耗时不再被长尾拖住"""
+    print("🧪 测试对冲请求")
+
+    model = TailModel(slow_calls=[25, 32])
+    hedger = HedgedCaller(enabled=True, min_samples=10, max_rate=0.2)
+    start = time.perf_counter()
+    texts = [hedger.call(model.generate_content, "提示词").text for _ in range(40)]
+    elapsed = time.perf_counter() - start
+    hedger.shutdown()
+
+    assert len(texts) == 40
+    assert hedger.hedged >= 2 and hedger.hedge_wins >= 2
+    # 不对冲时两次慢调用至少需要2秒
+    assert elapsed < 1.5, elapsed
+    assert "第25次调用" not in texts and "第32次调用" not in texts
+    print(f"✅ 40次调用耗时 {elapsed:.2f}s，对冲 {hedger.hedged} 次")
+
+
+def test_hedge_rate_cap():
+    """测试对冲比例上限"""
+    model = TailModel(slow_calls=[12], slow_latency=0.2)
+    hedger = HedgedCaller(enabled=True, min_samples=10, max_rate=0.0)
+    texts = [hedger.call(model.generate_content, "提示词").text for _ in range(15)]
+    hedger.shutdown()
+    assert hedger.hedged == 0 and model.calls == 15
+    assert "第12次调用" in texts
+
+
+def test_both_requests_fail():
+    """测试原请求和对冲请求都失败时抛出错误"""
+    hedger = HedgedCaller(enabled=True, min_samples=3, max_rate=1.0)
+    for _ in range(3):
+        hedger.call(time.sleep, 0.001)
+
+    def slow_failure():
+        time.sleep(0.05)
+        raise RuntimeError("服务不可用")
+
+    try:
+        hedger.call(slow_failure)
+        raise AssertionError("应抛出错误")
+    except RuntimeError as e:
+        assert "服务不可用" in str(e)
+    assert hedger.hedged == 1
+    hedger.shutdown()
+
+
+def test_losers_in_flight_count_against_cap():
+    """测试仍在执行的落败请求占用对冲名额，执行完后释放"""
+    gate = threading.Event()
+    attempts = {}
+    lock = threading.Lock()
+
+    def request(call_id, behaviours):
+        with lock:
+            attempt = attempts.get(call_id, 0)
+            attempts[call_id] = attempt + 1
+        behaviour = behaviours[min(attempt, len(behaviours) - 1)]
+        if behaviour == "gate":
+            gate.wait(5)
+        else:
+            time.sleep(behaviour)
+        return f"{call_id}-{attempt}"
+
+    hedger = HedgedCaller(enabled=True, min_samples=2, max_rate=0.5)
+    for call_id in range(2):
+        hedger.call(request, call_id, [0.01])
+
+    # 第3次调用的原请求卡住，对冲请求先返回，原请求成为仍在执行的落败请求
+    assert hedger.call(request, 2, ["gate", 0.01]) == "2-1"
+    assert hedger.hedged == 1 and hedger.losers_in_flight == 1
+
+    # 按调用数还有名额（1 + 1 <= 4 × 0.5），但落败请求仍占着名额，不再对冲
+    assert hedger.call(request, 3, [0.1, 0.01]) == "3-0"
+    assert hedger.hedged == 1 and attempts[3] == 1
+
+    # 落败请求执行完后释放名额，慢调用可以再次对冲
+    gate.set()
+    deadline = time.time() + 2
+    while hedger.losers_in_flight and time.time() < deadline:
+        time.sleep(0.01)
+    assert hedger.stats()["losers_in_flight"] == 0
+    assert hedger.call(request, 4, [0.2, 0.01]) == "4-1"
+    assert hedger.hedged == 2
+    hedger.shutdown()
+
+
+def test_disabled_calls_directly():
+    """测试未启用时直接调用，不创建线程池"""
+    hedger = HedgedCaller(enabled=False)
+    assert hedger.call(lambda x: x * 2, 21) == 42
+    assert hedger.calls == 0 and hedger._executor is None
+
+
+def test_planning_run_reports_hedging():
+    """测试策划对话使用对冲请求并在运行日志中记录统计"""
+    model = TailModel(slow_calls=[30], slow_latency=0.5)
+    with in_tempdir():
+        generator = make_planning_generator(model)
+        generator.hedger = HedgedCaller(enabled=True, min_samples=10, max_rate=0.1)
+        messages = generator.generate_planning_conversation(
+            total_duration_hours=24.0,
+            target_message_count=40,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+            save_interval=20
+        )
+        assert len(messages) == 40
+        _, _, end = read_run_log(generator.run_log_path)
+        assert end["hedging"]["calls"] == 40
+        assert end["hedging"]["hedged"] >= 1
+        assert all(m.content != "第30次调用" for m in messages)
+
+
+if __name__ == "__main__":
+    test_hedge_cuts_tail()
+    test_hedge_rate_cap()
+    test_both_requests_fail()
+    test_losers_in_flight_count_against_cap()
+    test_disabled_calls_directly()
+    test_planning_run_reports_hedging()
+    print("🎯 测试完成！")
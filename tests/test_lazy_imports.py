@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试延迟导入
+导入包和显示菜单时不应加载Google AI SDK和dotenv
+"""
+
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+HEAVY_MODULES = ["google.generativeai", "dotenv"]
+
+
+def run_in_subprocess(code: str) -> list:
+    """在新的解释器中运行代码，返回已加载的重型模块"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = str(project_root / 'src')
+    code += f"\nimport json, sys\nprint(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def test_import_package():
+    """测试 import chat_generator"""
+    print("🧪 测试 import chat_generator")
+    loaded = run_in_subprocess("import chat_generator")
+    print(f"   已加载的重型模块: {loaded}")
+    assert loaded == []
+
+
+def test_show_menu():
+    """测试显示菜单"""
+    print("🧪 测试菜单启动")
+    loaded = run_in_subprocess("from chat_generator.cli.main import show_menu\nshow_menu()")
+    print(f"   已加载的重型模块: {loaded}")
+    assert loaded == []
+
+
+def test_import_generators():
+    """测试导入AI生成器模块不加载SDK"""
+    print("🧪 测试导入生成器模块")
+    loaded = run_in_subprocess(
+        "import chat_generator.core.ai_generator\n"
+        "import chat_generator.core.planning_generator\n"
+        "import chat_generator.utils"
+    )
+    print(f"   已加载的重型模块: {loaded}")
+    assert "google.generativeai" not in loaded
+
+
+if __name__ == "__main__":
+    test_import_package()
+    test_show_menu()
+    test_import_generators()
+    print("🎯 测试完成！")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试日志
+JSON格式输出、高频事件采样、安静模式和日志级别
+"""
+
+import io
+import sys
+import json
+import datetime
+import contextlib
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+sys.path.insert(0, str(project_root))
+
+from chat_generator.core.log import configure_logging, get_logger, parse_sample_rates
+from chat_generator.core.ai_generator import AIChatGenerator
+from tests.helpers import EchoModel, in_tempdir
+
+
+@contextlib.contextmanager
+def captured_logs(**options):
+    """按给定参数初始化日志并捕获输出，结束后恢复默认配置"""
+    configure_logging(force=True, **options)
+    buffer = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(buffer):
+            yield buffer
+    finally:
+        configure_logging(force=True)
+
+
+def test_parse_sample_rates():
+    """测试采样率配置解析"""
+    assert parse_sample_rates("message.generating=5, planning.progress=50,bad,x=y") == {
+        "message.generating": 5, "planning.progress": 50}
+    assert parse_sample_rates("") == {}
+
+
+def test_json_format():
+    """测试JSON格式：每行一个对象，包含事件名和附加字段"""
+    print("🧪 测试JSON日志")
+    log = get_logger("chat_generator.tests")
+    with captured_logs(level="INFO", fmt="json", sample_rates={}) as buffer:
+        log.info("✅ 已保存 %d 条", 3, event="realtime.saved", count=3)
+        log.error("❌ 失败", event="message.failed", sender="小明")
+
+    records = [json.loads(line) for line in buffer.getvalue().splitlines()]
+    assert len(records) == 2
+    assert records[0]["message"] == "✅ 已保存 3 条" and records[0]["event"] == "realtime.saved"
+    assert records[0]["level"] == "info" and records[0]["count"] == 3
+    assert records[1]["level"] == "error" and records[1]["sender"] == "小明"
+    print("✅ JSON日志正确")
+
+
+def test_sampling_in_generation_loop():
+    """测试生成循环中的逐条进度按采样率输出，警告和错误不采样"""
+    print("🧪 测试日志采样")
+    generator = AIChatGenerator(model=EchoModel("收到"))
+    generator.request_interval = 0
+    generator.input_event("周末聚餐")
+    generator._create_default_characters()
+
+    with captured_logs(fmt="json", sample_rates={"message.generating": 10}) as buffer:
+        with in_tempdir():
+            generator.generate_ai_conversation(duration_hours=1.0, message_count=30,
+                                               start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+                                               realtime_save=False)
+        log = get_logger("chat_generator.tests")
+        for i in range(5):
+            log.warning("⚠️ 警告", event="message.generating", seq=i)
+
+    records = [json.loads(line) for line in buffer.getvalue().splitlines()]
+    generating = [r for r in records if r["event"] == "message.generating" and r["level"] == "info"]
+    assert [r["index"] for r in generating] == [0, 10, 20]
+    assert all(r["sample_rate"] == 10 for r in generating)
+    assert len([r for r in records if r["level"] == "warning"]) == 5
+    assert any(r["event"] == "run.completed" and r["count"] == 30 for r in records)
+    print(f"✅ 30 条消息输出 {len(generating)} 条进度")
+
+
+def test_quiet_and_level():
+    """测试安静模式只输出警告和错误，日志级别过滤低级别日志"""
+    log = get_logger("chat_generator.tests")
+    with captured_logs(level="DEBUG", quiet=True) as buffer:
+        log.info("普通信息")
+        log.warning("⚠️ 警告")
+    assert buffer.getvalue().splitlines() == ["⚠️ 警告"]
+
+    with captured_logs(level="ERROR") as buffer:
+        log.warning("⚠️ 警告")
+        log.error("❌ 错误")
+    assert buffer.getvalue().splitlines() == ["❌ 错误"]
+
+    with captured_logs(level="DEBUG") as buffer:
+        log.debug("调试 %s", "信息")
+    assert buffer.getvalue() == "调试 信息\n"
+
+
+def test_src_import_path():
+    """测试按 src.chat_generator 导入（如 examples/ 中的示例）时状态信息照常输出"""
+    from src.chat_generator.core import log as src_log
+    from src.chat_generator.core.planning_generator import PlanningChatGenerator as SrcPlanningGenerator
+
+    assert src_log.ROOT_LOGGER == "src.chat_generator"
+    generator = SrcPlanningGenerator(model=EchoModel("收到"))
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        generator.input_planning_event("测试")
+    assert buffer.getvalue() == "✅ 策划事件已录入: 测试\n"
+
+
+if __name__ == "__main__":
+    test_parse_sample_rates()
+    test_json_format()
+    test_sampling_in_generation_loop()
+    test_quiet_and_level()
+    test_src_import_path()
+    print("🎯 测试完成！")
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试运行指标
+Prometheus文本格式、HTTP端点、文本文件导出，以及策划对话运行时记录的指标
+"""
+
+import os
+import sys
+import time
+import tempfile
+import datetime
+import threading
+import urllib.request
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+sys.path.insert(0, str(project_root))
+
+from chat_generator.core.fallback import FallbackComposer
+from chat_generator.core.metrics import (
+    Counter, GeneratorMetrics, Histogram, MetricsExporter, MetricsRegistry, ensure_exporter
+)
+from tests.helpers import EchoModel, in_tempdir, make_planning_generator
+
+
+class FlakyModel(EchoModel):
+    """第 fail_from 次调用起失败的假模型"""
+
+    def __init__(self, fail_from: int = None):
+        super().__init__("收到，马上安排")
+        self.fail_from = fail_from
+
+    def reply(self, prompt, call):
+        if self.fail_from is not None and call >= self.fail_from:
+            raise RuntimeError("503 Service Unavailable")
+        return super().reply(prompt, call)
+
+
+def test_render_format():
+    """测试文本格式：HELP/TYPE、标签转义和直方图的累计分桶"""
+    print("🧪 测试指标文本格式")
+
+    registry = MetricsRegistry()
+    counter = registry.register(Counter("demo_total", "示例计数", ("run",)))
+    histogram = registry.register(Histogram("demo_seconds", "示例耗时", ("run",), buckets=(0.1, 1.0)))
+    counter.inc(run='a"b')
+    counter.inc(2, run='a"b')
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, run="x")
+
+    text = registry.render()
+    assert "# HELP demo_total 示例计数\n# TYPE demo_total counter\n" in text
+    assert 'demo_total{run="a\\"b"} 3\n' in text
+    assert 'demo_seconds_bucket{run="x",le="0.1"} 1\n' in text
+    assert 'demo_seconds_bucket{run="x",le="1"} 2\n' in text
+    assert 'demo_seconds_bucket{run="x",le="+Inf"} 3\n' in text
+    assert 'demo_seconds_count{run="x"} 3\n' in text
+    assert 'demo_seconds_sum{run="x"} 5.55\n' in text
+
+    try:
+        counter.inc(other="x")
+        raise AssertionError("标签不匹配时应抛出错误")
+    except ValueError:
+        pass
+    print("✅ 格式正确")
+
+
+def test_planning_run_metrics():
+    """测试策划对话运行时记录的消息数、请求、失败、降级、token和当前阶段"""
+    print("🧪 测试策划对话指标")
+
+    model = FlakyModel(fail_from=21)
+    generator = make_planning_generator(model, event=None, conversation_id="run1")
+    generator.metrics = GeneratorMetrics()
+    generator.fallback = FallbackComposer(after_failures=2, cooldown=3600)
+    generator.input_planning_event("公司年会策划")
+    generator._create_default_planning_characters()
+    generator.generate_planning_phases()
+    generator._create_default_sub_events()
+    with in_tempdir():
+        generator.generate_planning_conversation(
+            total_duration_hours=24.0,
+            target_message_count=40,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+            realtime_save=False
+        )
+
+    metrics = generator.metrics
+    assert metrics.messages.get(run="run1", kind="planning") == 40
+    assert metrics.target_messages.get(run="run1", kind="planning") == 40
+    assert metrics.in_flight.get(run="run1") == 0
+    assert metrics.latency.get(run="run1")["count"] == model.calls == 22
+    assert metrics.errors.get(run="run1") == 2
+    assert metrics.fallbacks.get(run="run1") == 20
+    assert metrics.tokens.get(run="run1", direction="prompt") > 0
+    assert metrics.tokens.get(run="run1", direction="output") > 0
+
+    text = metrics.render()
+    phases = [line for line in text.splitlines() if line.startswith("chat_generator_current_phase{")]
+    assert phases == [f'chat_generator_current_phase{{run="run1",phase="{generator.current_phase}"}} 1']
+    print(f"✅ 当前阶段: {generator.current_phase}")
+
+
+def test_http_endpoint_and_textfile():
+    """测试HTTP端点和文本文件导出"""
+    metrics = GeneratorMetrics()
+    metrics.messages.inc(run="run2", kind="ai")
+    exporter = MetricsExporter(metrics)
+    port = exporter.start_http(0)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        textfile = os.path.join(tmpdir, "textfile", "chat_generator.prom")
+        exporter.start_textfile(textfile, interval=0.05)
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+                assert response.headers["Content-Type"].startswith("text/plain")
+                body = response.read().decode("utf-8")
+            assert 'chat_generator_messages_total{run="run2",kind="ai"} 1' in body
+
+            metrics.messages.inc(run="run2", kind="ai")
+            time.sleep(0.2)
+            with open(textfile, "r", encoding="utf-8") as f:
+                assert 'chat_generator_messages_total{run="run2",kind="ai"} 2' in f.read()
+        finally:
+            exporter.stop()
+        assert not [name for name in os.listdir(os.path.dirname(textfile)) if name.endswith(".tmp")]
+
+
+def test_concurrent_ensure_exporter():
+    """测试多个对话同时开始运行时只启动一个导出"""
+    from chat_generator.config import settings
+    from chat_generator.core import metrics as metrics_module
+
+    created = []
+    original_init = MetricsExporter.__init__
+
+    def counting_init(self, *args, **kwargs):
+        created.append(self)
+        time.sleep(0.05)  # 放大检查和保存之间的窗口
+        original_init(self, *args, **kwargs)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        old_textfile, old_exporter = settings.METRICS_TEXTFILE, metrics_module._exporter
+        settings.METRICS_TEXTFILE = os.path.join(tmpdir, "chat_generator.prom")
+        metrics_module._exporter = None
+        MetricsExporter.__init__ = counting_init
+        results = []
+        try:
+            threads = [threading.Thread(target=lambda: results.append(ensure_exporter())) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            MetricsExporter.__init__ = original_init
+            if metrics_module._exporter is not None:
+                metrics_module._exporter.stop()
+            settings.METRICS_TEXTFILE, metrics_module._exporter = old_textfile, old_exporter
+    assert len(created) == 1
+    assert len(results) == 8 and all(result is created[0] for result in results)
+
+
+if __name__ == "__main__":
+    test_render_format()
+    test_planning_run_metrics()
+    test_http_endpoint_and_textfile()
+    test_concurrent_ensure_exporter()
+    print("🎯 测试完成！")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试模型分级路由
+日常消息发给快速模型，子事件、阶段切换和决策类消息发给强模型，运行日志中记录各级别的调用统计
+"""
+
+import sys
+import datetime
+import threading
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+sys.path.insert(0, str(project_root))
+
+from chat_generator.core.model_router import ModelRouter, TierStats, TIER_FAST, TIER_STRONG
+from chat_generator.core.planning_generator import PlanningCharacter, SubEvent
+from chat_generator.core.run_log import read_run_log
+from tests.helpers import EchoModel, in_tempdir, make_planning_generator
+
+
+def make_character(level: str) -> PlanningCharacter:
+    return PlanningCharacter(name="阿龙", role="执行员", department="行动组", level=level,
+                             expertise=[], personality="冲动", speaking_style="直接",
+                             responsibilities=[], decision_power="低")
+
+
+def make_sub_event(urgency: str) -> SubEvent:
+    return SubEvent(name="突发", description="有人报警", urgency=urgency, impact="大",
+                    related_phase="开始行动", trigger_conditions=[])
+
+
+def test_routing_rules():
+    """测试按子事件紧急程度、阶段切换、阶段和角色级别路由"""
+    print("🧪 测试路由规则")
+
+    router = ModelRouter(strong_phases=["行动执行"], strong_urgency=["高"], strong_levels=["老大"])
+    member = make_character("马仔")
+
+    assert router.route("踩点摸底", character=member) == TIER_FAST
+    assert router.route("踩点摸底", make_sub_event("高"), member) == TIER_STRONG
+    assert router.route("踩点摸底", make_sub_event("低"), member) == TIER_FAST
+    assert router.route("踩点摸底", character=member, phase_changed=True) == TIER_STRONG
+    assert router.route("行动执行", character=member) == TIER_STRONG
+    assert router.route("踩点摸底", character=make_character("老大")) == TIER_STRONG
+
+    no_transitions = ModelRouter(strong_levels=[], phase_transitions=False)
+    assert no_transitions.route("踩点摸底", character=member, phase_changed=True) == TIER_FAST
+    print("✅ 路由规则正确")
+
+
+def test_tier_stats():
+    """测试各级别的调用统计"""
+    stats = TierStats()
+    for latency in [0.1, 0.2, 0.3]:
+        stats.record(TIER_FAST, "flash", latency)
+    stats.record(TIER_STRONG, "pro", 1.0, ok=False)
+
+    report = stats.report()
+    assert report[TIER_FAST]["calls"] == 3 and report[TIER_FAST]["errors"] == 0
+    assert report[TIER_FAST]["avg_latency"] == 0.2 and report[TIER_FAST]["p95_latency"] == 0.3
+    assert report[TIER_STRONG] == {"model": "pro", "calls": 1, "errors": 1,
+                                   "avg_latency": 1.0, "p95_latency": 1.0}
+
+
+def test_tier_stats_concurrent_record():
+    """测试多个线程同时记录和汇总时不丢失调用"""
+    stats = TierStats()
+
+    def record():
+        for i in range(2000):
+            stats.record(TIER_FAST if i % 2 else TIER_STRONG, "model", 0.01, ok=i % 10 != 0)
+            if i % 100 == 0:
+                stats.report()
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    report = stats.report()
+    assert report[TIER_FAST]["calls"] == report[TIER_STRONG]["calls"] == 8000
+    assert report[TIER_STRONG]["errors"] == 8 * 200 and report[TIER_FAST]["errors"] == 0
+
+
+def test_conversation_uses_both_tiers():
+    """测试对话生成时按路由调用两个模型，运行日志记录级别和汇总统计"""
+    print("🧪 测试分级生成对话")
+
+    strong = EchoModel(model_name="strong-model")
+    fast = EchoModel(model_name="fast-model")
+
+    with in_tempdir():
+        generator = make_planning_generator(strong, fast_model=fast,
+                                            model_router=ModelRouter(strong_levels=["老大"]))
+
+        generator.generate_planning_conversation(
+            total_duration_hours=48.0,
+            target_message_count=60,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+            save_interval=20
+        )
+
+        info, entries, end = read_run_log(generator.run_log_path)
+        assert info["tier_models"] == {TIER_STRONG: "strong-model", TIER_FAST: "fast-model"}
+
+        previous_phase = None
+        for entry in entries_by_index(entries):
+            tier = entry["call"]["tier"]
+            sub_event = next((e for e in generator.sub_events if e.name == entry["sub_event"]), None)
+            sender = next(c for c in generator.planning_characters if c.name == entry["sender"])
+            expected_strong = (entry["phase"] != previous_phase or sender.level == "老大"
+                               or (sub_event is not None and sub_event.urgency in ("高", "中")))
+            assert tier == (TIER_STRONG if expected_strong else TIER_FAST), entry
+            assert entry["call"]["model"] == ("strong-model" if tier == TIER_STRONG else "fast-model")
+            previous_phase = entry["phase"]
+
+        tiers = end["tiers"]
+        assert tiers[TIER_STRONG]["calls"] == len(strong.prompts) > 0
+        assert tiers[TIER_FAST]["calls"] == len(fast.prompts) > 0
+        assert len(strong.prompts) + len(fast.prompts) == 60
+    print(f"✅ 强模型 {len(strong.prompts)} 次，快速模型 {len(fast.prompts)} 次")
+
+
+def entries_by_index(entries):
+    """运行日志按时间排序，路由按生成顺序判断"""
+    return sorted(entries, key=lambda entry: entry["index"])
+
+
+def test_single_model_without_fast_tier():
+    """测试没有快速模型时所有消息都使用同一个模型"""
+    model = EchoModel(model_name="only-model")
+    generator = make_planning_generator(model)
+    with in_tempdir():
+        generator.generate_planning_conversation(
+            total_duration_hours=24.0,
+            target_message_count=20,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+            realtime_save=False
+        )
+    assert len(model.prompts) >= 20
+    assert set(generator.tier_stats.report()) == {TIER_STRONG}
+
+
+if __name__ == "__main__":
+    test_routing_rules()
+    test_tier_stats()
+    test_tier_stats_concurrent_record()
+    test_conversation_uses_both_tiers()
+    test_single_model_without_fast_tier()
+    print("🎯 测试完成！")
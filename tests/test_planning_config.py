@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试策划配置的保存和加载
+加载配置后生成对话不应再调用API生成角色、阶段和子事件
+"""
+
+import os
+import sys
+import tempfile
+import datetime
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+sys.path.insert(0, str(project_root))
+
+from tests.helpers import EchoModel, in_tempdir, make_planning_generator
+
+
+def test_save_and_load_planning_config():
+    """测试配置往返"""
+    print("🧪 测试策划配置保存和加载")
+
+    generator = make_planning_generator(event=None)
+    generator.input_planning_event("公司年会策划", "预计参与人数500人")
+    generator._create_default_planning_characters()
+    generator.generate_planning_phases()
+    generator._create_default_sub_events()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "configs", "planning_config.json")
+        generator.save_planning_config(filename)
+
+        loaded = make_planning_generator(event=None)
+        assert loaded.load_planning_config(filename)
+
+    assert loaded.main_event == generator.main_event
+    assert loaded.event_context == generator.event_context
+    assert loaded.planning_characters == generator.planning_characters
+    assert loaded.planning_phases == generator.planning_phases
+    assert loaded.sub_events == generator.sub_events
+    print(f"✅ 加载了 {len(loaded.planning_characters)} 个角色, {len(loaded.sub_events)} 个子事件")
+
+
+def test_load_missing_config():
+    """测试加载不存在的配置文件"""
+    generator = make_planning_generator(event=None)
+    assert not generator.load_planning_config("/nonexistent/planning_config.json")
+
+
+def test_conversation_from_config_makes_no_setup_calls():
+    """测试从配置生成对话时只有消息调用"""
+    print("🧪 测试从配置生成对话")
+
+    source = make_planning_generator()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "planning_config.json")
+        source.save_planning_config(filename)
+
+        model = EchoModel("收到，马上安排。")
+        generator = make_planning_generator(model, event=None)
+        generator.load_planning_config(filename)
+        with in_tempdir():
+            messages = generator.generate_planning_conversation(
+                total_duration_hours=48.0,
+                target_message_count=20,
+                start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+                realtime_save=False
+            )
+
+    assert len(messages) == 20
+    assert len(model.prompts) == 20
+    assert not any('"sub_events"' in prompt or '"characters"' in prompt for prompt in model.prompts)
+    print(f"✅ 生成 {len(messages)} 条消息，共调用模型 {len(model.prompts)} 次")
+
+
+if __name__ == "__main__":
+    test_save_and_load_planning_config()
+    test_load_missing_config()
+    test_conversation_from_config_makes_no_setup_calls()
+    print("🎯 测试完成！")
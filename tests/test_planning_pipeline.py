@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试策划对话生成流程
+使用假模型验证流水线生成的顺序和并发
+"""
+
+import re
+import sys
+import time
+import datetime
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+sys.path.insert(0, str(project_root))
+
+from tests.helpers import EchoModel, in_tempdir, make_planning_generator
+
+
+class IndexEchoModel(EchoModel):
+    """返回提示词中消息序号的假模型"""
+
+    def reply(self, prompt: str, call: int) -> str:
+        match = re.search(r"第(\d+)条消息", prompt)
+        return f"消息{match.group(1) if match else '?'}"
+
+
+def generate(generator, count: int, **kwargs):
+    with in_tempdir():
+        return generator.generate_planning_conversation(
+            total_duration_hours=48.0,
+            target_message_count=count,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+            realtime_save=False,
+            **kwargs
+        )
+
+
+def test_lookahead_commits_in_order():
+    """流水线生成的结果按消息顺序提交"""
+    print("🧪 测试流水线按序提交")
+    model = IndexEchoModel(latency=0.01)
+    generator = make_planning_generator(model)
+    generate(generator, 40, lookahead=4)
+
+    contents = [entry['content'] for entry in generator.conversation_history]
+    assert contents == [f"消息{i + 1}" for i in range(40)]
+    print(f"✅ 40条消息按顺序提交，最大并发 {model.peak}")
+    assert 1 < model.peak <= 4
+
+
+def test_lookahead_throughput():
+    """流水线生成比串行更快"""
+    print("🧪 测试流水线吞吐")
+    count = 30
+
+    serial = make_planning_generator(IndexEchoModel(latency=0.02))
+    start = time.perf_counter()
+    generate(serial, count)
+    serial_time = time.perf_counter() - start
+
+    pipelined = make_planning_generator(IndexEchoModel(latency=0.02))
+    start = time.perf_counter()
+    generate(pipelined, count, lookahead=4)
+    pipelined_time = time.perf_counter() - start
+
+    print(f"   串行 {serial_time:.2f}s, 流水线 {pipelined_time:.2f}s")
+    assert pipelined_time < serial_time / 2
+
+
+def test_no_consecutive_sender():
+    """提前规划的发送者也不会连续相同"""
+    generator = make_planning_generator(IndexEchoModel())
+    generate(generator, 100, lookahead=3)
+    senders = [entry['sender'] for entry in generator.conversation_history]
+    assert all(a != b for a, b in zip(senders, senders[1:]))
+
+
+def test_phase_updated_at_commit():
+    """提前规划不修改当前阶段和阶段进度，两者只跟随已提交的消息"""
+    generator = make_planning_generator(IndexEchoModel())
+    plan_slot = generator._plan_planning_slot
+    mismatches = []
+
+    def checked_plan(*args, **kwargs):
+        committed = generator.conversation_history[-1]['phase'] if generator.conversation_history else ""
+        before = (generator.current_phase, dict(generator.phase_progress))
+        slot = plan_slot(*args, **kwargs)
+        if generator.current_phase != committed or (generator.current_phase, generator.phase_progress) != before:
+            mismatches.append(slot['index'])
+        return slot
+
+    generator._plan_planning_slot = checked_plan
+    generate(generator, 60, lookahead=8)
+    assert not mismatches
+
+    serial = make_planning_generator(IndexEchoModel())
+    generate(serial, 60)
+    assert generator.current_phase == serial.current_phase == generator.conversation_history[-1]['phase']
+    assert generator.phase_progress == serial.phase_progress
+
+
+if __name__ == "__main__":
+    test_lookahead_commits_in_order()
+    test_lookahead_throughput()
+    test_no_consecutive_sender()
+    test_phase_updated_at_commit()
+    print("🎯 测试完成！")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试运行配置（性能档位）
+内置档位、从文件加载和继承，以及档位对生成器参数、模型级别和保存策略的影响
+"""
+
+import sys
+import json
+import datetime
+import builtins
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+sys.path.insert(0, str(project_root))
+
+from chat_generator.core.profiles import BUILTIN_PROFILES, RunProfile, get_profile, load_profiles
+from chat_generator.core.model_router import TIER_FAST, TIER_STRONG
+from chat_generator.core.planning_generator import PlanningChatGenerator
+from chat_generator.core.ai_generator import AIChatGenerator
+from chat_generator.core.run_log import read_run_log
+from chat_generator.cli.main import main, parse_args
+from chat_generator.utils.ai_config_generator import AIConfigGenerator
+from chat_generator.utils.planning_config_generator import PlanningConfigGenerator
+from tests.helpers import EchoModel, in_tempdir
+
+
+def test_builtin_profiles():
+    """测试内置档位和按名称获取"""
+    print("🧪 测试内置档位")
+    assert set(BUILTIN_PROFILES) == {"fast", "balanced", "quality"}
+    assert get_profile("fast").lookahead > get_profile("quality").lookahead
+    assert get_profile("quality").history_window > get_profile("fast").history_window
+    assert get_profile(BUILTIN_PROFILES["balanced"]) is BUILTIN_PROFILES["balanced"]
+    assert get_profile(None) is None  # 未配置 RUN_PROFILE
+    try:
+        get_profile("turbo")
+        assert False, "未知档位应该报错"
+    except ValueError:
+        pass
+    try:
+        RunProfile(name="bad", model_tier="huge")
+        assert False, "无效的模型级别应该报错"
+    except ValueError:
+        pass
+    print("✅ 内置档位正确")
+
+
+def test_profiles_file():
+    """测试从文件新增档位和覆盖内置档位"""
+    with in_tempdir():
+        with open("profiles.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "fast": {"save_interval": 50},
+                "overnight": {"base": "quality", "lookahead": 2, "realtime_save": False},
+            }, f)
+        profiles = load_profiles("profiles.json")
+        assert profiles["fast"].save_interval == 50 and profiles["fast"].lookahead == BUILTIN_PROFILES["fast"].lookahead
+        overnight = get_profile("overnight", path="profiles.json")
+        assert overnight.name == "overnight" and overnight.lookahead == 2
+        assert overnight.history_window == BUILTIN_PROFILES["quality"].history_window
+        assert overnight.realtime_save is False
+
+        with open("bad.json", "w", encoding="utf-8") as f:
+            json.dump({"x": {"threads": 4}}, f)
+        try:
+            load_profiles("bad.json")
+            assert False, "未知参数应该报错"
+        except ValueError:
+            pass
+
+
+def test_planning_profile():
+    """测试策划生成器按档位设置参数、模型级别和保存策略"""
+    print("🧪 测试策划生成器档位")
+    strong = EchoModel(model_name="strong-model")
+    fast = EchoModel(model_name="fast-model")
+
+    with in_tempdir():
+        generator = PlanningChatGenerator(model=strong, fast_model=fast, profile="fast")
+        profile = BUILTIN_PROFILES["fast"]
+        assert generator.request_interval == profile.request_interval
+        assert generator.history_window == profile.history_window
+        assert generator.page_size == profile.page_size
+
+        generator.input_planning_event("公司年会策划")
+        generator._create_default_planning_characters()
+        generator.generate_planning_phases()
+        generator._create_default_sub_events()
+        generator.generate_planning_conversation(
+            total_duration_hours=24.0,
+            target_message_count=40,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0)
+        )
+
+        # 实时保存使用档位的保存策略，运行日志记录档位
+        info, entries, end = read_run_log(generator.run_log_path)
+        assert info["profile"] == profile.to_dict()
+        assert end["status"] == "completed" and len(entries) == 40
+        # fast 档位的所有消息都使用快速模型
+        assert {entry["call"]["tier"] for entry in entries} == {TIER_FAST}
+        assert fast.calls == 40 and strong.calls == 0
+
+        generator.apply_profile("quality")
+        assert generator.request_interval == BUILTIN_PROFILES["quality"].request_interval
+        generator.request_interval = 0
+        generator.generate_planning_conversation(
+            total_duration_hours=24.0,
+            target_message_count=20,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+            realtime_save=False
+        )
+        assert generator.history_window == BUILTIN_PROFILES["quality"].history_window
+        assert strong.calls == 20 and set(generator.tier_stats.report()) == {TIER_STRONG}
+    print("✅ 策划生成器档位正确")
+
+
+def test_ai_profile():
+    """测试AI生成器按档位设置参数，显式参数优先于档位"""
+    model = EchoModel(model_name="model")
+    with in_tempdir():
+        generator = AIChatGenerator(model=model, profile="balanced")
+        profile = BUILTIN_PROFILES["balanced"]
+        generator.request_interval = 0
+        assert generator.history_window == profile.history_window
+        generator.input_event("周末聚餐")
+        generator._create_default_characters()
+        messages = generator.generate_ai_conversation(
+            duration_hours=1.0,
+            message_count=10,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+            realtime_save=False
+        )
+        assert len(messages) == 10
+        _, entries, end = read_run_log(generator.run_log_path)  # 不实时保存也写运行日志
+        assert end["status"] == "completed" and len(entries) == 10
+        assert generator.model is model  # 传入的模型不随档位切换
+
+
+def test_cli_profile_flag():
+    """测试命令行选择档位"""
+    assert parse_args(["--profile", "fast"]).profile == "fast"
+    assert parse_args([]).profile is None
+
+
+def test_cli_profile_in_interactive_menu():
+    """测试交互菜单启动的AI和策划生成器也使用 --profile 指定的档位"""
+    used = []
+    patched = {}
+    for cls in (AIConfigGenerator, PlanningConfigGenerator):
+        for name in ("_check_api_key", "_setup_config_file", "_setup_event", "_setup_parameters", "_run_generator"):
+            patched[(cls, name)] = getattr(cls, name)
+        cls._check_api_key = lambda self: True
+        cls._setup_config_file = cls._setup_event = cls._setup_parameters = lambda self: None
+        cls._run_generator = lambda self: used.append((type(self).__name__, self.config.get('profile')))
+
+    answers = iter(["4", "", "5", "", "8"])
+    original_input = builtins.input
+    builtins.input = lambda prompt="": next(answers)
+    try:
+        main(["--profile", "fast"])
+    finally:
+        builtins.input = original_input
+        for (cls, name), method in patched.items():
+            setattr(cls, name, method)
+    assert used == [("AIConfigGenerator", "fast"), ("PlanningConfigGenerator", "fast")]
+
+
+if __name__ == "__main__":
+    test_builtin_profiles()
+    test_profiles_file()
+    test_planning_profile()
+    test_ai_profile()
+    test_cli_profile_flag()
+    test_cli_profile_in_interactive_menu()
+    print("🎯 测试完成！")
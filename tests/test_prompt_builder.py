@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试提示词构建
+去掉缩进和多余空行、重复文本块只保留一份、超出token上限时先删减对话历史
+"""
+
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+
+from chat_generator.core.prompt_builder import PromptBuilder, estimate_tokens, minify
+from chat_generator.core.planning_generator import PlanningChatGenerator
+
+HISTORY = [{"sender": f"成员{i}", "content": f"第{i}条消息的内容，说了一些话"} for i in range(10)]
+
+
+def test_minify():
+    """测试去掉缩进和多余空行"""
+    text = """
+        第一行
+            第二行
+
+
+        第三行
+        """
+    assert minify(text) == "第一行\n第二行\n\n第三行"
+    assert minify(text, static=True) == minify(text)
+    assert estimate_tokens("你好world!") == 2 + 2
+
+
+def test_dedup_and_budget():
+    """测试重复文本块和token上限"""
+    print("🧪 测试提示词构建")
+
+    builder = PromptBuilder(token_budget=0)
+    builder.add("固定说明", static=True).add("固定说明", static=True).add("")
+    builder.add_history(HISTORY)
+    prompt = builder.build()
+    assert prompt.count("固定说明") == 1
+    assert prompt.count("- 成员") == 10 and builder.trimmed_history == 0
+
+    # 超出上限时从最早的历史开始删减，必需的文本块保留
+    full_tokens = builder.tokens
+    builder = PromptBuilder(token_budget=full_tokens - 30)
+    builder.add("固定说明", static=True).add_history(HISTORY).add("可选的补充说明" * 5, optional=True)
+    prompt = builder.build()
+    assert builder.tokens <= full_tokens - 30
+    assert builder.trimmed_history > 0 and "- 成员9:" in prompt and "- 成员0:" not in prompt
+    assert "可选的补充说明" in prompt
+
+    # 历史删完仍超出时删掉可选文本块
+    builder = PromptBuilder(token_budget=10)
+    builder.add("固定说明", static=True).add_history(HISTORY).add("可选的补充说明" * 5, optional=True)
+    prompt = builder.build()
+    assert builder.trimmed_history == len(HISTORY)
+    assert prompt == "固定说明"
+    print(f"✅ 完整提示词约 {full_tokens} tokens")
+
+
+def test_planning_prompt_minified():
+    """测试策划消息的提示词没有缩进，超出上限时删减历史"""
+    generator = PlanningChatGenerator(model=object())
+    generator.input_planning_event("公司年会策划")
+    generator._create_default_planning_characters()
+    generator.generate_planning_phases()
+    character = generator.planning_characters[0]
+    phase = generator.planning_phases[0].name
+
+    context = {"general_context": "第1条消息", "history": HISTORY}
+    prompt = generator._planning_message_prompt(character, phase, context)
+    assert all(line == line.strip() for line in prompt.splitlines())
+    assert f"- {character.name}｜" in prompt and "- 成员0:" in prompt
+
+    from chat_generator.config import settings
+    old_budget = settings.PROMPT_TOKEN_BUDGET
+    settings.PROMPT_TOKEN_BUDGET = estimate_tokens(prompt) - 20
+    try:
+        trimmed = generator._planning_message_prompt(character, phase, context)
+    finally:
+        settings.PROMPT_TOKEN_BUDGET = old_budget
+    assert "- 成员0:" not in trimmed and "- 成员9:" in trimmed
+    assert "生成一条消息：" in trimmed and "决策权限" in trimmed
+
+
+if __name__ == "__main__":
+    test_minify()
+    test_dedup_and_budget()
+    test_planning_prompt_minified()
+    print("🎯 测试完成！")
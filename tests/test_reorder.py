@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试重排缓冲区
+时间戳带抖动的消息按时间顺序放出，实时保存的文件和运行日志无需结束时整体排序
+"""
+
+import sys
+import random
+import datetime
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+sys.path.insert(0, str(project_root))
+
+from chat_generator.core.reorder import ReorderBuffer
+from chat_generator.core.run_log import read_run_log
+from tests.helpers import in_tempdir, make_planning_generator
+
+
+def test_buffer_releases_in_order():
+    """测试按watermark放出的消息整体有序"""
+    print("🧪 测试重排缓冲区")
+
+    rng = random.Random(7)
+    start = datetime.datetime(2025, 1, 1, 9, 0, 0)
+    jitter = 0.5
+    buffer = ReorderBuffer()
+    released = []
+    max_pending = 0
+
+    for i in range(200):
+        timestamp = start + datetime.timedelta(hours=i + rng.uniform(-jitter, jitter))
+        buffer.push(timestamp, (timestamp, i))
+        released.extend(buffer.release(start + datetime.timedelta(hours=i + 1 - jitter)))
+        max_pending = max(max_pending, len(buffer))
+    released.extend(buffer.drain())
+
+    assert len(released) == 200 and len(buffer) == 0
+    assert [item[0] for item in released] == sorted(item[0] for item in released)
+    # 缓冲区只保留抖动窗口内的消息
+    assert max_pending <= 2
+    print(f"✅ 最多缓冲 {max_pending} 条消息")
+
+
+def test_max_size_forces_release():
+    """测试超过max_size时放出最早的消息，相同时间戳保持推入顺序"""
+    buffer = ReorderBuffer(max_size=2)
+    timestamp = datetime.datetime(2025, 1, 1)
+    for name in ["a", "b", "c"]:
+        buffer.push(timestamp, name)
+    assert buffer.release(timestamp) == ["a"]
+    assert buffer.drain() == ["b", "c"]
+
+
+def test_realtime_output_is_chronological():
+    """测试大抖动下实时保存的日志和返回的消息都按时间排序"""
+    with in_tempdir():
+        generator = make_planning_generator()
+        # 抖动超过消息间隔，生成顺序和时间顺序不一致
+        generator.timestamp_jitter_hours = 3.0
+
+        random.seed(3)
+        messages = generator.generate_planning_conversation(
+            total_duration_hours=24.0,
+            target_message_count=40,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+            save_interval=7
+        )
+
+        timestamps = [m.timestamp for m in messages]
+        assert len(messages) == 40 and timestamps == sorted(timestamps)
+
+        _, entries, end = read_run_log(generator.run_log_path)
+        assert end["status"] == "completed"
+        indices = [entry["index"] for entry in entries]
+        assert sorted(indices) == list(range(40))
+        assert indices != list(range(40))
+        assert [entry["timestamp"] for entry in entries] == [t.isoformat() for t in timestamps]
+
+
+if __name__ == "__main__":
+    test_buffer_releases_in_order()
+    test_max_size_forces_release()
+    test_realtime_output_is_chronological()
+    print("🎯 测试完成！")
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试JSONL运行日志
+每次运行写一份只追加的日志，结束时原子重命名，中断时已写入的记录仍可读取；QQ/微信文件由日志渲染
+"""
+
+import os
+import sys
+import json
+import tempfile
+import datetime
+import glob
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+sys.path.insert(0, str(project_root))
+
+from chat_generator.core.run_log import RunLog, load_messages, read_run_log
+from chat_generator.core.output_writer import read_text
+from tests.helpers import EchoModel, in_tempdir, make_planning_generator
+
+
+class InterruptingModel(EchoModel):
+    """第 interrupt_at 次调用时模拟用户中断的假模型"""
+
+    def __init__(self, interrupt_at: int):
+        super().__init__()
+        self.interrupt_at = interrupt_at
+
+    def reply(self, prompt: str, call: int) -> str:
+        if call == self.interrupt_at:
+            raise KeyboardInterrupt()
+        return super().reply(prompt, call)
+
+
+def test_run_log_written_and_finalized():
+    """测试运行日志内容和最终重命名"""
+    print("🧪 测试运行日志")
+
+    with in_tempdir():
+        generator = make_planning_generator()
+        messages = generator.generate_planning_conversation(
+            total_duration_hours=48.0,
+            target_message_count=25,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+            save_interval=10
+        )
+
+        path = generator.run_log_path
+        assert path and os.path.exists(path)
+        assert not os.path.exists(path + ".part")
+
+        info, entries, end = read_run_log(path)
+        assert info["kind"] == "planning"
+        assert info["event"] == "公司年会策划"
+        assert len(info["characters"]) == len(generator.planning_characters)
+        assert end["status"] == "completed" and end["message_count"] == 25
+
+        # 日志按时间顺序写入，每条消息恰好一次
+        assert sorted(entry["index"] for entry in entries) == list(range(25))
+        timestamps = [entry["timestamp"] for entry in entries]
+        assert timestamps == sorted(timestamps)
+        for entry in entries:
+            assert entry["phase"] and entry["call"]["model"] == "EchoModel"
+            assert entry["call"]["latency"] >= 0
+        assert sum(1 for entry in entries if entry["sub_event"]) == len(generator.sub_event_schedule)
+
+        # 从日志渲染的消息与内存中的结果一致
+        assert [(m.sender, m.content, m.timestamp) for m in load_messages(path)] == \
+               [(m.sender, m.content, m.timestamp) for m in messages]
+    print(f"✅ 日志共 {len(entries)} 条消息")
+
+
+def test_interrupted_run_keeps_saved_messages():
+    """测试中断时日志标记为interrupted且不重复写入"""
+    with in_tempdir():
+        generator = make_planning_generator(InterruptingModel(interrupt_at=16))
+        messages = generator.generate_planning_conversation(
+            total_duration_hours=48.0,
+            target_message_count=30,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+            save_interval=10
+        )
+
+        _, entries, end = read_run_log(generator.run_log_path)
+        assert end["status"] == "interrupted"
+        assert len(entries) == len(messages) == 15
+        assert len({entry["index"] for entry in entries}) == 15
+
+
+def test_run_log_without_realtime_save():
+    """测试关闭实时保存时也写运行日志，只是不创建临时文件"""
+    with in_tempdir():
+        generator = make_planning_generator()
+        messages = generator.generate_planning_conversation(
+            total_duration_hours=48.0,
+            target_message_count=12,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+            realtime_save=False
+        )
+
+        _, entries, end = read_run_log(generator.run_log_path)
+        assert end["status"] == "completed" and len(entries) == 12
+        assert [m.content for m in load_messages(generator.run_log_path)] == [m.content for m in messages]
+        assert not os.path.exists("output/temp")
+
+
+def test_finalize_renders_from_run_log():
+    """测试临时文件和最终文件都由运行日志渲染，最终文件不受临时文件内容影响"""
+    with in_tempdir():
+        generator = make_planning_generator()
+        messages = generator.generate_planning_conversation(
+            total_duration_hours=48.0,
+            target_message_count=15,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+            save_interval=10
+        )
+        temp_qq = glob.glob("output/temp/planning_temp_qq_*")[0]
+        temp_wechat = glob.glob("output/temp/planning_temp_wechat_*")[0]
+        assert messages[-1].content in read_text(temp_qq)
+
+        with open(temp_qq, 'a', encoding='utf-8') as f:
+            f.write("[09:00:00] 路人: 被截断的半行")
+        generator.finalize_temp_files(temp_qq, temp_wechat, "final_qq.txt", "final_wechat.txt")
+
+        expected = generator.save_planning_conversation(load_messages(generator.run_log_path), "expected.txt", "qq")
+        assert read_text("final_qq.txt") == read_text(expected)
+        assert messages[-1].content in read_text("final_wechat.txt")
+        assert not os.path.exists(temp_qq) and not os.path.exists(temp_wechat)
+
+
+def test_partial_line_is_skipped():
+    """测试进程中断时写坏的最后一行会被跳过"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        log = RunLog(os.path.join(tmpdir, "runs", "run.jsonl"))
+        log.write_header(kind="planning")
+        log.append_messages([
+            {"index": 0, "sender": "强哥", "content": "开工", "timestamp": "2025-01-01T09:00:00"}
+        ])
+        # 模拟写到一半时进程被杀死：不调用finalize，最后一行不完整
+        with open(log.part_filename, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"type": "message", "sender": "阿龙"}, ensure_ascii=False)[:15])
+
+        info, entries, end = read_run_log(log.part_filename)
+        assert info["kind"] == "planning"
+        assert len(entries) == 1 and entries[0]["sender"] == "强哥"
+        assert end is None
+
+
+if __name__ == "__main__":
+    test_run_log_written_and_finalized()
+    test_interrupted_run_keeps_saved_messages()
+    test_run_log_without_realtime_save()
+    test_finalize_renders_from_run_log()
+    test_partial_line_is_skipped()
+    print("🎯 测试完成！")
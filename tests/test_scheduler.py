@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试请求调度器
+验证按对话公平排队、优先级和全局并发上限
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+
+from chat_generator.core.scheduler import RequestScheduler, get_scheduler, PRIORITY_HIGH, PRIORITY_LOW
+from chat_generator.core.planning_generator import PlanningChatGenerator
+from chat_generator.core.ai_generator import AIChatGenerator
+from chat_generator.config import settings
+
+
+def test_fair_round_robin():
+    """长对话不应挤占其他对话"""
+    print("🧪 测试按对话轮询")
+    scheduler = RequestScheduler(max_in_flight=1)
+    gate = threading.Event()
+    order = []
+
+    # 先用一个阻塞请求占住唯一的执行槽，保证后续请求都在排队
+    blocker = scheduler.submit("blocker", gate.wait)
+    time.sleep(0.05)
+    futures = [scheduler.submit("long", order.append, f"long-{i}") for i in range(10)]
+    futures += [scheduler.submit("short", order.append, f"short-{i}") for i in range(2)]
+    gate.set()
+    for future in [blocker] + futures:
+        future.result(timeout=5)
+    scheduler.shutdown()
+
+    print(f"   执行顺序: {order[:6]} ...")
+    assert order.index("short-0") <= 2
+    assert order.index("short-1") <= 4
+
+
+def test_priority():
+    """高优先级请求先执行"""
+    print("🧪 测试优先级")
+    scheduler = RequestScheduler(max_in_flight=1)
+    gate = threading.Event()
+    order = []
+
+    blocker = scheduler.submit("a", gate.wait)
+    time.sleep(0.05)
+    low = scheduler.submit("a", order.append, "low", priority=PRIORITY_LOW)
+    normal = scheduler.submit("b", order.append, "normal")
+    high = scheduler.submit("c", order.append, "high", priority=PRIORITY_HIGH)
+    gate.set()
+    for future in (blocker, low, normal, high):
+        future.result(timeout=5)
+    scheduler.shutdown()
+
+    assert order == ["high", "normal", "low"]
+
+
+def test_max_in_flight():
+    """同时执行的请求数不超过上限"""
+    print("🧪 测试全局并发上限")
+    scheduler = RequestScheduler(max_in_flight=3)
+    lock = threading.Lock()
+    state = {"current": 0, "peak": 0}
+
+    def work():
+        with lock:
+            state["current"] += 1
+            state["peak"] = max(state["peak"], state["current"])
+        time.sleep(0.02)
+        with lock:
+            state["current"] -= 1
+
+    futures = [scheduler.submit(f"conv-{i % 5}", work) for i in range(30)]
+    for future in futures:
+        future.result(timeout=5)
+    scheduler.shutdown()
+    stats = scheduler.get_stats()
+
+    print(f"   最大并发: {state['peak']}")
+    assert state["peak"] == 3
+    assert sum(s["completed"] for s in stats.values()) == 30
+
+
+def test_exception_propagates():
+    """请求异常通过Future传回调用方"""
+    scheduler = RequestScheduler(max_in_flight=1)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    try:
+        scheduler.call("a", fail)
+    except RuntimeError as e:
+        assert str(e) == "boom"
+    else:
+        raise AssertionError("异常未传回")
+    scheduler.shutdown()
+    assert scheduler.get_stats()["a"]["failed"] == 1
+
+
+def test_generators_share_scheduler_by_default():
+    """未传入调度器的生成器共享进程级调度器，SCHEDULER_SHARED=false 时不使用调度器"""
+    first = PlanningChatGenerator(model=object())
+    second = PlanningChatGenerator(model=object())
+    ai = AIChatGenerator(model=object())
+    assert first.scheduler is second.scheduler is ai.scheduler is get_scheduler()
+
+    own = RequestScheduler(max_in_flight=1)
+    assert PlanningChatGenerator(model=object(), scheduler=own).scheduler is own
+    own.shutdown()
+
+    settings.SCHEDULER_SHARED = False
+    try:
+        assert PlanningChatGenerator(model=object()).scheduler is None
+        assert AIChatGenerator(model=object()).scheduler is None
+    finally:
+        settings.SCHEDULER_SHARED = True
+
+
+if __name__ == "__main__":
+    test_fair_round_robin()
+    test_priority()
+    test_max_in_flight()
+    test_exception_propagates()
+    test_generators_share_scheduler_by_default()
+    print("🎯 测试完成！")
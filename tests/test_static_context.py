@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试固定上下文缓存
+角色表、阶段表和要求每次运行只创建一次上下文缓存，每条消息只发送变化的部分
+"""
+
+import sys
+import datetime
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+sys.path.insert(0, str(project_root))
+
+from chat_generator.core.planning_generator import PLANNING_MESSAGE_RULES
+from chat_generator.core.prompt_builder import estimate_tokens, minify
+from tests.helpers import EchoModel, in_tempdir, make_planning_generator
+
+
+class FakeCache:
+    def __init__(self):
+        self.deleted = False
+
+    def delete(self):
+        self.deleted = True
+
+
+def test_context_cache_created_once():
+    """测试上下文缓存每次运行创建一次，消息提示词只包含变化的部分"""
+    print("🧪 测试固定上下文缓存")
+
+    base_model = EchoModel()
+    context_model = EchoModel()
+    caches = []
+    generator = make_planning_generator(base_model)
+
+    def create_context_model(system_instruction, tier="strong"):
+        caches.append((system_instruction, FakeCache()))
+        return context_model, caches[-1][1]
+
+    # 模拟自行创建模型的情况（传入model时默认不创建缓存）
+    generator._owns_model = True
+    generator._create_context_model = create_context_model
+
+    with in_tempdir():
+        generator.generate_planning_conversation(
+            total_duration_hours=24.0,
+            target_message_count=30,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+            realtime_save=False
+        )
+
+    assert len(caches) == 1 and caches[0][1].deleted
+    system_instruction = caches[0][0]
+    assert minify(PLANNING_MESSAGE_RULES) in system_instruction
+    assert all(char.name in system_instruction for char in generator.planning_characters)
+    assert all(phase.name in system_instruction for phase in generator.planning_phases)
+
+    # 消息请求都发给带缓存的模型，且不再包含固定的要求
+    assert len(context_model.prompts) == 30 and not base_model.prompts
+    for prompt in context_model.prompts:
+        assert "消息长度控制在" not in prompt and prompt.startswith("发言人：")
+    average = sum(estimate_tokens(p) for p in context_model.prompts) / 30
+    print(f"✅ 缓存约 {estimate_tokens(system_instruction)} tokens，每条消息平均约 {average:.0f} tokens")
+    assert not generator._context_models
+
+
+def test_inline_prefix_without_cache():
+    """测试没有上下文缓存时固定部分放在提示词开头，各次调用前缀相同"""
+    model = EchoModel()
+    generator = make_planning_generator(model)
+    with in_tempdir():
+        generator.generate_planning_conversation(
+            total_duration_hours=24.0,
+            target_message_count=10,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+            realtime_save=False
+        )
+    prefix = minify(PLANNING_MESSAGE_RULES)
+    assert all(prefix in prompt for prompt in model.prompts)
+    static_end = model.prompts[0].index(prefix) + len(prefix)
+    assert all(prompt[:static_end] == model.prompts[0][:static_end] for prompt in model.prompts)
+    # 进度等变化的信息在固定部分之后
+    assert all(prompt.index("上下文：第") > static_end for prompt in model.prompts)
+
+
+if __name__ == "__main__":
+    test_context_cache_created_once()
+    test_inline_prefix_without_cache()
+    print("🎯 测试完成！")
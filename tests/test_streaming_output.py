@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试边生成边写入文件
+流式输出与先生成再保存的结果一致，内存占用不随消息数增长
+"""
+
+import os
+import sys
+import datetime
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+
+from chat_generator.core.base_generator import ChatGenerator, create_sample_characters
+from chat_generator.core.output_writer import read_text
+from chat_generator.core import vectorized
+
+START_TIME = datetime.datetime(2025, 1, 1, 9, 0, 0)
+
+
+def make_generator() -> ChatGenerator:
+    generator = ChatGenerator()
+    for char in create_sample_characters():
+        generator.add_character(char)
+    generator.set_topic("周末聚餐计划", "大家商量周末去哪里聚餐")
+    return generator
+
+
+def test_stream_matches_save():
+    """测试只有一段时流式输出与 save_to_file 完全相同"""
+    print("🧪 测试流式写入")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for style in ("qq", "wechat"):
+            generator = make_generator()
+            generator.generate_chat_record(duration_hours=72.0, message_count=3_000,
+                                           start_time=START_TIME, seed=7)
+            saved = read_text(generator.save_to_file(os.path.join(tmpdir, f"saved_{style}.txt"),
+                                                     style, "none"))
+
+            streamer = make_generator()
+            streamer.stream_chunk_size = 3_000
+            streamed_file = streamer.generate_to_file(os.path.join(tmpdir, f"stream_{style}.txt"), style,
+                                                      duration_hours=72.0, message_count=3_000,
+                                                      start_time=START_TIME, seed=7, compression="none")
+            assert read_text(streamed_file) == saved
+            assert streamer.messages == []
+    print("✅ 流式输出与整体保存一致")
+
+
+def test_chunks_stay_ordered():
+    """测试分段生成时段与段之间的消息仍按时间排序，日期分隔行不重复"""
+    generator = make_generator()
+    generator.stream_chunk_size = 500
+    messages = list(generator.iter_chat_record(duration_hours=72.0, message_count=5_003,
+                                               start_time=START_TIME, seed=1))
+    assert len(messages) == 5_003
+    timestamps = [m.timestamp for m in messages]
+    assert timestamps == sorted(timestamps)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = generator.generate_to_file(os.path.join(tmpdir, "chat.txt"), "qq",
+                                              duration_hours=72.0, message_count=5_003,
+                                              start_time=START_TIME, seed=1, compression="gzip")
+        assert filename.endswith(".txt.gz")
+        content = read_text(filename)
+    days = {m.timestamp.date() for m in messages}
+    assert content.count("-" * 30) == len(days)
+    assert content.count("] ") == 5_003
+
+
+def test_no_repeated_speaker_across_chunks():
+    """测试分段生成时段与段的交界处也不会出现连续相同的发言人"""
+    modes = [False]
+    try:
+        vectorized._get_numpy()
+        modes.append(True)
+    except ImportError:
+        print("⚠️ 未安装NumPy，只测试逐条生成")
+
+    for use_vectorized in modes:
+        generator = make_generator()
+        generator.stream_chunk_size = 1
+        generator.timestamp_jitter_hours = 0  # 不加抖动时时间顺序即生成顺序
+        messages = list(generator.iter_chat_record(duration_hours=72.0, message_count=500,
+                                                   start_time=START_TIME, seed=3,
+                                                   vectorized=use_vectorized))
+        senders = [m.sender for m in messages]
+        assert len(senders) == 500
+        assert all(a != b for a, b in zip(senders, senders[1:])), use_vectorized
+
+
+def peak_memory(message_count: int) -> int:
+    generator = make_generator()
+    generator.stream_chunk_size = 1_000
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tracemalloc.start()
+        generator.generate_to_file(os.path.join(tmpdir, "chat.txt"), "qq", duration_hours=72.0,
+                                   message_count=message_count, start_time=START_TIME,
+                                   seed=1, compression="none")
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return peak
+
+
+def test_constant_memory():
+    """测试峰值内存与消息数无关"""
+    small = peak_memory(5_000)
+    large = peak_memory(20_000)
+    print(f"✅ 峰值内存: 5000条 {small / 1024:.0f}KB, 20000条 {large / 1024:.0f}KB")
+    assert large < small * 1.5
+
+
+if __name__ == "__main__":
+    test_stream_matches_save()
+    test_chunks_stay_ordered()
+    test_no_repeated_speaker_across_chunks()
+    test_constant_memory()
+    print("🎯 测试完成！")
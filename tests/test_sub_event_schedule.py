@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试子事件排期
+子事件在生成对话前一次性排好，按阶段区间分布，触发次数与频率一致
+"""
+
+import sys
+import datetime
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+sys.path.insert(0, str(project_root))
+
+from tests.helpers import EchoModel, in_tempdir, make_planning_generator
+
+
+def test_schedule_follows_phase_windows():
+    """测试子事件落在相关阶段的区间内"""
+    print("🧪 测试子事件排期")
+
+    generator = make_planning_generator()
+    schedule = generator.build_sub_event_schedule(2000, rate=2.0)
+
+    windows = generator.get_phase_windows(2000)
+    assert windows[0][1] == 0 and windows[-1][2] == 2000
+    assert all(prev[2] == cur[1] for prev, cur in zip(windows, windows[1:]))
+
+    phases_with_events = {event.related_phase for event in generator.sub_events}
+    expected = sum(max(1, round((end - start) * 2.0 / 100)) for name, start, end in windows if name in phases_with_events)
+    assert len(schedule) == expected
+    assert 0 not in schedule
+
+    for slot, event in schedule.items():
+        assert generator.get_current_phase(slot / 2000) == event.related_phase
+        assert generator.should_trigger_sub_event(event.related_phase, slot) is event
+    assert generator.should_trigger_sub_event("", 0) is None
+    print(f"✅ 2000条消息排了 {len(schedule)} 个子事件")
+
+
+def test_conversation_reuses_schedule():
+    """测试生成对话时复用事先排好的子事件"""
+    model = EchoModel()
+    generator = make_planning_generator(model)
+    schedule = dict(generator.build_sub_event_schedule(300, rate=5.0))
+    assert schedule
+
+    with in_tempdir():
+        generator.generate_planning_conversation(
+            total_duration_hours=48.0,
+            target_message_count=300,
+            start_time=datetime.datetime(2025, 1, 1, 9, 0, 0),
+            realtime_save=False
+        )
+
+    assert generator.sub_event_schedule == schedule
+    triggered = [entry for entry in generator.conversation_history if entry['sub_event']]
+    assert len(triggered) == len(schedule)
+    assert len(model.prompts) == 300
+
+
+def test_short_windows():
+    """测试很短的阶段区间：只有一条可用消息时排在这条上，没有可用消息时不排，不会落到第0条"""
+    generator = make_planning_generator()
+    phases_with_events = {event.related_phase for event in generator.sub_events}
+    for count in range(1, 40):
+        for _ in range(5):
+            schedule = generator.build_sub_event_schedule(count, rate=1.5)
+            assert 0 not in schedule and all(0 < slot < count for slot in schedule)
+            for name, start, end in generator.get_phase_windows(count):
+                slots = [slot for slot in schedule if start <= slot < end]
+                assert all(schedule[slot].related_phase == name for slot in slots)
+                if name in phases_with_events and end - 1 >= max(start, 1):
+                    assert slots, (count, name, start, end)  # 有相关子事件的阶段至少一个
+
+    # 一条可用消息的区间（[0, 2) 中只有第1条）和没有可用消息的区间（[0, 1)）
+    first_phase = generator.planning_phases[0].name
+    generator.get_phase_windows = lambda target: [(first_phase, 0, target)]
+    assert set(generator.build_sub_event_schedule(2, rate=1.5)) == {1}
+    assert generator.build_sub_event_schedule(1, rate=1.5) == {}
+    assert generator.build_sub_event_schedule(500, rate=0) == {}
+
+
+if __name__ == "__main__":
+    test_schedule_follows_phase_windows()
+    test_conversation_reuses_schedule()
+    test_short_windows()
+    print("🎯 测试完成！")
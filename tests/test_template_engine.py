@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试模板引擎
+从JSON模板包加载模板，按性格编译查找表，支持追加模板包和角色槽位
+"""
+
+import os
+import sys
+import json
+import random
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+
+from chat_generator.core.base_generator import ChatGenerator, Character
+from chat_generator.core.template_engine import TemplateEngine, TEMPLATES_DIR
+
+
+def test_default_pack():
+    """测试内置模板包与原有的性格规则一致"""
+    print("🧪 测试内置模板包")
+
+    generator = ChatGenerator()
+    rng = random.Random(1)
+    serious = Character(name="李四", personality="严肃")
+    lively = Character(name="张三", personality="活泼")
+    other = Character(name="赵六", personality="温和")
+
+    for _ in range(200):
+        content = generator.generate_message_content(serious, "聚餐", rng)
+        assert content.endswith("关于聚餐，我认为需要认真考虑...")
+
+        # 活泼的角色总是带表情
+        content = generator.generate_message_content(lively, "聚餐", rng)
+        assert any(content.endswith(emoji) for emoji in generator.emojis)
+
+        # 没有对应性格时使用默认模板
+        content = generator.generate_message_content(other, "聚餐", rng)
+        assert "聚餐" in content and content.endswith(("...", "？"))
+    print("✅ 内置模板包正常")
+
+
+def test_extra_pack_and_slots():
+    """测试追加模板包、新性格和角色槽位"""
+    extra = {
+        "name": "office",
+        "personalities": {
+            "话痨": {"templates": ["{nickname}来说两句：{topic}必须安排上"], "interjection_rate": 0},
+            "严肃": {"templates": ["{topic}的预算要先定下来"]}
+        }
+    }
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "office.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(extra, f, ensure_ascii=False)
+        engine = TemplateEngine.from_files([TEMPLATES_DIR / "default.json", path])
+
+    assert engine.pack_names == ["default", "office"]
+    generator = ChatGenerator(template_engine=engine)
+    rng = random.Random(2)
+
+    talker = Character(name="王五", nickname="小王", personality="话痨")
+    assert generator.generate_message_content(talker, "团建", rng) == "小王来说两句：团建必须安排上"
+
+    # 同名性格的模板会合并
+    serious = Character(name="李四", personality="严肃")
+    contents = {generator.generate_message_content(serious, "团建", rng) for _ in range(200)}
+    assert any(c.endswith("团建的预算要先定下来") for c in contents)
+    assert any(c.endswith("关于团建，我认为需要认真考虑...") for c in contents)
+
+
+def test_invalid_pack():
+    """测试未知槽位和缺少default时报错"""
+    try:
+        TemplateEngine([{"name": "bad", "personalities": {"default": {"templates": ["{unknown}"]}}}])
+        assert False, "未知槽位应当报错"
+    except ValueError as e:
+        assert "unknown" in str(e)
+
+    engine = TemplateEngine([{"name": "partial", "personalities": {"活泼": {"templates": ["你好"]}}}])
+    try:
+        engine.compile("聚餐")
+        assert False, "缺少default应当报错"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_default_pack()
+    test_extra_pack_and_slots()
+    test_invalid_pack()
+    print("🎯 测试完成！")
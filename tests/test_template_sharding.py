@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试模板生成的多进程分片
+分片生成的结果按时间排序、条数正确、同样的种子可复现
+"""
+
+import sys
+import random
+import datetime
+from collections import Counter
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+
+from chat_generator.core.base_generator import ChatGenerator, create_sample_characters
+from chat_generator.core import sharding, vectorized
+
+
+def make_generator() -> ChatGenerator:
+    generator = ChatGenerator()
+    for char in create_sample_characters():
+        generator.add_character(char)
+    generator.set_topic("周末聚餐计划", "大家商量周末去哪里聚餐")
+    return generator
+
+
+def test_shard_bounds_and_seeds():
+    """测试分片区间连续覆盖、各分片种子不同"""
+    bounds = sharding.shard_bounds(10_003, 4)
+    assert bounds[0][0] == 0 and bounds[-1][1] == 10_003
+    assert all(a[1] == b[0] for a, b in zip(bounds, bounds[1:]))
+    assert sharding.shard_seeds(7, 4) == sharding.shard_seeds(7, 4)
+    assert len(set(sharding.shard_seeds(7, 4))) == 4
+
+    # 消息太少时不分片
+    assert sharding.resolve_workers(8, 1_000) == 1
+    assert sharding.resolve_workers(2, 20_000) == 2
+
+
+def test_encode_roundtrip():
+    """测试分片的列式编码可以完整还原"""
+    generator = make_generator()
+    start_time = datetime.datetime(2025, 1, 1, 9, 0, 0)
+    messages = generator.generate_chat_record(duration_hours=10.0, message_count=500,
+                                              start_time=start_time, seed=3)
+    decoded = sharding.decode_shard(sharding.encode_shard(messages, start_time), start_time)
+    assert decoded == messages
+
+
+def test_speakers_continue_across_shards():
+    """测试各分片的发言人接着上一个分片的最后一位发言人，交界处不连续相同"""
+    generator = make_generator()
+    bounds = sharding.shard_bounds(10_003, 4)
+    modes = [False]
+    try:
+        vectorized._get_numpy()
+        modes.append(True)
+    except ImportError:
+        print("⚠️ 未安装NumPy，跳过批量路径")
+
+    for mode in modes:
+        speakers = sharding.shard_speakers(generator, bounds, 7, mode)
+        assert [len(indices) for indices in speakers] == [end - begin for begin, end in bounds]
+        sequence = [int(index) for indices in speakers for index in indices]
+        assert all(a != b for a, b in zip(sequence, sequence[1:]))
+        assert [list(indices) for indices in sharding.shard_speakers(generator, bounds, 7, mode)] == \
+            [list(indices) for indices in speakers]
+
+    # 分片按给出的发言人生成消息
+    speakers = sharding.shard_speakers(generator, [(0, 300)], 1)[0]
+    start_time = datetime.datetime(2025, 1, 1, 9, 0, 0)
+    expected = Counter(generator.characters[index].name for index in speakers)
+    messages = generator._generate_range(0, 300, 10.0, 300, start_time, random.Random(1), speakers=speakers)
+    assert Counter(m.sender for m in messages) == expected
+    if True in modes:
+        messages = vectorized.generate_range_vectorized(generator, 0, 300, 10.0, 300, start_time, 1,
+                                                        speakers=speakers)
+        assert Counter(m.sender for m in messages) == expected
+
+
+def test_sharded_record():
+    """测试多进程生成的记录"""
+    print("🧪 测试多进程分片生成")
+
+    generator = make_generator()
+    start_time = datetime.datetime(2025, 1, 1, 9, 0, 0)
+    count = 2 * sharding.MIN_SHARD_SIZE + 17
+
+    messages = generator.generate_chat_record(duration_hours=72.0, message_count=count,
+                                              start_time=start_time, workers=2, seed=42)
+    assert len(messages) == count and generator.messages is messages
+    timestamps = [m.timestamp for m in messages]
+    assert timestamps == sorted(timestamps)
+    assert {m.sender for m in messages} == {c.name for c in generator.characters}
+
+    again = make_generator().generate_chat_record(duration_hours=72.0, message_count=count,
+                                                  start_time=start_time, workers=2, seed=42)
+    assert again == messages
+    print(f"✅ 共 {len(messages)} 条消息")
+
+
+if __name__ == "__main__":
+    test_shard_bounds_and_seeds()
+    test_encode_roundtrip()
+    test_speakers_continue_across_shards()
+    test_sharded_record()
+    print("🎯 测试完成！")
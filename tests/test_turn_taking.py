@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试发言人选择引擎
+"""
+
+import sys
+import time
+import random
+from collections import Counter
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+
+from chat_generator.core.base_generator import Character
+from chat_generator.core.planning_generator import PlanningCharacter
+from chat_generator.core.turn_taking import AliasTable, SpeakerSelector, character_weight
+
+
+def make_member(name: str, level: str, decision_power: str) -> PlanningCharacter:
+    return PlanningCharacter(
+        name=name, role="成员", department="行动组", level=level, expertise=[],
+        personality="", speaking_style="", responsibilities=[], decision_power=decision_power
+    )
+
+
+def test_alias_table_distribution():
+    """别名表抽样分布接近权重"""
+    print("🧪 测试别名表分布")
+    random.seed(1)
+    weights = [1, 2, 3, 4]
+    table = AliasTable(weights)
+    counts = Counter(table.sample() for _ in range(100_000))
+    for i, w in enumerate(weights):
+        expected = w / sum(weights)
+        actual = counts[i] / 100_000
+        print(f"   {i}: 期望 {expected:.3f}, 实际 {actual:.3f}")
+        assert abs(actual - expected) < 0.01
+
+
+def test_weights_follow_level_and_decision_power():
+    """级别和决策权限越高权重越大"""
+    boss = make_member("强哥", "老大", "高")
+    core = make_member("阿龙", "骨干", "中")
+    member = make_member("大熊", "马仔", "低")
+    assert character_weight(boss) > character_weight(core) > character_weight(member)
+    # 没有级别属性的角色权重为1
+    assert character_weight(Character(name="张三")) == 1.0
+
+
+def test_no_repeated_speakers():
+    """默认不会连续选择同一发言人"""
+    random.seed(2)
+    characters = [Character(name=f"成员{i}") for i in range(5)]
+    selector = SpeakerSelector(characters)
+    last = None
+    for _ in range(10_000):
+        speaker = selector.next_speaker(last)
+        assert speaker.name != last
+        last = speaker.name
+
+
+def test_single_character():
+    """只有一个角色时允许连续发言"""
+    selector = SpeakerSelector([Character(name="张三")])
+    assert selector.next_speaker("张三").name == "张三"
+
+
+def test_custom_transition_matrix():
+    """自定义转移矩阵"""
+    characters = [Character(name=n) for n in ("A", "B", "C")]
+    # A之后总是B，B之后总是C，C之后总是A
+    transition = [[0, 1, 0], [0, 0, 1], [1, 0, 0]]
+    selector = SpeakerSelector(characters, transition=transition)
+    sequence = ["A"]
+    for _ in range(6):
+        sequence.append(selector.next_speaker(sequence[-1]).name)
+    assert "".join(sequence) == "ABCABCA"
+
+
+def test_large_group_speed():
+    """数百人的群聊选择依然很快"""
+    print("🧪 测试大群选择速度")
+    levels = ["老大", "骨干", "马仔"]
+    powers = ["高", "中", "低"]
+    members = [make_member(f"成员{i}", levels[i % 3], powers[i % 3]) for i in range(500)]
+    selector = SpeakerSelector(members)
+
+    start = time.perf_counter()
+    last = None
+    for _ in range(100_000):
+        last = selector.next_speaker(last).name
+    elapsed = time.perf_counter() - start
+    print(f"   500人群聊选择10万次: {elapsed:.2f}s")
+    assert elapsed < 5.0
+
+
+if __name__ == "__main__":
+    test_alias_table_distribution()
+    test_weights_follow_level_and_decision_power()
+    test_no_repeated_speakers()
+    test_single_character()
+    test_custom_transition_matrix()
+    test_large_group_speed()
+    print("🎯 测试完成！")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试模板生成的NumPy批量路径
+批量生成的记录按时间排序、不连续发言、内容来自模板表，分布与逐条生成一致
+"""
+
+import sys
+import datetime
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+
+from chat_generator.core.base_generator import ChatGenerator, Character, create_sample_characters
+from chat_generator.core import vectorized
+
+
+def numpy_available() -> bool:
+    try:
+        vectorized._get_numpy()
+        return True
+    except ImportError:
+        print("⚠️ 未安装NumPy，跳过批量路径测试")
+        return False
+
+
+def make_generator(characters=None) -> ChatGenerator:
+    generator = ChatGenerator()
+    for char in characters or create_sample_characters():
+        generator.add_character(char)
+    generator.set_topic("周末聚餐计划", "大家商量周末去哪里聚餐")
+    return generator
+
+
+def test_vectorized_record():
+    """测试批量生成的记录"""
+    if not numpy_available():
+        return
+    print("🧪 测试NumPy批量生成")
+
+    generator = make_generator()
+    start_time = datetime.datetime(2025, 1, 1, 9, 0, 0)
+    count = 20_000
+    messages = generator.generate_chat_record(duration_hours=72.0, message_count=count,
+                                              start_time=start_time, seed=1, vectorized=True)
+
+    assert len(messages) == count and generator.messages is messages
+    timestamps = [m.timestamp for m in messages]
+    assert timestamps == sorted(timestamps)
+
+    # 内容由 语气词 + 该角色性格的模板 + 表情 组成，各角色发言数大致相同
+    tables = generator.compile_templates(generator.current_topic)
+    personalities = {c.name: c.personality for c in generator.characters}
+    for m in messages:
+        table = tables.get(personalities[m.sender]) or tables["default"]
+        candidates = {m.content}
+        candidates |= {c[len(p):] for c in set(candidates) for p in table.prefixes if c.startswith(p)}
+        candidates |= {c[:-len(e)] for c in set(candidates) for e in table.emojis if c.endswith(e)}
+        assert candidates & set(table.texts), m
+        if table.emoji_rate >= 1.0:
+            assert m.content.endswith(tuple(table.emojis)), m
+    counts = Counter(m.sender for m in messages)
+    assert min(counts.values()) > count / len(counts) * 0.9
+
+    again = make_generator().generate_chat_record(duration_hours=72.0, message_count=count,
+                                                  start_time=start_time, seed=1, vectorized=True)
+    assert again == messages
+    print(f"✅ 共 {len(messages)} 条消息")
+
+
+def test_no_consecutive_speaker():
+    """测试不连续发言（按生成顺序，即排序前）"""
+    if not numpy_available():
+        return
+    np = vectorized._get_numpy()
+    from chat_generator.core.turn_taking import SpeakerSelector
+
+    selector = SpeakerSelector(create_sample_characters())
+    speakers = vectorized._speaker_indices(np, np.random.default_rng(3), selector, 10_000)
+    assert (speakers[1:] != speakers[:-1]).all()
+    assert set(speakers.tolist()) == {0, 1, 2, 3}
+
+
+@dataclass
+class RankedCharacter(Character):
+    level: str = "成员"
+
+
+def test_weighted_speakers_and_slots():
+    """测试按级别加权的发言人和带角色槽位的模板"""
+    if not numpy_available():
+        return
+    characters = [
+        RankedCharacter(name="老板", personality="严肃", level="老大"),
+        RankedCharacter(name="小陈", personality="活泼"),
+        RankedCharacter(name="小刘", personality="温和"),
+    ]
+    generator = make_generator(characters)
+    messages = generator.generate_chat_record(duration_hours=10.0, message_count=6_000,
+                                              start_time=datetime.datetime(2025, 1, 1), seed=5,
+                                              vectorized=True)
+    counts = Counter(m.sender for m in messages)
+    assert counts["老板"] > counts["小陈"] and counts["老板"] > counts["小刘"]
+
+
+if __name__ == "__main__":
+    test_vectorized_record()
+    test_no_consecutive_speaker()
+    test_weighted_speakers_and_slots()
+    print("🎯 测试完成！")